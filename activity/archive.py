@@ -0,0 +1,37 @@
+from django.db import transaction
+
+from .models import Activity, ArchivedActivity, ArchivedNotification, Notification
+
+CHUNK_SIZE = 1000
+ACTIVITY_FIELDS = ("id", "actor_id", "verb", "target_ct_id", "target_id", "project_id", "created_at")
+NOTIFICATION_FIELDS = ("id", "recipient_id", "activity_id", "is_read", "created_at")
+
+
+def archivable_activities(cutoff):
+    """Activities older than ``cutoff`` with no unread notifications."""
+    return Activity.objects.filter(created_at__lt=cutoff).exclude(notifications__is_read=False)
+
+
+def archive_activities(cutoff, chunk_size=CHUNK_SIZE):
+    """
+    Moves activities older than ``cutoff`` into ArchivedActivity, and their
+    read notifications into ArchivedNotification, one chunk per transaction.
+    Activities with unread notifications stay. Returns how many were moved.
+    """
+    candidates = archivable_activities(cutoff)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(candidates.order_by("id").values(*ACTIVITY_FIELDS)[:chunk_size])
+            if rows:
+                ids = [row["id"] for row in rows]
+                notifications = Notification.objects.filter(activity_id__in=ids)
+                ArchivedActivity.objects.bulk_create([ArchivedActivity(**row) for row in rows])
+                ArchivedNotification.objects.bulk_create([ArchivedNotification(**row)
+                                                          for row in notifications.values(*NOTIFICATION_FIELDS)])
+                # copied first, so the cascade from the activities below loses nothing
+                notifications.delete()
+                Activity.objects.filter(id__in=ids).delete()
+        if not rows:
+            return moved
+        moved += len(rows)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
+
+from .serializers import ActivitySerializer
+
+logger = logging.getLogger(__name__)
+
+_server_loop = None
+_executor = None
+_lock = threading.Lock()
+_pending = set()
+
+
+def send_concurrency():
+    """Most group_send calls a single delivery keeps in flight at once."""
+    return getattr(settings, "NOTIFICATION_SEND_CONCURRENCY", 50)
+
+
+def bind_loop(loop):
+    """
+    Sends go to ``loop``, the ASGI server's event loop: the websocket
+    consumers wait on the channel layer there, and a send from another loop
+    does not wake them promptly. ``None`` unbinds.
+    """
+    global _server_loop
+    _server_loop = loop
+
+
+class DeliveryLoopMiddleware:
+    """ASGI middleware that binds the server's running loop for delivery."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if _server_loop is not asyncio.get_running_loop():
+            bind_loop(asyncio.get_running_loop())
+        return await self.app(scope, receive, send)
+
+
+def notification_messages(notifications):
+    """
+    One (group, message) pair per notification, with the same payload as
+    NotificationSerializer. Each activity is serialized once and shared by
+    all of its recipients' messages.
+    """
+    created_at = serializers.DateTimeField()
+    activities = {}
+    messages = []
+    for notification in notifications:
+        if notification.activity_id not in activities:
+            activities[notification.activity_id] = ActivitySerializer(notification.activity).data
+        payload = {
+            "id": notification.id,
+            "activity": activities[notification.activity_id],
+            "is_read": notification.is_read,
+            "created_at": created_at.to_representation(notification.created_at),
+        }
+        messages.append((f"user_{notification.recipient_id}", {"type": "send_notification", "data": payload}))
+    return messages
+
+
+async def _send_all(messages):
+    layer = get_channel_layer()
+    limit = asyncio.Semaphore(send_concurrency())
+
+    async def send(group, message):
+        async with limit:
+            await layer.group_send(group, message)
+
+    results = await asyncio.gather(*(send(group, message) for group, message in messages), return_exceptions=True)
+    failed = [result for result in results if isinstance(result, Exception)]
+    if failed:
+        # the notifications are stored either way; clients see them on the next list
+        logger.warning("%d of %d notification sends failed: %r", len(failed), len(messages), failed[0])
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="notification-delivery")
+        return _executor
+
+
+def deliver(messages):
+    """
+    Sends the (group, message) pairs concurrently without waiting for them:
+    on the bound server loop, or, in a process without one (WSGI, management
+    commands), through async_to_sync on a worker thread.
+    """
+    if not messages:
+        return
+    loop = _server_loop
+    if loop is not None and loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(_send_all(messages), loop)
+    else:
+        future = _get_executor().submit(async_to_sync(_send_all), messages)
+    with _lock:
+        _pending.add(future)
+    future.add_done_callback(_done)
+
+
+def _done(future):
+    with _lock:
+        _pending.discard(future)
+
+
+def flush(timeout=None):
+    """Waits for the deliveries queued so far to finish."""
+    with _lock:
+        pending = list(_pending)
+    wait(pending, timeout)
+
+
+def deliver_on_commit(notifications):
+    """
+    Pushes the notifications to their recipients' websocket groups after the
+    current transaction commits, off the request thread.
+    """
+    notifications = list(notifications)
+    if notifications and get_channel_layer():
+        transaction.on_commit(lambda: deliver(notification_messages(notifications)))
@@ -36,6 +36,26 @@ class Activity(models.Model):
         return f"{self.actor} {self.verb} {self.target}"
 
 
+class ArchivedActivity(models.Model):
+    """Activity rows moved out of the feed table by activity.archive; keeps the original id."""
+    id = models.BigIntegerField(primary_key=True)
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    verb = models.CharField(max_length=100)
+    target_ct = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="+")
+    target_id = models.PositiveIntegerField()
+    project = models.ForeignKey("categories.Project", on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["project", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} {self.target_ct_id}:{self.target_id} (archived)"
+
+
 class Notification(models.Model):
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
     activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name="notifications")
@@ -50,3 +70,21 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"Notification to {self.recipient} - {self.activity}"
+
+
+class ArchivedNotification(models.Model):
+    """Read notifications archived together with their activity; keeps the original id."""
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    activity = models.ForeignKey(ArchivedActivity, on_delete=models.CASCADE, related_name="notifications")
+    is_read = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["recipient", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"Notification to {self.recipient_id} - {self.activity_id} (archived)"
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Activity, Notification
+from .models import Activity, ArchivedActivity, ArchivedNotification, Notification
 from django.contrib.contenttypes.models import ContentType
 
 class ActivitySerializer(serializers.ModelSerializer):
@@ -18,4 +18,20 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ["id", "activity", "is_read", "created_at"]
\ No newline at end of file
+        fields = ["id", "activity", "is_read", "created_at"]
+
+
+class ArchivedActivitySerializer(serializers.ModelSerializer):
+    # same fields as ActivitySerializer, so feeds can mix live and archived rows
+
+    class Meta:
+        model = ArchivedActivity
+        fields = "__all__"
+
+
+class ArchivedNotificationSerializer(serializers.ModelSerializer):
+    activity = ArchivedActivitySerializer()
+
+    class Meta:
+        model = ArchivedNotification
+        fields = ["id", "activity", "is_read", "created_at"]
@@ -1,6 +1,4 @@
 import re
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
@@ -15,26 +13,9 @@ Comment = apps.get_model("activity", "Comment")
 Task = apps.get_model("categories", "Task")
 Project = apps.get_model("categories", "Project")
 
-from .serializers import NotificationSerializer
+from .delivery import deliver_on_commit
+from categories.signals import assignments_bulk_created
 
-channel_layer = get_channel_layer()
-
-def push_notification_ws(notification):
-    """
-    Serializes notification with DRF serializer and pushes via channels to recipient group.
-    """
-    if not channel_layer:
-        return
-    serializer = NotificationSerializer(notification)
-    payload = serializer.data
-    group = f"user_{notification.recipient.id}"
-    async_to_sync(channel_layer.group_send)(
-        group,
-        {
-            "type": "send_notification",
-            "data": payload
-        }
-    )
 
 @receiver(post_save, sender=TaskAssignment)
 def on_task_assignment(sender, instance, created, **kwargs):
@@ -49,7 +30,22 @@ def on_task_assignment(sender, instance, created, **kwargs):
         project=instance.task.project if getattr(instance.task, 'project', None) else None
     )
     notif = Notification.objects.create(recipient=instance.user, activity=act)
-    push_notification_ws(notif)
+    deliver_on_commit([notif])
+
+
+@receiver(assignments_bulk_created)
+def on_task_assignments_bulk_created(sender, assignments, **kwargs):
+    task_ct = ContentType.objects.get_for_model(Task)
+    projects = dict(Task.objects.filter(id__in={a.task_id for a in assignments}).values_list("id", "project_id"))
+    acts = Activity.objects.bulk_create([
+        Activity(actor_id=a.user_id, verb="assigned", target_ct=task_ct, target_id=a.task_id,
+                 project_id=projects.get(a.task_id))
+        for a in assignments
+    ])
+    notifs = Notification.objects.bulk_create([
+        Notification(recipient_id=a.user_id, activity=act) for a, act in zip(assignments, acts)
+    ])
+    deliver_on_commit(Notification.objects.filter(id__in=[n.id for n in notifs]).select_related("activity"))
 
 
 MENTION_REGEX = re.compile(r'@([\w.@+-]+)')
@@ -87,6 +83,5 @@ def on_comment_created(sender, instance, created, **kwargs):
         created_notifs.append(n)
     if created_notifs:
         Notification.objects.bulk_create(created_notifs)
-        # push each
-        for n in Notification.objects.filter(activity=act, recipient__in=[u.id for u in recipients]):
-            push_notification_ws(n)
+        deliver_on_commit(Notification.objects.filter(activity=act, recipient__in=[u.id for u in recipients])
+                          .select_related("activity"))
@@ -1,3 +1,103 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from datetime import timedelta
 
-# Create your tests here.
+from channels.layers import get_channel_layer
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from categories.models import Project, Task, TaskAssignment
+from . import delivery
+from .archive import archive_activities
+from .models import Activity, ArchivedActivity, ArchivedNotification, Comment, Notification
+from .serializers import NotificationSerializer
+
+MAX_LATENCY = 1.0
+
+
+class ServerLoopTestCase(APITestCase):
+    """Runs an event loop in a thread standing in for the ASGI server's, with delivery bound to it."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        delivery.bind_loop(self.loop)
+        self.layer = get_channel_layer()
+
+    def tearDown(self):
+        delivery.bind_loop(None)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def on_loop(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def subscribe(self, user):
+        """Starts a receiver on the user's group, like a connected NotificationConsumer."""
+        channel = self.on_loop(self.layer.new_channel()).result()
+        self.on_loop(self.layer.group_add(f"user_{user.id}", channel)).result()
+        return self.on_loop(self.layer.receive(channel))
+
+    def received(self, receiver, since):
+        message = receiver.result(timeout=10)
+        self.assertLess(time.perf_counter() - since, MAX_LATENCY)
+        return message
+
+
+class NotificationDeliveryTests(ServerLoopTestCase):
+    def test_mentions_reach_live_receivers_after_commit(self):
+        author = User.objects.create_user("author@example.com", "pw-12345678")
+        mentioned = [User.objects.create_user(f"m{i}@example.com", "pw-12345678") for i in range(3)]
+        task = Task.objects.create(project=Project.objects.create(title="Board", owner=author), title="task")
+        receivers = {user.id: self.subscribe(user) for user in mentioned}
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            Comment.objects.create(task=task, author=author, content=" ".join(f"@{u.email}" for u in mentioned))
+        self.assertFalse(any(receiver.done() for receiver in receivers.values()))
+        started = time.perf_counter()
+        for callback in callbacks:
+            callback()
+
+        for user in mentioned:
+            message = self.received(receivers[user.id], started)
+            self.assertEqual(message["type"], "send_notification")
+            self.assertEqual(message["data"], NotificationSerializer(Notification.objects.get(recipient=user)).data)
+
+
+class ActivityArchiveTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.other = User.objects.create_user("other@example.com", "pw-12345678")
+        self.task = Task.objects.create(project=Project.objects.create(title="Board", owner=self.user), title="task")
+        TaskAssignment.objects.create(task=self.task, user=self.user)
+        TaskAssignment.objects.create(task=self.task, user=self.other)
+        Comment.objects.create(task=self.task, author=self.other, content=f"@{self.user.email} see this")
+        hidden = Task.objects.create(project=Project.objects.create(title="Theirs", owner=self.other), title="x")
+        TaskAssignment.objects.create(task=hidden, user=self.other)
+        # everything but the mention is old; only the other user's assignment is still unread
+        old = timezone.now() - timedelta(days=400)
+        for days, activity in enumerate(Activity.objects.exclude(verb="commented").order_by("id")):
+            Activity.objects.filter(pk=activity.pk).update(created_at=old + timedelta(days=days))
+        Notification.objects.filter(recipient=self.user).update(is_read=True)
+        self.client.force_authenticate(self.user)
+
+    def test_archived_rows_stay_in_the_feed_and_notifications(self):
+        feed = self.client.get(reverse("activity-list")).json()
+        notifications = self.client.get(reverse("notification-list")).json()
+        self.assertEqual([row["verb"] for row in feed], ["commented", "assigned", "assigned"])
+        self.assertEqual(len(notifications), 2)
+
+        self.assertEqual(archive_activities(timezone.now() - timedelta(days=365)), 1)
+        archived = ArchivedActivity.objects.get()
+        self.assertEqual(archived.actor_id, self.user.id)
+        self.assertEqual(list(ArchivedNotification.objects.values_list("recipient", "is_read")), [(self.user.id, True)])
+        self.assertEqual(Notification.objects.filter(recipient=self.other, is_read=False).count(), 2)
+
+        self.assertEqual(self.client.get(reverse("activity-list")).json(), feed)
+        self.assertEqual(self.client.get(reverse("notification-list")).json(), notifications)
+        self.assertEqual(self.client.get(reverse("activity-detail", args=[archived.id])).json()["verb"], "assigned")
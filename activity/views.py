@@ -1,16 +1,51 @@
+from heapq import merge
+from itertools import islice
+from operator import attrgetter
+
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, permissions, mixins
-from .models import Activity, Notification
-from .serializers import ActivitySerializer, NotificationSerializer
+from categories.task_bulk import accessible_projects
+from .models import Activity, ArchivedActivity, ArchivedNotification, Notification
+from .serializers import (
+    ActivitySerializer, ArchivedActivitySerializer, ArchivedNotificationSerializer, NotificationSerializer,
+)
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+FEED_SIZE = 200
+
+
+def newest_first(*sources, limit=None):
+    """
+    Merges (queryset, serializer class) pairs, each ordered newest first, into
+    one list of serialized rows.
+    """
+    tagged = [[(obj, serializer) for obj in qs.order_by("-created_at", "-id")[:limit]] for qs, serializer in sources]
+    rows = merge(*tagged, key=lambda pair: attrgetter("created_at", "id")(pair[0]), reverse=True)
+    return [serializer(obj).data for obj, serializer in islice(rows, limit)]
+
+
 class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
+    """The latest activity of the user's projects, live and archived rows together."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ActivitySerializer
 
     def get_queryset(self):
-        user = self.request.user
-        return Activity.objects.filter(project__in=user.projects.all()).select_related("actor", "project")[:200]
+        projects = accessible_projects(self.request.user)
+        return Activity.objects.filter(project__in=projects).select_related("actor", "project")
+
+    def get_archived_queryset(self):
+        return ArchivedActivity.objects.filter(project__in=accessible_projects(self.request.user))
+
+    def list(self, request):
+        return Response(newest_first((self.get_queryset(), ActivitySerializer),
+                                     (self.get_archived_queryset(), ArchivedActivitySerializer), limit=FEED_SIZE))
+
+    def retrieve(self, request, pk=None):
+        activity = self.get_queryset().filter(pk=pk).first()
+        if activity is not None:
+            return Response(ActivitySerializer(activity).data)
+        return Response(ArchivedActivitySerializer(get_object_or_404(self.get_archived_queryset(), pk=pk)).data)
 
 
 class NotificationViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
@@ -20,6 +55,11 @@ class NotificationViewSet(viewsets.GenericViewSet, mixins.ListModelMixin):
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user).select_related("activity__actor","activity__project")
 
+    def list(self, request):
+        archived = ArchivedNotification.objects.filter(recipient=request.user).select_related("activity")
+        return Response(newest_first((self.get_queryset(), NotificationSerializer),
+                                     (archived, ArchivedNotificationSerializer)))
+
     @action(detail=False, methods=["post"])
     def mark_read(self, request):
         ids = request.data.get("ids", [])
@@ -0,0 +1,270 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .archive import time_entry_sources
+
+User = get_user_model()
+
+CHUNK_SIZE = 5000
+DAY = 86400
+ENTRY_DTYPE = np.dtype([
+    ("user", np.int64), ("task", np.int64), ("project", np.int64),
+    ("start", np.int64), ("duration", np.float64),
+])
+DEFAULT_PERCENTILES = (50, 90, 95)
+MAX_WINDOW = 366
+EPOCH_DAY = date(1970, 1, 1).toordinal()
+
+
+class TimeColumns:
+    """
+    Finished TimeEntry rows as parallel arrays: ids, start (UTC epoch seconds)
+    and duration (seconds). The reports below group, sort and window these
+    arrays instead of asking the ORM for one row per group.
+    """
+
+    def __init__(self, data):
+        self.user = np.ascontiguousarray(data["user"])
+        self.task = np.ascontiguousarray(data["task"])
+        self.project = np.ascontiguousarray(data["project"])
+        self.start = np.ascontiguousarray(data["start"])
+        self.duration = np.ascontiguousarray(data["duration"])
+        self._days = None
+
+    def __len__(self):
+        return len(self.user)
+
+    @classmethod
+    def load(cls, sources):
+        """Loads one or more entry querysets (live and archived rows) into a single set of columns."""
+        if not isinstance(sources, (list, tuple)):
+            sources = [sources]
+        rows = (row for entries in sources
+                for row in entries.values_list("user_id", "task_id", "task__project_id", "start_time", "duration")
+                .iterator(chunk_size=CHUNK_SIZE))
+        data = np.fromiter(((user, task, project, int(start.timestamp()), spent.total_seconds())
+                            for user, task, project, start, spent in rows), dtype=ENTRY_DTYPE)
+        return cls(data)
+
+    @property
+    def days(self):
+        """Local calendar day of each entry's start, as days since 1970-01-01."""
+        if self._days is None:
+            self._days = local_days(self.start)
+        return self._days
+
+
+def start_time_range(params):
+    """
+    start_time lookups for the inclusive local ``start`` / ``end`` dates in
+    ``params``. Bad dates raise ValueError.
+    """
+    filters = {}
+    for param, lookup, shift in (("start", "start_time__gte", 0), ("end", "start_time__lt", 1)):
+        if params.get(param):
+            day = parse_date(params[param])
+            if day is None:
+                raise ValueError(f"{param} must be a YYYY-MM-DD date.")
+            filters[lookup] = timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min))
+    return filters
+
+
+def entries_for(params, project=None):
+    """
+    Finished entries filtered by ``start`` / ``end`` (inclusive local dates),
+    ``project`` and ``user``, as one queryset per entry table the range
+    touches (the archive only when ``start`` reaches back into it). Bad
+    params raise ValueError.
+    """
+    filters = {"duration__isnull": False, **start_time_range(params)}
+    if project is not None:
+        filters["task__project"] = project
+    elif params.get("project"):
+        filters["task__project"] = int(params["project"])
+    if params.get("user"):
+        filters["user"] = int(params["user"])
+    return [entries.filter(**filters).order_by() for entries in time_entry_sources(filters.get("start_time__gte"))]
+
+
+def local_days(starts):
+    """Calendar day (days since the epoch, current time zone) of UTC epoch seconds."""
+    hours, inverse = np.unique(starts // 3600, return_inverse=True)
+    zone = timezone.get_current_timezone()
+    # one utcoffset() per distinct hour, not per entry
+    offsets = np.array([datetime.fromtimestamp(int(hour) * 3600, zone).utcoffset().total_seconds()
+                        for hour in hours], dtype=np.int64)
+    return (starts + offsets[inverse.reshape(-1)]) // DAY
+
+
+def group_sums(keys, values):
+    """(distinct keys, sum of ``values`` per key, rows per key)."""
+    distinct, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return (distinct, np.bincount(inverse, weights=values, minlength=len(distinct)),
+            np.bincount(inverse, minlength=len(distinct)))
+
+
+def grouped_percentiles(groups, values, percentiles):
+    """
+    (distinct groups, matrix of percentiles per group) with linear
+    interpolation, the same as np.percentile applied group by group.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    distinct, first, counts = np.unique(groups, return_index=True, return_counts=True)
+    position = first[:, None] + np.asarray(percentiles, dtype=np.float64)[None, :] / 100 * (counts[:, None] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    return distinct, values[low] + (values[high] - values[low]) * (position - low)
+
+
+def day_gaps(users, days):
+    """
+    Per user: first and last active day, active days, and the idle stretches
+    between consecutive active days (total idle days, number of gaps, longest gap).
+    """
+    first_day = int(days.min())
+    span = int(days.max()) - first_day + 1
+    # one int64 key per (user, day): a 1-D unique is much cheaper than unique(axis=0)
+    active = np.unique(users * span + (days - first_day))  # sorted by user, then day
+    user, day = active // span, active % span + first_day
+    distinct, first, counts = np.unique(user, return_index=True, return_counts=True)
+    same_user = user[1:] == user[:-1]
+    idle = (day[1:] - day[:-1] - 1)[same_user]
+    owner = np.searchsorted(distinct, user[1:][same_user])
+    longest = np.zeros(len(distinct), dtype=np.int64)
+    np.maximum.at(longest, owner, idle)
+    return {
+        "user": distinct,
+        "first_day": day[first],
+        "last_day": day[first + counts - 1],
+        "active_days": counts,
+        "idle_days": np.bincount(owner, weights=idle, minlength=len(distinct)).astype(np.int64),
+        "gaps": np.bincount(owner, weights=idle > 0, minlength=len(distinct)).astype(np.int64),
+        "longest_gap": longest,
+    }
+
+
+def rolling_daily(users, days, seconds, window):
+    """
+    A users x days grid of logged seconds and its trailing ``window``-day sums
+    (empty days count as zero). Returns (users, first day, daily, rolling).
+    """
+    distinct, row = np.unique(users, return_inverse=True)
+    first = int(days.min())
+    span = int(days.max()) - first + 1
+    flat = row.reshape(-1) * span + (days - first)
+    daily = np.bincount(flat, weights=seconds, minlength=len(distinct) * span).reshape(len(distinct), span)
+    totals = np.cumsum(daily, axis=1)
+    rolling = totals.copy()
+    rolling[:, window:] -= totals[:, :-window]
+    return distinct, first, daily, rolling
+
+
+def _emails(user_ids):
+    return dict(User.objects.filter(id__in=user_ids.tolist()).values_list("id", "email"))
+
+
+def _date(day_number):
+    return date.fromordinal(EPOCH_DAY + int(day_number))
+
+
+def _duration(seconds):
+    return timedelta(seconds=round(seconds, 6))
+
+
+def parse_percentiles(params):
+    if not params.get("percentiles"):
+        return DEFAULT_PERCENTILES
+    try:
+        values = tuple(float(p) for p in params["percentiles"].split(","))
+    except ValueError:
+        values = ()
+    if not values or not all(0 <= p <= 100 for p in values):
+        raise ValueError("percentiles must be between 0 and 100.")
+    return values
+
+
+def parse_window(params):
+    window = int(params.get("window") or 7)
+    if not 1 <= window <= MAX_WINDOW:
+        raise ValueError(f"window must be between 1 and {MAX_WINDOW} days.")
+    return window
+
+
+def time_stats_rows(columns, percentiles):
+    if not len(columns):
+        return []
+    users, totals, counts = group_sums(columns.user, columns.duration)
+    _, quantiles = grouped_percentiles(columns.user, columns.duration, percentiles)
+    emails = _emails(users)
+    return [
+        {
+            "user": user, "email": emails.get(user), "entries": count,
+            "total_time": _duration(total), "mean": _duration(total / count),
+            **{f"p{p:g}": _duration(value) for p, value in zip(percentiles, row)},
+        }
+        for user, total, count, row in zip(users.tolist(), totals.tolist(), counts.tolist(), quantiles.tolist())
+    ]
+
+
+def time_gaps_rows(columns):
+    if not len(columns):
+        return []
+    gaps = {key: values.tolist() for key, values in day_gaps(columns.user, columns.days).items()}
+    emails = _emails(np.asarray(gaps["user"]))
+    return [
+        {
+            "user": user, "email": emails.get(user), "first_day": _date(first), "last_day": _date(last),
+            "active_days": active, "idle_days": idle, "gaps": count, "longest_gap": longest,
+        }
+        for user, first, last, active, idle, count, longest in zip(
+            gaps["user"], gaps["first_day"], gaps["last_day"], gaps["active_days"],
+            gaps["idle_days"], gaps["gaps"], gaps["longest_gap"])
+    ]
+
+
+def rolling_time_rows(columns, window):
+    if not len(columns):
+        return []
+    users, first, daily, rolling = rolling_daily(columns.user, columns.days, columns.duration, window)
+    # each user's rows run from their first to their last active day
+    active = daily > 0
+    columns_idx = np.arange(daily.shape[1])
+    start = active.argmax(axis=1)
+    end = daily.shape[1] - 1 - active[:, ::-1].argmax(axis=1)
+    row, col = np.nonzero((columns_idx >= start[:, None]) & (columns_idx <= end[:, None]))
+    emails = _emails(users)
+    user_ids = users[row].tolist()
+    return [
+        {
+            "user": user, "email": emails.get(user), "day": _date(first + day),
+            "total_time": _duration(spent), "rolling_total": _duration(total),
+            "rolling_average": _duration(total / window),
+        }
+        for user, day, spent, total in zip(user_ids, col.tolist(), daily[row, col].tolist(), rolling[row, col].tolist())
+    ]
+
+
+def _deferred(rows, entries, *args):
+    # report builders stay lazy (report jobs call them to validate params), so load on first iteration
+    yield from rows(TimeColumns.load(entries), *args)
+
+
+def time_stats(params, project=None):
+    """Per user: entries, total, mean and ``?percentiles=`` of entry duration."""
+    return _deferred(time_stats_rows, entries_for(params, project), parse_percentiles(params)), None
+
+
+def time_gaps(params, project=None):
+    """Per user: active days and the idle days between them."""
+    return _deferred(time_gaps_rows, entries_for(params, project)), None
+
+
+def rolling_time(params, project=None):
+    """Per user and day: logged time and its trailing ``?window=`` day (default 7) sum and average."""
+    return _deferred(rolling_time_rows, entries_for(params, project), parse_window(params)), None
@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedTimeEntry, RollupCheckpoint, TimeEntry
+
+BOUNDARY = "time_entry_archive"
+CHUNK_SIZE = 1000
+DELETE_BATCH_SIZE = 900
+ENTRY_FIELDS = ("id", "task_id", "user_id", "description", "start_time", "end_time", "duration", "created_at")
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, "COLD_STORAGE_AFTER_DAYS", 365))
+
+
+def archive_boundary():
+    """Entries that started before this may be archived; None while nothing is."""
+    return RollupCheckpoint.objects.filter(name=BOUNDARY).values_list("position", flat=True).first()
+
+
+def time_entry_sources(start=None):
+    """
+    The entry tables a read over entries starting at or after ``start`` has to
+    combine. The archive only joins in when ``start`` reaches before its boundary.
+    """
+    sources = [TimeEntry.objects.all()]
+    boundary = archive_boundary()
+    if boundary is not None and (start is None or start < boundary):
+        sources.append(ArchivedTimeEntry.objects.all())
+    return sources
+
+
+def _advance_boundary(cutoff):
+    checkpoint, created = (RollupCheckpoint.objects.select_for_update()
+                           .get_or_create(name=BOUNDARY, defaults={"position": cutoff}))
+    if not created and checkpoint.position < cutoff:
+        checkpoint.position = cutoff
+        checkpoint.save(update_fields=["position"])
+
+
+def _delete_batch_size():
+    # one bound parameter per id; older SQLite builds refuse more than 999 in a statement
+    return min(DELETE_BATCH_SIZE, connection.features.max_query_params or DELETE_BATCH_SIZE)
+
+
+def _delete_entries(ids):
+    # plain SQL: delete() would run the post_delete receivers and take the time out of every total
+    table = connection.ops.quote_name(TimeEntry._meta.db_table)
+    size = _delete_batch_size()
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), size):
+            batch = ids[start:start + size]
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})", batch)
+
+
+def archivable_time_entries(cutoff):
+    return TimeEntry.objects.filter(start_time__lt=cutoff, end_time__isnull=False, duration__isnull=False)
+
+
+def archive_time_entries(cutoff, chunk_size=CHUNK_SIZE):
+    """
+    Moves finished entries that started before ``cutoff`` into
+    ArchivedTimeEntry, one chunk per transaction. Running totals, daily
+    rollups and workloads keep counting them. Returns how many were moved.
+    """
+    candidates = archivable_time_entries(cutoff)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # readers must know about the archive before the first row leaves the hot table
+            _advance_boundary(cutoff)
+            rows = list(candidates.order_by("id").values(*ENTRY_FIELDS)[:chunk_size])
+            if rows:
+                ArchivedTimeEntry.objects.bulk_create([ArchivedTimeEntry(**row) for row in rows])
+                _delete_entries([row["id"] for row in rows])
+        if not rows:
+            return moved
+        moved += len(rows)
@@ -0,0 +1,19 @@
+import threading
+
+from django.db import close_old_connections, connection, transaction
+
+
+def _run(func, args):
+    close_old_connections()
+    try:
+        func(*args)
+    finally:
+        # worker threads get their own connection; don't leak it
+        connection.close()
+
+
+def run_after_commit(func, *args):
+    """Runs ``func(*args)`` in a daemon thread once the current transaction commits."""
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run, args=(func, args), daemon=True).start()
+    )
@@ -0,0 +1,257 @@
+import csv
+import io
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils.text import slugify
+
+from .models import Category
+from .report_cache import bump_versions
+from .tree import invalidate_category_tree
+from .stats import rebuild_category_stats
+
+BATCH_SIZE = 1000
+LOOKUP_CHUNK = 5000
+
+
+class TaxonomyError(ValueError):
+    pass
+
+
+def _chunks(items, size=LOOKUP_CHUNK):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _next_tree_id():
+    return (Category.objects.aggregate(m=Max("tree_id"))["m"] or 0) + 1
+
+
+def flatten_nested(nodes, parent_slug=None):
+    """Turns nested ``{"name", "slug", "description", "children"}`` dicts into flat records."""
+    records = []
+    stack = [(node, parent_slug) for node in reversed(nodes)]
+    while stack:
+        node, parent = stack.pop()
+        if not isinstance(node, dict) or not node.get("name"):
+            raise TaxonomyError("Every node needs a name.")
+        slug = node.get("slug") or slugify(f"{parent or ''} {node['name']}")[:160]
+        records.append({
+            "name": node["name"],
+            "slug": slug,
+            "description": node.get("description", ""),
+            "parent": parent,
+        })
+        stack.extend((child, slug) for child in reversed(node.get("children") or []))
+    return records
+
+
+def read_csv(stream, parent_slug=None):
+    """Reads ``name,slug,parent,description`` rows; ``parent`` is a slug in the file or in the db."""
+    if isinstance(stream, bytes):
+        stream = io.StringIO(stream.decode("utf-8-sig"))
+    records = []
+    for row in csv.DictReader(stream):
+        if not row.get("name"):
+            raise TaxonomyError("Every row needs a name.")
+        records.append({
+            "name": row["name"].strip(),
+            "slug": (row.get("slug") or "").strip() or slugify(row["name"])[:160],
+            "description": row.get("description") or "",
+            "parent": (row.get("parent") or "").strip() or parent_slug,
+        })
+    return records
+
+
+def _rebuild_trees(tree_ids):
+    for tree_id in sorted(tree_ids):
+        Category.objects.partial_rebuild(tree_id)
+
+
+def _refresh_paths(tree_ids):
+    """Recomputes materialized paths for whole trees, writing only rows that changed."""
+    paths = {None: ("/", [])}
+    changed = []
+    for chunk in _chunks(sorted(tree_ids), 500):
+        qs = (Category.objects.filter(tree_id__in=chunk).order_by("tree_id", "lft")
+              .only("id", "parent_id", "name", "path_ids", "path_names"))
+        for node in qs.iterator(chunk_size=2000):
+            ids, names = paths[node.parent_id]
+            path_ids, path_names = f"{ids}{node.id}/", names + [node.name]
+            paths[node.id] = (path_ids, path_names)
+            if node.path_ids != path_ids or node.path_names != path_names:
+                node.path_ids, node.path_names = path_ids, path_names
+                changed.append(node)
+    Category.objects.bulk_update(changed, ["path_ids", "path_names"], batch_size=BATCH_SIZE)
+
+
+def import_taxonomy(records):
+    """
+    Inserts flat taxonomy records level by level with bulk_create, bypassing
+    per-row MPTT renumbering, then runs one partial_rebuild per touched tree.
+    Returns counters including throughput.
+    """
+    started = time.monotonic()
+    by_slug = {}
+    for record in records:
+        if record["slug"] in by_slug:
+            raise TaxonomyError(f"Duplicate slug in import: {record['slug']}")
+        by_slug[record["slug"]] = record
+
+    existing_parents = {}
+    external = {r["parent"] for r in records if r["parent"] and r["parent"] not in by_slug}
+    for chunk in _chunks(external):
+        for parent in Category.objects.filter(slug__in=chunk).only("id", "tree_id", "level", "slug"):
+            existing_parents[parent.slug] = parent
+    missing = external - existing_parents.keys()
+    if missing:
+        raise TaxonomyError(f"Unknown parent slugs: {', '.join(sorted(missing)[:20])}")
+    for chunk in _chunks(by_slug):
+        taken = list(Category.objects.filter(slug__in=chunk).values_list("slug", flat=True)[:20])
+        if taken:
+            raise TaxonomyError(f"Slugs already exist: {', '.join(taken)}")
+
+    depth = {}
+    for slug in by_slug:
+        chain = []
+        while slug not in depth:
+            if slug in chain:
+                raise TaxonomyError(f"Parent cycle involving {slug}")
+            chain.append(slug)
+            parent = by_slug[slug]["parent"]
+            if parent not in by_slug:
+                depth[slug] = 0
+                break
+            slug = parent
+        for s in reversed(chain):
+            if s not in depth:
+                depth[s] = depth[by_slug[s]["parent"]] + 1
+
+    levels = defaultdict(list)
+    for slug, d in depth.items():
+        levels[d].append(by_slug[slug])
+
+    created = {}
+    touched_trees = set()
+    next_tree_id = None
+    with transaction.atomic():
+        for d in sorted(levels):
+            batch = []
+            for record in levels[d]:
+                parent = created.get(record["parent"]) or existing_parents.get(record["parent"])
+                if parent is None:
+                    if next_tree_id is None:
+                        next_tree_id = _next_tree_id()
+                    tree_id, level = next_tree_id, 0
+                    next_tree_id += 1
+                else:
+                    tree_id, level = parent.tree_id, parent.level + 1
+                # lft/rght are placeholders until partial_rebuild below
+                node = Category(
+                    name=record["name"], slug=record["slug"], description=record["description"],
+                    parent=parent, tree_id=tree_id, level=level, lft=0, rght=0,
+                )
+                created[record["slug"]] = node
+                batch.append(node)
+                touched_trees.add(tree_id)
+            Category.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+
+        _rebuild_trees(touched_trees)
+        _refresh_paths(touched_trees)
+        transaction.on_commit(invalidate_category_tree)
+        bump_versions()
+
+    seconds = time.monotonic() - started
+    return {
+        "created": len(created),
+        "trees_rebuilt": len(touched_trees),
+        "seconds": round(seconds, 3),
+        "nodes_per_second": round(len(created) / seconds, 1) if seconds else None,
+    }
+
+
+def batch_move(moves):
+    """
+    Applies ``{category_id: new_parent_id_or_None}`` in one transaction. Parent
+    links are written with bulk_update, subtrees are re-assigned to their new
+    tree_id and each affected tree gets a single partial_rebuild.
+    """
+    moves = {int(k): (int(v) if v is not None else None) for k, v in moves.items()}
+    ids = set(moves) | {p for p in moves.values() if p is not None}
+    nodes = Category.objects.in_bulk(ids)
+    missing = ids - nodes.keys()
+    if missing:
+        raise TaxonomyError(f"Unknown categories: {', '.join(map(str, sorted(missing)))}")
+
+    # cycle check on the final forest, using the stored paths for unmoved ancestors
+    for node_id in moves:
+        seen = set()
+        current = moves[node_id]
+        while current is not None:
+            if current == node_id:
+                raise TaxonomyError(f"Cannot move category {node_id} into its own descendant.")
+            if current in seen:
+                break
+            seen.add(current)
+            if current in moves:
+                current = moves[current]
+                continue
+            ancestors = [int(x) for x in nodes[current].path_ids.strip("/").split("/") if x]
+            hop = None
+            for ancestor in reversed(ancestors[:-1]):
+                if ancestor == node_id:
+                    raise TaxonomyError(f"Cannot move category {node_id} into its own descendant.")
+                if ancestor in moves:
+                    hop = ancestor
+                    break
+            current = moves[hop] if hop is not None else None
+
+    with transaction.atomic():
+        touched_trees = {nodes[i].tree_id for i in ids}
+        moved = []
+        for node_id, parent_id in moves.items():
+            node = nodes[node_id]
+            node.parent_id = parent_id
+            moved.append(node)
+        Category.objects.bulk_update(moved, ["parent"], batch_size=BATCH_SIZE)
+
+        new_roots = {node_id for node_id, parent_id in moves.items() if parent_id is None}
+        children = defaultdict(list)
+        roots = []
+        tree_of = {}
+        for node_id, parent_id, tree_id in (Category.objects.filter(tree_id__in=touched_trees)
+                                            .values_list("id", "parent_id", "tree_id")):
+            tree_of[node_id] = tree_id
+            if parent_id is None:
+                roots.append(node_id)
+            else:
+                children[parent_id].append(node_id)
+
+        next_tree_id = _next_tree_id()
+        retree = defaultdict(list)
+        for root_id in roots:
+            tree_id = tree_of[root_id]
+            if root_id in new_roots:
+                tree_id = next_tree_id
+                next_tree_id += 1
+            touched_trees.add(tree_id)
+            stack = [root_id]
+            while stack:
+                node_id = stack.pop()
+                if tree_of[node_id] != tree_id:
+                    retree[tree_id].append(node_id)
+                stack.extend(children[node_id])
+        for tree_id, node_ids in retree.items():
+            for chunk in _chunks(node_ids):
+                Category.objects.filter(id__in=chunk).update(tree_id=tree_id)
+
+        _rebuild_trees(touched_trees)
+        _refresh_paths(touched_trees)
+        rebuild_category_stats(touched_trees)
+        transaction.on_commit(invalidate_category_tree)
+        bump_versions()
+
+    return {"moved": len(moves), "trees_rebuilt": len(touched_trees)}
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .background import run_after_commit
+from .models import CategoryStats, CloneJob, Project, Task, TaskAssignment, TaskStatusChange, path_to_ids
+from .report_cache import bump_versions
+from .rollup import rebuild_project_rollups
+from .workload import rebuild_workloads
+
+BATCH_SIZE = 2000
+
+
+def async_clone_threshold():
+    return getattr(settings, "PROJECT_CLONE_ASYNC_THRESHOLD", 10000)
+
+
+def clone_project(project, owner, title=None, team_id=None, include_assignments=False):
+    """
+    Deep-copies a project's task tree, dependency edges and (optionally)
+    assignments. Every step is a bulk statement driven by an old->new task id
+    map, so the query count does not grow with the number of tasks.
+    """
+    with transaction.atomic():
+        cloned = Project.objects.create(
+            title=title or f"{project.title} (Clone)",
+            description=project.description,
+            owner=owner,
+            category=project.category,
+            is_template=False,
+            config=project.config,
+            team_id=team_id if team_id is not None else project.team_id,
+        )
+
+        source = list(project.tasks.order_by().values_list("id", "parent_id", "title", "description", "order"))
+        new_tasks = [
+            Task(project=cloned, title=row[2], description=row[3], order=row[4])
+            for row in source
+        ]
+        Task.objects.bulk_create(new_tasks, batch_size=BATCH_SIZE)
+        id_map = {row[0]: task.pk for row, task in zip(source, new_tasks)}
+
+        with_parent = []
+        for (_, parent_id, *_), task in zip(source, new_tasks):
+            if parent_id in id_map:
+                task.parent_id = id_map[parent_id]
+                with_parent.append(task)
+        Task.objects.bulk_update(with_parent, ["parent"], batch_size=BATCH_SIZE)
+        TaskStatusChange.record([(task.pk, cloned.pk, None, task.status) for task in new_tasks])
+
+        Edge = Task.dependencies.through
+        edges = Edge.objects.filter(from_task__project=project).values_list("from_task_id", "to_task_id")
+        Edge.objects.bulk_create([
+            Edge(from_task_id=id_map[src], to_task_id=id_map[dst])
+            for src, dst in edges.iterator(chunk_size=BATCH_SIZE) if dst in id_map
+        ], batch_size=BATCH_SIZE)
+        Task.objects.filter(project=cloned).refresh_open_dependency_counts()
+        rebuild_project_rollups([cloned.pk])
+        bump_versions([cloned.pk])
+
+        if include_assignments:
+            assignments = TaskAssignment.objects.filter(task__project=project).values_list("task_id", "user_id")
+            TaskAssignment.objects.bulk_create([
+                TaskAssignment(task_id=id_map[task_id], user_id=user_id)
+                for task_id, user_id in assignments.iterator(chunk_size=BATCH_SIZE)
+            ], batch_size=BATCH_SIZE)
+            rebuild_workloads([cloned.pk])
+
+        # bulk_create skips the post_save handlers that maintain CategoryStats
+        if cloned.category_id and new_tasks:
+            CategoryStats.apply_delta(path_to_ids(cloned.category.path_ids), task_count=len(new_tasks))
+    return cloned
+
+
+def _run_clone_job(job_id):
+    job = CloneJob.objects.select_related("source", "requested_by").get(pk=job_id)
+    job.status = CloneJob.Status.RUNNING
+    job.save(update_fields=["status"])
+    try:
+        job.result = clone_project(job.source, job.requested_by, **job.options)
+        job.status = CloneJob.Status.DONE
+    except Exception as exc:
+        job.status = CloneJob.Status.FAILED
+        job.error = str(exc)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+
+
+def start_clone_job(project, user, **options):
+    job = CloneJob.objects.create(source=project, requested_by=user, options=options)
+    run_after_commit(_run_clone_job, job.pk)
+    return job
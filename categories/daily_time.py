@@ -0,0 +1,119 @@
+import heapq
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import time_entry_sources
+from .models import DailyTimeRollup, RollupCheckpoint, TimeEntry
+from .report_cache import bump_versions
+
+CHECKPOINT = "daily_time"
+# a transaction can commit an updated_at older than the saved mark; every refresh re-reads this window
+OVERLAP = timedelta(minutes=5)
+KEY_CHUNK = 500
+BATCH_SIZE = 1000
+_row_key = itemgetter("day", "user_id", "task_id")
+
+
+def sync_on_save():
+    return getattr(settings, "TIME_ROLLUP_SYNC", True)
+
+
+def entry_key(start_time, user_id, task_id):
+    return timezone.localdate(start_time), user_id, task_id
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _grouped(entries):
+    return (entries.filter(duration__isnull=False).order_by()
+            .annotate(day=TruncDate("start_time"))
+            .values("day", "user_id", "task_id", "task__project_id")
+            .annotate(total=Sum("duration"), count=Count("id")))
+
+
+def _combined(sources, **filters):
+    """_grouped rows over several entry tables (live and archived), summed per key."""
+    streams = [_grouped(entries.filter(**filters)).order_by("day", "user_id", "task_id").iterator(chunk_size=5000)
+               for entries in sources]
+    for _, rows in groupby(heapq.merge(*streams, key=_row_key), key=_row_key):
+        row, *more = rows
+        if more:
+            row = {**row, "total": sum((r["total"] for r in more), row["total"]),
+                   "count": row["count"] + sum(r["count"] for r in more)}
+        yield row
+
+
+def _rollup_row(row):
+    return DailyTimeRollup(day=row["day"], user_id=row["user_id"], task_id=row["task_id"],
+                           project_id=row["task__project_id"], total_duration=row["total"],
+                           entry_count=row["count"])
+
+
+def recompute_keys(keys):
+    """Rewrites the rollup rows for the given (day, user_id, task_id) keys from their entries."""
+    keys = sorted(k for k in set(keys) if k[1] and k[2])
+    written = 0
+    with transaction.atomic():
+        for i in range(0, len(keys), KEY_CHUNK):
+            chunk = set(keys[i:i + KEY_CHUNK])
+            days = [k[0] for k in chunk]
+            users = {k[1] for k in chunk}
+            tasks = {k[2] for k in chunk}
+            start = _day_start(min(days))
+            grouped = _combined(
+                time_entry_sources(start), user_id__in=users, task_id__in=tasks,
+                start_time__gte=start, start_time__lt=_day_start(max(days) + timedelta(days=1)),
+            )
+            rows = [_rollup_row(r) for r in grouped if _row_key(r) in chunk]
+            stale = (DailyTimeRollup.objects
+                     .filter(user_id__in=users, task_id__in=tasks, day__gte=min(days), day__lte=max(days))
+                     .values_list("id", "day", "user_id", "task_id"))
+            stale_ids = [row_id for row_id, *key in stale if tuple(key) in chunk]
+            DailyTimeRollup.objects.filter(id__in=stale_ids).delete()
+            DailyTimeRollup.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+            written += len(rows)
+    return written
+
+
+def rebuild_daily_time():
+    DailyTimeRollup.objects.all().delete()
+    batch, written = [], 0
+    for row in _combined(time_entry_sources()):
+        batch.append(_rollup_row(row))
+        if len(batch) >= BATCH_SIZE:
+            DailyTimeRollup.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    DailyTimeRollup.objects.bulk_create(batch)
+    return written + len(batch)
+
+
+def refresh_daily_time(full=False):
+    """
+    Brings DailyTimeRollup up to date with entries written since the last
+    refresh (by updated_at). Without a checkpoint, or with ``full``, the
+    table is rebuilt. Returns (mode, rollup rows written).
+    """
+    with transaction.atomic():
+        started = timezone.now()
+        checkpoint = RollupCheckpoint.objects.select_for_update().filter(name=CHECKPOINT).first()
+        if full or checkpoint is None:
+            mode, written = "full", rebuild_daily_time()
+        else:
+            changed = (TimeEntry.objects.filter(updated_at__gte=checkpoint.position - OVERLAP)
+                       .values_list("start_time", "user_id", "task_id"))
+            keys = {entry_key(*row) for row in changed.iterator(chunk_size=5000)}
+            mode, written = "incremental", recompute_keys(keys)
+        RollupCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={"position": started})
+        if written:
+            bump_versions()
+    return mode, written
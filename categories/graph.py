@@ -0,0 +1,179 @@
+from array import array
+from collections import defaultdict, deque
+
+from django.db import connection
+from django.db.models import Q, Sum
+
+from .archive import time_entry_sources
+from .models import Task
+
+
+class DependencyGraph:
+    """
+    A project's task dependency graph held as CSR adjacency arrays.
+
+    Edges are loaded with one query. ``A depends on B`` is stored as
+    B -> A in ``succ`` (prerequisite first) and A -> B in ``pred``. Tasks of
+    other projects that are linked by an edge are included as nodes.
+    """
+
+    def __init__(self, nodes, statuses, titles, edges, members=None):
+        self.ids = nodes
+        self.index = {task_id: i for i, task_id in enumerate(nodes)}
+        self.statuses = statuses
+        self.titles = titles
+        self.members = members if members is not None else [True] * len(nodes)
+        n = len(nodes)
+        pairs = [(self.index[dep], self.index[task]) for task, dep in edges]
+        self.succ_offsets, self.succ = self._csr(n, pairs)
+        self.pred_offsets, self.pred = self._csr(n, [(b, a) for a, b in pairs])
+
+    @staticmethod
+    def _csr(n, pairs):
+        offsets = array("i", [0]) * (n + 1)
+        for a, _ in pairs:
+            offsets[a + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        targets = array("i", [0]) * len(pairs)
+        fill = array("i", offsets)
+        for a, b in pairs:
+            targets[fill[a]] = b
+            fill[a] += 1
+        return offsets, targets
+
+    @classmethod
+    def for_project(cls, project_id):
+        Edge = Task.dependencies.through
+        edges = list(
+            Edge.objects.filter(Q(from_task__project_id=project_id) | Q(to_task__project_id=project_id))
+            .values_list("from_task_id", "to_task_id")
+        )
+        external = {t for edge in edges for t in edge}
+        rows = Task.objects.filter(Q(project_id=project_id) | Q(id__in=external)).order_by("id")
+        nodes, statuses, titles, members = [], [], [], []
+        for task_id, status, title, task_project_id in rows.values_list("id", "status", "title", "project_id"):
+            nodes.append(task_id)
+            statuses.append(status)
+            titles.append(title)
+            members.append(task_project_id == project_id)
+        return cls(nodes, statuses, titles, edges, members)
+
+    @classmethod
+    def reachable_from(cls, task_ids):
+        """
+        ``task_ids`` and every task they depend on, directly or through a
+        chain, in any project, with the edges among them. One recursive query;
+        cycle checks use this since a cycle may leave the project and come back.
+        """
+        task_ids = list(task_ids)
+        if not task_ids:
+            return cls([], [], [], [])
+        Edge = Task.dependencies.through
+        edge_table = connection.ops.quote_name(Edge._meta.db_table)
+        task_table = connection.ops.quote_name(Task._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE reached(id) AS (
+                    SELECT id FROM {task_table} WHERE id IN ({', '.join(['%s'] * len(task_ids))})
+                    UNION
+                    SELECT e.to_task_id FROM {edge_table} e JOIN reached r ON e.from_task_id = r.id
+                )
+                SELECT e.from_task_id, e.to_task_id FROM {edge_table} e
+                WHERE e.from_task_id IN (SELECT id FROM reached)
+            """, task_ids)
+            edges = cursor.fetchall()
+        rows = list(Task.objects.filter(id__in=set(task_ids) | {t for edge in edges for t in edge})
+                    .order_by("id").values_list("id", "status", "title"))
+        return cls([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], edges)
+
+    def _neighbours(self, offsets, targets, i):
+        return targets[offsets[i]:offsets[i + 1]]
+
+    def topological_order(self):
+        """Kahn's algorithm; returns (ordered task ids, ids left on a cycle)."""
+        n = len(self.ids)
+        indegree = array("i", (self.pred_offsets[i + 1] - self.pred_offsets[i] for i in range(n)))
+        queue = deque(i for i in range(n) if indegree[i] == 0)
+        order = []
+        while queue:
+            i = queue.popleft()
+            order.append(i)
+            for j in self._neighbours(self.succ_offsets, self.succ, i):
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    queue.append(j)
+        cyclic = [self.ids[i] for i in range(n) if indegree[i] > 0]
+        return [self.ids[i] for i in order], cyclic
+
+    def has_cycle(self):
+        return bool(self.topological_order()[1])
+
+    def would_create_cycle(self, task_id, dependency_ids):
+        """True if making ``task_id`` depend on ``dependency_ids`` closes a cycle."""
+        if task_id in dependency_ids:
+            return True
+        if task_id not in self.index:
+            return False
+        target = self.index[task_id]
+        seen = set()
+        stack = [self.index[d] for d in dependency_ids if d in self.index]
+        while stack:
+            i = stack.pop()
+            if i == target:
+                return True
+            if i in seen:
+                continue
+            seen.add(i)
+            stack.extend(self._neighbours(self.pred_offsets, self.pred, i))
+        return False
+
+    def unblocked(self):
+        """Open project tasks whose dependencies are all done."""
+        done = Task.Status.DONE
+        return [
+            self.ids[i] for i in range(len(self.ids))
+            if self.members[i] and self.statuses[i] != done
+            and all(self.statuses[j] == done for j in self._neighbours(self.pred_offsets, self.pred, i))
+        ]
+
+    def critical_path(self, weights=None, default_weight=1):
+        """
+        Longest weighted chain through the graph. ``weights`` maps task id to a
+        number, other tasks weigh ``default_weight``. Returns (task ids, total).
+        """
+        order, cyclic = self.topological_order()
+        if cyclic:
+            raise ValueError("Dependency graph has a cycle.")
+        weights = weights or {}
+        n = len(self.ids)
+        best = [0.0] * n
+        prev = [-1] * n
+        for task_id in order:
+            i = self.index[task_id]
+            best[i] += weights.get(task_id, default_weight)
+            for j in self._neighbours(self.succ_offsets, self.succ, i):
+                # the first predecessor is always linked, so zero-weight tasks stay on the chain
+                if prev[j] == -1 or best[i] > best[j]:
+                    best[j] = best[i]
+                    prev[j] = i
+        if not n:
+            return [], 0
+        end = max(range(n), key=best.__getitem__)
+        path = []
+        i = end
+        while i != -1:
+            path.append(self.ids[i])
+            i = prev[i]
+        return path[::-1], best[end]
+
+
+def logged_hours(task_ids):
+    hours = defaultdict(float)
+    for entries in time_entry_sources():
+        rows = (entries.filter(task_id__in=task_ids).values("task_id")
+                .annotate(total=Sum("duration")).values_list("task_id", "total"))
+        for task_id, total in rows:
+            if total:
+                hours[task_id] += total.total_seconds() / 3600
+    return dict(hours)
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from activity.archive import archivable_activities, archive_activities
+from categories.archive import CHUNK_SIZE, archivable_time_entries, archive_time_entries, default_cutoff
+
+TABLES = {
+    "time": (archivable_time_entries, archive_time_entries),
+    "activity": (archivable_activities, archive_activities),
+}
+
+
+class Command(BaseCommand):
+    help = ("Moves finished time entries and read activity older than the cutoff into the archive tables, "
+            "in chunks. Totals and rollups are unchanged; reports read the archive for older ranges.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="archive rows older than this many days (default COLD_STORAGE_AFTER_DAYS)")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument("--only", choices=sorted(TABLES), help="archive just one of the tables")
+        parser.add_argument("--dry-run", action="store_true", help="only count the rows that would move")
+
+    def handle(self, *args, **options):
+        cutoff = default_cutoff() if options["days"] is None else timezone.now() - timedelta(days=options["days"])
+        for label, (archivable, archive) in TABLES.items():
+            if options["only"] and label != options["only"]:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(f"{label}: {archivable(cutoff).count()} rows older than {cutoff:%Y-%m-%d}")
+                continue
+            moved = archive(cutoff, chunk_size=options["chunk_size"])
+            self.stdout.write(self.style.SUCCESS(f"{label}: archived {moved} rows older than {cutoff:%Y-%m-%d}"))
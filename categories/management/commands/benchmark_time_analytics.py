@@ -0,0 +1,116 @@
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum, Window
+from django.db.models.functions import Lag, TruncDate
+from django.utils import timezone
+
+from categories import analytics
+from categories.models import Project, Task, TimeEntry
+
+User = get_user_model()
+
+
+def _orm_user_totals(entries):
+    return list(entries.values("user_id").annotate(total=Sum("duration")))
+
+
+def _orm_daily_diff(entries):
+    return list(entries.annotate(day=TruncDate("start_time")).values("user_id", "day")
+                .annotate(total=Sum("duration"))
+                .annotate(prev=Window(Lag(Sum("duration")), partition_by=[F("user_id")], order_by=F("day").asc()))
+                .order_by("user_id", "day"))
+
+
+def _python_percentiles(entries, percentiles):
+    durations = defaultdict(list)
+    for user_id, spent in entries.values_list("user_id", "duration").iterator(chunk_size=5000):
+        durations[user_id].append(spent.total_seconds())
+    return {user_id: np.percentile(values, percentiles) for user_id, values in durations.items()}
+
+
+def _python_gaps(entries):
+    days = defaultdict(list)
+    for user_id, day in (entries.annotate(day=TruncDate("start_time")).values_list("user_id", "day")
+                         .distinct().order_by("user_id", "day")):
+        days[user_id].append(day)
+    return {user_id: max([(b - a).days - 1 for a, b in zip(d, d[1:])], default=0) for user_id, d in days.items()}
+
+
+def _numpy_daily_diff(columns):
+    _, _, daily, _ = analytics.rolling_daily(columns.user, columns.days, columns.duration, 1)
+    return np.diff(daily, axis=1)
+
+
+class Command(BaseCommand):
+    help = "Times the NumPy time analytics against the ORM / row-by-row versions of the same numbers."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--synthetic", type=int, default=0, metavar="N",
+                            help="run against N generated entries (rolled back afterwards)")
+        parser.add_argument("--users", type=int, default=50, help="users for --synthetic")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["synthetic"]:
+                self.generate(options["synthetic"], options["users"])
+            self.run(options["repeat"])
+            transaction.set_rollback(True)
+
+    def generate(self, count, user_count):
+        owner = User.objects.create_user("benchmark-owner@example.invalid", None)
+        users = [owner] + [User.objects.create_user(f"benchmark-{i}@example.invalid", None)
+                           for i in range(user_count - 1)]
+        project = Project.objects.create(title="Benchmark", owner=owner)
+        tasks = Task.objects.bulk_create([Task(project=project, title=f"Task {i}") for i in range(200)])
+        start = timezone.now() - timedelta(days=365)
+        rng = random.Random(0)
+        batch = []
+        for _ in range(count):
+            begin = start + timedelta(seconds=rng.randrange(365 * 86400))
+            spent = timedelta(minutes=rng.randrange(5, 480))
+            batch.append(TimeEntry(task=rng.choice(tasks), user=rng.choice(users),
+                                   start_time=begin, end_time=begin + spent, duration=spent))
+            if len(batch) >= 5000:
+                TimeEntry.objects.bulk_create(batch)
+                batch = []
+        TimeEntry.objects.bulk_create(batch)
+
+    def timed(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run(self, repeat):
+        entries = TimeEntry.objects.filter(duration__isnull=False).order_by()
+        load, columns = self.timed(lambda: analytics.TimeColumns.load(entries), repeat)
+        columns.days  # computed once, reused by every report below
+        self.stdout.write(f"{len(columns)} entries, load into arrays: {load:.3f}s")
+        percentiles = analytics.DEFAULT_PERCENTILES
+        cases = [
+            ("per-user totals", lambda: _orm_user_totals(entries),
+             lambda: analytics.group_sums(columns.user, columns.duration)),
+            ("per-user daily totals + previous day", lambda: _orm_daily_diff(entries),
+             lambda: _numpy_daily_diff(columns)),
+            ("per-user percentiles", lambda: _python_percentiles(entries, percentiles),
+             lambda: analytics.grouped_percentiles(columns.user, columns.duration, percentiles)),
+            ("per-user longest gap", lambda: _python_gaps(entries),
+             lambda: analytics.day_gaps(columns.user, columns.days)),
+        ]
+        self.stdout.write(f"{'report':<40}{'orm':>10}{'numpy':>10}{'speedup':>10}")
+        for name, orm, vectorized in cases:
+            orm_time, _ = self.timed(orm, repeat)
+            numpy_time, _ = self.timed(vectorized, repeat)
+            speedup = orm_time / numpy_time if numpy_time else float("inf")
+            self.stdout.write(f"{name:<40}{orm_time:>9.3f}s{numpy_time:>9.3f}s{speedup:>9.1f}x")
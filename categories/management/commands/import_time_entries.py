@@ -0,0 +1,46 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from categories.models import Task
+from categories.time_import import TimeEntryImport, guess_format, iter_rows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Streams time entries from CSV or NDJSON "
+            "(task,user,start_time,end_time,duration,description) into TimeEntry.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+        parser.add_argument("--user", help="email used for rows without a user column")
+
+    def handle(self, *args, **options):
+        default_user = None
+        if options["user"]:
+            default_user = User.objects.filter(email__iexact=options["user"]).first()
+            if default_user is None:
+                raise CommandError(f"Unknown user {options['user']}")
+        users = {email.lower(): pk for email, pk in User.objects.values_list("email", "pk")}
+        tasks = dict(Task.objects.values_list("id", "project_id"))
+        importer = TimeEntryImport(tasks, user=default_user, users_by_email=users)
+
+        path = options["path"]
+        fmt = options["format"] or guess_format(path)
+        try:
+            with open(path, encoding="utf-8-sig", newline="") as fh:
+                report = importer.run(iter_rows(fh, fmt))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise CommandError(f"{exc} (imported {importer.imported} entries before it)")
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Imported {imported} entries, rejected {rejected} in {seconds}s "
+            "({rows_per_second} rows/s)".format(**report)
+        ))
+        for error in report["errors"]:
+            self.stdout.write(f"line {error['line']}: {error['error']}")
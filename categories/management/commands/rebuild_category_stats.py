@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from categories.stats import rebuild_category_stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the CategoryStats subtree rollups from tasks and time entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tree", type=int, action="append", dest="trees",
+                            help="limit to an MPTT tree_id (repeatable)")
+
+    def handle(self, *args, **options):
+        count = rebuild_category_stats(options["trees"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} categories"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from categories.models import Project
+from categories.rollup import rebuild_project_rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the rolled-up subtask progress and time stored on tasks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, action="append", dest="projects",
+                            help="limit to a project id (repeatable)")
+
+    def handle(self, *args, **options):
+        project_ids = options["projects"] or Project.objects.values_list("id", flat=True)
+        count = rebuild_project_rollups(list(project_ids))
+        self.stdout.write(self.style.SUCCESS(f"Updated rollups on {count} tasks"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from categories.models import Project
+from categories.workload import rebuild_workloads
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-project user workload rows from assignments and time entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project", type=int, action="append", dest="projects",
+                            help="limit to a project id (repeatable)")
+
+    def handle(self, *args, **options):
+        project_ids = options["projects"] or Project.objects.values_list("id", flat=True)
+        count = rebuild_workloads(project_ids)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} workload rows"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from categories.stats import reconcile_time_totals
+
+
+class Command(BaseCommand):
+    help = "Recomputes the running time totals stored on tasks and projects from time entries."
+
+    def handle(self, *args, **options):
+        drifted = reconcile_time_totals()
+        self.stdout.write(self.style.SUCCESS(
+            f"Fixed {drifted['tasks']} tasks and {drifted['projects']} projects"))
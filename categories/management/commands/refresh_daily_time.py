@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from categories.daily_time import refresh_daily_time
+
+
+class Command(BaseCommand):
+    help = "Refreshes the daily time rollup from entries changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="rebuild the whole table")
+
+    def handle(self, *args, **options):
+        mode, written = refresh_daily_time(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"{mode.capitalize()} refresh wrote {written} rollup rows"))
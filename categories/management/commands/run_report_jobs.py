@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from categories.models import ReportJob
+from categories.report_jobs import execute_job, notify
+
+
+class Command(BaseCommand):
+    help = "Runs queued report jobs in this process, e.g. those left pending by a restart."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="run at most this many jobs")
+        parser.add_argument("--requeue-after", type=int, default=None, metavar="MINUTES",
+                            help="first re-queue jobs stuck in running for longer than this")
+
+    def handle(self, *args, **options):
+        if options["requeue_after"] is not None:
+            cutoff = timezone.now() - timedelta(minutes=options["requeue_after"])
+            requeued = (ReportJob.objects.filter(status=ReportJob.Status.RUNNING, started_at__lt=cutoff)
+                        .update(status=ReportJob.Status.PENDING, started_at=None))
+            self.stdout.write(f"Re-queued {requeued} stuck jobs")
+
+        pending = ReportJob.objects.filter(status=ReportJob.Status.PENDING).order_by("created_at")
+        ran = 0
+        for job_id in pending.values_list("id", flat=True)[:options["limit"]]:
+            if execute_job(job_id):
+                notify(job_id)
+                ran += 1
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} report jobs"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('categories', 'Category')
+    paths = {None: ('/', [])}
+    nodes = list(Category.objects.order_by('tree_id', 'lft').only('id', 'parent_id', 'name'))
+    for node in nodes:
+        ids, names = paths[node.parent_id]
+        node.path_ids = f"{ids}{node.id}/"
+        node.path_names = names + [node.name]
+        paths[node.id] = (node.path_ids, node.path_names)
+    Category.objects.bulk_update(nodes, ['path_ids', 'path_names'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0003_alter_project_options_alter_task_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path_ids',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=512),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path_names',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
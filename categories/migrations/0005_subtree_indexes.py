@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0004_category_path'),
+        ('teams', '0002_alter_teammembership_role'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # django-mptt declares this index at class creation, outside migration state,
+        # so it is only created in the database here
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.AddIndex(
+                    model_name='category',
+                    index=models.Index(fields=['tree_id', 'lft'], name='categories_category_tree_i79f7'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='categories__categor_ea9a02_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:16
+
+import datetime
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def populate_stats(apps, schema_editor):
+    Category = apps.get_model('categories', 'Category')
+    CategoryStats = apps.get_model('categories', 'CategoryStats')
+    Task = apps.get_model('categories', 'Task')
+    TimeEntry = apps.get_model('categories', 'TimeEntry')
+
+    direct = defaultdict(lambda: [0, 0, 0, datetime.timedelta()])
+    for category_id, status in Task.objects.filter(project__category__isnull=False).values_list(
+            'project__category_id', 'status').iterator():
+        row = direct[category_id]
+        row[0] += 1
+        row[1] += status == 'done'
+        row[2] += status == 'in_progress'
+    for category_id, total in (TimeEntry.objects.filter(task__project__category__isnull=False)
+                               .values('task__project__category_id').annotate(total=models.Sum('duration'))
+                               .values_list('task__project__category_id', 'total')):
+        direct[category_id][3] += total or datetime.timedelta()
+
+    totals = defaultdict(lambda: [0, 0, 0, datetime.timedelta()])
+    for category_id, path_ids in Category.objects.values_list('id', 'path_ids').iterator():
+        totals[category_id]
+        if category_id not in direct:
+            continue
+        for ancestor in path_ids.strip('/').split('/'):
+            if ancestor:
+                row = totals[int(ancestor)]
+                for i, value in enumerate(direct[category_id]):
+                    row[i] += value
+    CategoryStats.objects.bulk_create([
+        CategoryStats(category_id=category_id, task_count=row[0], done_count=row[1],
+                      in_progress_count=row[2], total_time=row[3])
+        for category_id, row in totals.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0005_subtree_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='categories.category')),
+                ('task_count', models.IntegerField(default=0)),
+                ('done_count', models.IntegerField(default=0)),
+                ('in_progress_count', models.IntegerField(default=0)),
+                ('total_time', models.DurationField(default=datetime.timedelta)),
+            ],
+            options={
+                'verbose_name_plural': 'Category stats',
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
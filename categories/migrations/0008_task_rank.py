@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+GAP = 1 << 16
+
+
+def respace_orders(apps, schema_editor):
+    Task = apps.get_model('categories', 'Task')
+    batch = []
+    project_id, position = None, 0
+    for task in Task.objects.order_by('project_id', 'order', '-created_at', 'id').only('id', 'project_id', 'order').iterator():
+        if task.project_id != project_id:
+            project_id, position = task.project_id, 0
+        position += 1
+        task.order = position * GAP
+        batch.append(task)
+        if len(batch) >= 1000:
+            Task.objects.bulk_update(batch, ['order'])
+            batch = []
+    Task.objects.bulk_update(batch, ['order'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0007_clonejob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='order',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['project', 'order', 'id'], name='categories__project_341e31_idx'),
+        ),
+        migrations.RunPython(respace_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:24
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_counts(apps, schema_editor):
+    Task = apps.get_model('categories', 'Task')
+    Edge = Task.dependencies.through
+    open_count = (Edge.objects.filter(from_task=OuterRef('pk')).exclude(to_task__status='done').order_by()
+                  .values('from_task').annotate(n=Count('pk')).values('n'))
+    Task.objects.update(open_dependency_count=Coalesce(Subquery(open_count, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0008_task_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='open_dependency_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counts, migrations.RunPython.noop),
+    ]
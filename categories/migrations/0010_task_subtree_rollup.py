@@ -0,0 +1,62 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:26
+
+import datetime
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+POINTS = {'done': 100, 'in_progress': 50}
+
+
+def populate_rollups(apps, schema_editor):
+    Task = apps.get_model('categories', 'Task')
+    TimeEntry = apps.get_model('categories', 'TimeEntry')
+    parents, own = {}, {}
+    spent = dict(TimeEntry.objects.values('task_id').annotate(total=Sum('duration')).values_list('task_id', 'total'))
+    for task_id, parent_id, status in Task.objects.values_list('id', 'parent_id', 'status').iterator():
+        parents[task_id] = parent_id
+        own[task_id] = (POINTS.get(status, 0), spent.get(task_id) or timedelta())
+    totals = defaultdict(lambda: [0, 0, timedelta()])
+    for task_id, (points, duration) in own.items():
+        seen = set()
+        node = task_id
+        while node is not None and node not in seen:
+            seen.add(node)
+            total = totals[node]
+            total[0] += 1
+            total[1] += points
+            total[2] += duration
+            node = parents.get(node)
+    tasks = []
+    for task_id, (size, points, duration) in totals.items():
+        tasks.append(Task(id=task_id, subtree_size=size, subtree_progress=points, subtree_duration=duration))
+    Task.objects.bulk_update(tasks, ['subtree_size', 'subtree_progress', 'subtree_duration'], batch_size=1000)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0009_task_open_dependency_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='subtree_duration',
+            field=models.DurationField(default=datetime.timedelta, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtree_progress',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='subtree_size',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:27
+
+import datetime
+from django.db import migrations, models
+from django.db.models import DurationField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_totals(apps, schema_editor):
+    Project = apps.get_model('categories', 'Project')
+    Task = apps.get_model('categories', 'Task')
+    TimeEntry = apps.get_model('categories', 'TimeEntry')
+    # running timers have no duration yet; a task with only those keeps a zero total
+    entries = TimeEntry.objects.filter(duration__isnull=False).order_by()
+    task_time = entries.filter(task=OuterRef('pk')).values('task').annotate(total=Sum('duration')).values('total')
+    project_time = (entries.filter(task__project=OuterRef('pk'))
+                    .values('task__project').annotate(total=Sum('duration')).values('total'))
+    Task.objects.filter(time_entries__isnull=False).distinct().update(
+        total_duration=Coalesce(Subquery(task_time, output_field=DurationField()), Value(datetime.timedelta())))
+    Project.objects.filter(tasks__time_entries__isnull=False).distinct().update(
+        total_duration=Coalesce(Subquery(project_time, output_field=DurationField()), Value(datetime.timedelta())))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0010_task_subtree_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='total_duration',
+            field=models.DurationField(default=datetime.timedelta, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='total_duration',
+            field=models.DurationField(default=datetime.timedelta, editable=False),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:29
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def populate_rollup(apps, schema_editor):
+    TimeEntry = apps.get_model('categories', 'TimeEntry')
+    DailyTimeRollup = apps.get_model('categories', 'DailyTimeRollup')
+    RollupCheckpoint = apps.get_model('categories', 'RollupCheckpoint')
+    started = timezone.now()
+    rows = (TimeEntry.objects.filter(duration__isnull=False).order_by()
+            .annotate(day=TruncDate('start_time'))
+            .values('day', 'user_id', 'task_id', 'task__project_id')
+            .annotate(total=Sum('duration'), count=Count('id')))
+    DailyTimeRollup.objects.bulk_create((
+        DailyTimeRollup(day=r['day'], user_id=r['user_id'], task_id=r['task_id'], project_id=r['task__project_id'],
+                        total_duration=r['total'], entry_count=r['count'])
+        for r in rows.iterator(chunk_size=5000)
+    ), batch_size=1000)
+    RollupCheckpoint.objects.create(name='daily_time', position=started)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0011_time_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTimeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total_duration', models.DurationField(default=datetime.timedelta)),
+                ('entry_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(fields=['task', 'user', 'start_time'], name='categories__task_id_254134_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailytimerollup',
+            name='project',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='categories.project'),
+        ),
+        migrations.AddField(
+            model_name='dailytimerollup',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='categories.task'),
+        ),
+        migrations.AddField(
+            model_name='dailytimerollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='dailytimerollup',
+            index=models.Index(fields=['day'], name='categories__day_a4f82d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailytimerollup',
+            index=models.Index(fields=['user', 'day'], name='categories__user_id_1d9216_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailytimerollup',
+            index=models.Index(fields=['project', 'day'], name='categories__project_2df01f_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytimerollup',
+            constraint=models.UniqueConstraint(fields=('day', 'user', 'task'), name='daily_time_rollup_key'),
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
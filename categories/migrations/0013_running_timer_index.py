@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0012_daily_time_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeentry',
+            index=models.Index(condition=models.Q(('end_time__isnull', True)), fields=['user', 'start_time'], name='timeentry_running_user_idx'),
+        ),
+    ]
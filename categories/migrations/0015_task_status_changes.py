@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_history(apps, schema_editor):
+    # no history exists yet: each task gets its creation and, if it has moved on, one
+    # transition at its last update
+    Task = apps.get_model('categories', 'Task')
+    TaskStatusChange = apps.get_model('categories', 'TaskStatusChange')
+    batch = []
+    tasks = Task.objects.order_by().values_list('id', 'project_id', 'status', 'created_at', 'updated_at')
+    for task_id, project_id, status, created_at, updated_at in tasks.iterator(chunk_size=2000):
+        batch.append(TaskStatusChange(task_id=task_id, project_id=project_id, from_status='',
+                                      to_status='todo', changed_at=created_at))
+        if status != 'todo':
+            batch.append(TaskStatusChange(task_id=task_id, project_id=project_id, from_status='todo',
+                                          to_status=status, changed_at=updated_at))
+        if len(batch) >= 1000:
+            TaskStatusChange.objects.bulk_create(batch)
+            batch = []
+    TaskStatusChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0014_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('done', 'Done'), ('blocked', 'Blocked')], max_length=20)),
+                ('to_status', models.CharField(choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('done', 'Done'), ('blocked', 'Blocked')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='categories.project')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='categories.task')),
+            ],
+            options={
+                'ordering': ['changed_at', 'id'],
+                'indexes': [models.Index(fields=['project', 'changed_at'], name='categories__project_af40ba_idx'), models.Index(fields=['task', 'changed_at'], name='categories__task_id_8b0805_idx')],
+            },
+        ),
+        migrations.RunPython(seed_history, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-18 03:47
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_workloads(apps, schema_editor):
+    ProjectWorkload = apps.get_model('categories', 'ProjectWorkload')
+    TaskAssignment = apps.get_model('categories', 'TaskAssignment')
+    TimeEntry = apps.get_model('categories', 'TimeEntry')
+    totals = {}
+    assignments = (TaskAssignment.objects.order_by().values('task__project_id', 'user_id')
+                   .annotate(assigned=Count('id'), open=Count('id', filter=~Q(task__status='done'))))
+    for row in assignments.iterator():
+        totals[row['task__project_id'], row['user_id']] = ProjectWorkload(
+            project_id=row['task__project_id'], user_id=row['user_id'],
+            assigned_count=row['assigned'], open_count=row['open'])
+    logged = (TimeEntry.objects.filter(duration__isnull=False).order_by()
+              .values('task__project_id', 'user_id').annotate(total=Sum('duration')))
+    for row in logged.iterator():
+        key = row['task__project_id'], row['user_id']
+        totals.setdefault(key, ProjectWorkload(project_id=key[0], user_id=key[1])).logged_duration = row['total']
+    ProjectWorkload.objects.bulk_create(totals.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0015_task_status_changes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectWorkload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assigned_count', models.IntegerField(default=0)),
+                ('open_count', models.IntegerField(default=0)),
+                ('logged_duration', models.DurationField(default=datetime.timedelta)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workloads', to='categories.project')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='projectworkload',
+            constraint=models.UniqueConstraint(fields=('project', 'user'), name='project_workload_key'),
+        ),
+        migrations.RunPython(populate_workloads, migrations.RunPython.noop),
+    ]
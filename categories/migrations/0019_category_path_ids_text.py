@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0018_data_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='path_ids',
+            field=models.TextField(blank=True, db_index=True, default='', editable=False),
+        ),
+    ]
@@ -2,11 +2,16 @@ from django.db import models, transaction
 from mptt.models import MPTTModel, TreeForeignKey
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from datetime import timedelta
 
 User = settings.AUTH_USER_MODEL
 
 
+def path_to_ids(path_ids):
+    return [int(x) for x in (path_ids or "").strip("/").split("/") if x]
+
+
 class Category(MPTTModel):
     name = models.CharField(max_length=150)
     slug = models.SlugField(max_length=160, unique=True)
@@ -18,6 +23,9 @@ class Category(MPTTModel):
         blank=True,
         related_name="children"
     )
+    # materialized root-to-node path, kept in sync by refresh_subtree_paths(); unbounded, as it grows with depth
+    path_ids = models.TextField(blank=True, default="", editable=False, db_index=True)
+    path_names = models.JSONField(default=list, blank=True, editable=False)
 
     class MPTTMeta:
         order_insertion_by = ["name"]
@@ -25,14 +33,78 @@ class Category(MPTTModel):
     class Meta:
         verbose_name_plural = "Categories"
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_path_key = self._path_key()
+
     def __str__(self):
         return self.name
 
+    def _path_key(self):
+        # read from __dict__ so deferred fields don't trigger a query
+        return self.__dict__.get("parent_id"), self.__dict__.get("name")
+
+    def save(self, *args, **kwargs):
+        path_changed = self._state.adding or self._path_key() != self._loaded_path_key
+        moved = not self._state.adding and self._path_key()[0] != self._loaded_path_key[0]
+        old_path_ids = self.path_ids
+        super().save(*args, **kwargs)
+        if path_changed:
+            self.refresh_subtree_paths()
+        if moved:
+            CategoryStats.shift_subtree(self, old_path_ids, self.path_ids)
+        self._loaded_path_key = self._path_key()
+
+    def delete(self, *args, **kwargs):
+        CategoryStats.shift_subtree(self, self.path_ids)
+        return super().delete(*args, **kwargs)
+
+    def refresh_subtree_paths(self):
+        """
+        Recomputes path_ids / path_names for this node and its whole subtree
+        with one read of the subtree and a bulk update.
+        """
+        if self.parent_id:
+            parent = Category.objects.only("path_ids", "path_names").get(pk=self.parent_id)
+            base = (parent.path_ids or "/", parent.path_names or [])
+        else:
+            base = ("/", [])
+
+        paths = {self.parent_id: base}
+        nodes = list(self.get_descendants(include_self=True).only("id", "parent_id", "name"))
+        for node in nodes:
+            ids, names = paths[node.parent_id]
+            node.path_ids = f"{ids}{node.id}/"
+            node.path_names = names + [node.name]
+            paths[node.id] = (node.path_ids, node.path_names)
+        Category.objects.bulk_update(nodes, ["path_ids", "path_names"], batch_size=500)
+        self.path_ids, self.path_names = paths[self.id]
+
     def full_path(self, separator=" > "):
+        if self.path_names:
+            return separator.join(self.path_names)
         ancestors = list(self.get_ancestors(include_self=True).values_list("name", flat=True))
         return separator.join(ancestors)
 
 
+class ProjectQuerySet(models.QuerySet):
+    def under_category(self, category):
+        # one join on the MPTT range instead of an IN list of descendant ids
+        return self.filter(
+            category__tree_id=category.tree_id,
+            category__lft__gte=category.lft,
+            category__lft__lte=category.rght,
+        )
+
+
+class ProjectManager(models.Manager):
+    def get_queryset(self):
+        return ProjectQuerySet(self.model, using=self._db)
+
+    def under_category(self, category):
+        return self.get_queryset().under_category(category)
+
+
 class Project(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -45,11 +117,29 @@ class Project(models.Model):
     )  # Added team FK
     is_template = models.BooleanField(default=False)
     config = models.JSONField(blank=True, null=True)
+    # running sum of TimeEntry.duration, kept by categories.signals
+    total_duration = models.DurationField(default=timedelta, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectManager()
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["category", "-created_at", "-id"]),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_category_id = self.__dict__.get("category_id")
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name != "total_duration"]
+        super().save(*args, **kwargs)
+        self._loaded_category_id = self.category_id
 
     def __str__(self):
         type_label = "Template" if self.is_template else "Project"
@@ -57,8 +147,7 @@ class Project(models.Model):
 
     def total_time_spent(self):
         # returns a timedelta or 0
-        agg = self.tasks.aggregate(total=Sum('time_entries__duration'))
-        return agg.get('total') or 0
+        return self.total_duration or 0
 
     def team_productivity(self):
         return self.tasks.aggregate(
@@ -68,6 +157,36 @@ class Project(models.Model):
         )
 
 
+class TaskQuerySet(models.QuerySet):
+    def blocked(self, value=True):
+        if value:
+            return self.filter(open_dependency_count__gt=0)
+        return self.filter(open_dependency_count=0)
+
+    def dependents_of(self, task_ids):
+        return self.filter(id__in=Task.dependencies.through.objects
+                           .filter(to_task_id__in=task_ids).values('from_task_id'))
+
+    def refresh_open_dependency_counts(self):
+        """Recomputes ``open_dependency_count`` for every task in the queryset with one UPDATE."""
+        open_count = (Task.dependencies.through.objects.filter(from_task=models.OuterRef('pk'))
+                      .exclude(to_task__status=Task.Status.DONE).order_by()
+                      .values('from_task').annotate(n=models.Count('pk')).values('n'))
+        return self.update(open_dependency_count=Coalesce(
+            models.Subquery(open_count, output_field=models.IntegerField()), 0))
+
+
+class TaskManager(models.Manager):
+    def get_queryset(self):
+        return TaskQuerySet(self.model, using=self._db)
+
+    def blocked(self, value=True):
+        return self.get_queryset().blocked(value)
+
+    def dependents_of(self, task_ids):
+        return self.get_queryset().dependents_of(task_ids)
+
+
 class Task(models.Model):
     class Status(models.TextChoices):
         TODO = 'todo', 'To Do'
@@ -78,58 +197,79 @@ class Task(models.Model):
     project = models.ForeignKey(Project, related_name="tasks", on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
-    order = models.PositiveIntegerField(default=0)
+    # sparse rank, see categories.ordering
+    order = models.PositiveBigIntegerField(default=0)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='subtasks', on_delete=models.CASCADE)
 
     dependencies = models.ManyToManyField('self', symmetrical=False, related_name='dependents', blank=True)
     assigned_to = models.ManyToManyField(User, through='TaskAssignment', related_name='tasks')
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.TODO)
+    # dependencies not yet done; kept in step by categories.signals and the bulk paths
+    open_dependency_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    # running sum of this task's TimeEntry.duration
+    total_duration = models.DurationField(default=timedelta, editable=False)
+    # the task and all its subtasks, see categories.rollup
+    subtree_size = models.PositiveIntegerField(default=1, editable=False)
+    subtree_progress = models.PositiveIntegerField(default=0, editable=False)
+    subtree_duration = models.DurationField(default=timedelta, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskManager()
+
     class Meta:
         ordering = ['order', '-created_at']
+        indexes = [
+            models.Index(fields=['project', 'order', 'id']),
+        ]
+
+    # maintained with UPDATE statements elsewhere; a full save() must not write back stale values
+    DERIVED_FIELDS = ("open_dependency_count", "total_duration", "subtree_size", "subtree_progress", "subtree_duration")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_status = self.__dict__.get("status")
+        self._loaded_project_id = self.__dict__.get("project_id")
+        self._loaded_parent_id = self.__dict__.get("parent_id")
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.subtree_progress = self.status_progress(self.status)
+        elif kwargs.get("update_fields") is None and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in self.DERIVED_FIELDS]
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
+        self._loaded_project_id = self.project_id
+        self._loaded_parent_id = self.parent_id
 
     def __str__(self):
         return self.title
 
     def is_blocked(self):
-        return self.dependencies.exclude(status=Task.Status.DONE).exists()
+        return self.open_dependency_count > 0
 
     def has_circular_dependency(self, target_task):
-        # safer implementation tracking ids
-        visited = set()
-
-        def dfs(task):
-            tid = task.id
-            if not tid:
-                return False
-            if tid in visited:
-                return False
-            visited.add(tid)
-            if task.id == self.id:
-                return True
-            for dep in task.dependencies.all():
-                # skip if same as current
-                if dep.id == self.id:
-                    return True
-                if dfs(dep):
-                    return True
-            return False
-
-        return dfs(target_task)
+        from .graph import DependencyGraph
+        return DependencyGraph.reachable_from([target_task.id]).would_create_cycle(self.id, [target_task.id])
 
     def total_time_spent(self):
-        agg = self.time_entries.aggregate(total=Sum('duration'))
-        return agg.get('total') or 0
+        return self.total_duration or 0
 
-    def progress_percentage(self):
-        if self.status == Task.Status.DONE:
+    @staticmethod
+    def status_progress(status):
+        if status == Task.Status.DONE:
             return 100
-        elif self.status == Task.Status.IN_PROGRESS:
+        elif status == Task.Status.IN_PROGRESS:
             return 50
         return 0
 
+    def progress_percentage(self):
+        """Average progress over the task and its subtasks."""
+        if self.subtree_size > 1:
+            return round(self.subtree_progress / self.subtree_size)
+        return self.status_progress(self.status)
+
 
 class TaskAssignment(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='assignments')
@@ -140,6 +280,38 @@ class TaskAssignment(models.Model):
         unique_together = ('task', 'user')
 
 
+class TaskStatusChange(models.Model):
+    """
+    Append-only log of Task.status transitions. The first row of a task has an
+    empty from_status (its creation). Written by categories.signals and the bulk paths.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='status_changes')
+    # the task's project, so per-project reports read one index range
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    from_status = models.CharField(max_length=20, choices=Task.Status.choices, blank=True)
+    to_status = models.CharField(max_length=20, choices=Task.Status.choices)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [
+            models.Index(fields=['project', 'changed_at']),
+            models.Index(fields=['task', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}: {self.from_status or '-'} -> {self.to_status}"
+
+    @classmethod
+    def record(cls, changes, changed_at=None):
+        """Appends (task_id, project_id, old_status, new_status) rows; old_status None means created."""
+        changed_at = changed_at or timezone.now()
+        cls.objects.bulk_create([
+            cls(task_id=task_id, project_id=project_id, from_status=old or "", to_status=new, changed_at=changed_at)
+            for task_id, project_id, old, new in changes
+        ], batch_size=1000)
+
+
 class TimeEntry(models.Model):
     task = models.ForeignKey("Task", related_name="time_entries", on_delete=models.CASCADE)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="time_entries", on_delete=models.CASCADE)
@@ -151,11 +323,226 @@ class TimeEntry(models.Model):
     duration = models.DurationField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # high-water mark for categories.daily_time
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task", "user", "start_time"]),
+            # running timers
+            models.Index(fields=["user", "start_time"], condition=models.Q(end_time__isnull=True),
+                         name="timeentry_running_user_idx"),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loaded_task_id = self.__dict__.get("task_id")
+        self._loaded_duration = self.__dict__.get("duration")
+        self._loaded_user_id = self.__dict__.get("user_id")
+        self._loaded_start_time = self.__dict__.get("start_time")
 
     def save(self, *args, **kwargs):
         if self.start_time and self.end_time:
             self.duration = self.end_time - self.start_time
         super().save(*args, **kwargs)
+        self._loaded_task_id = self.task_id
+        self._loaded_duration = self.duration
+        self._loaded_user_id = self.user_id
+        self._loaded_start_time = self.start_time
 
     def __str__(self):
         return f"{self.user} - {self.task} ({self.duration})"
+
+
+class ArchivedTimeEntry(models.Model):
+    """
+    Finished TimeEntry rows moved out of the hot table by categories.archive.
+    Keeps the original id; the running totals and rollups still include them.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    task = models.ForeignKey(Task, related_name="+", on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+    description = models.TextField(blank=True)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    duration = models.DurationField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["task", "user", "start_time"]),
+            models.Index(fields=["user", "start_time"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.task_id} ({self.duration}, archived)"
+
+
+class CategoryStats(models.Model):
+    """
+    Task and time totals for a category's whole subtree, kept up to date by
+    categories.signals and rebuilt by the rebuild_category_stats command.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    task_count = models.IntegerField(default=0)
+    done_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    total_time = models.DurationField(default=timedelta)
+
+    FIELDS = ("task_count", "done_count", "in_progress_count", "total_time")
+
+    class Meta:
+        verbose_name_plural = "Category stats"
+
+    def __str__(self):
+        return f"Stats<{self.category_id}>"
+
+    @classmethod
+    def apply_delta(cls, category_ids, **deltas):
+        """Adds the given deltas to the rows of ``category_ids`` with F() updates."""
+        changes = {field: models.F(field) + delta for field, delta in deltas.items() if delta}
+        if not category_ids or not changes:
+            return
+        cls.objects.bulk_create([cls(category_id=i) for i in category_ids], ignore_conflicts=True)
+        cls.objects.filter(category_id__in=category_ids).update(**changes)
+
+    @classmethod
+    def shift_subtree(cls, category, old_path_ids, new_path_ids=None):
+        """Moves a subtree's totals off its old ancestors and, if given, onto its new ones."""
+        totals = cls.objects.filter(category=category).values(*cls.FIELDS).first()
+        if not totals:
+            return
+        cls.apply_delta(path_to_ids(old_path_ids)[:-1], **{f: -v for f, v in totals.items()})
+        if new_path_ids is not None:
+            cls.apply_delta(path_to_ids(new_path_ids)[:-1], **totals)
+
+
+class DailyTimeRollup(models.Model):
+    """
+    Logged time per (day, user, task), with the task's project copied in for
+    grouping. Maintained by categories.daily_time; reports read this instead
+    of scanning TimeEntry.
+    """
+    day = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="+")
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="+")
+    total_duration = models.DurationField(default=timedelta)
+    entry_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "user", "task"], name="daily_time_rollup_key"),
+        ]
+        indexes = [
+            models.Index(fields=["day"]),
+            models.Index(fields=["user", "day"]),
+            models.Index(fields=["project", "day"]),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.user_id}/{self.task_id}: {self.total_duration}"
+
+
+class RollupCheckpoint(models.Model):
+    """How far an incremental refresh has read its source table."""
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class DataVersion(models.Model):
+    """
+    A counter bumped whenever the data behind a cache changes. Kept in the
+    database so every worker process sees the same version.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, names):
+        names = set(names)
+        with transaction.atomic():
+            cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+            cls.objects.filter(name__in=names).update(version=models.F("version") + 1)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ProjectWorkload(models.Model):
+    """
+    Per (project, user): assigned tasks, those not done yet, and time the user
+    logged on the project. Maintained by categories.workload.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="workloads")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    assigned_count = models.IntegerField(default=0)
+    open_count = models.IntegerField(default=0)
+    logged_duration = models.DurationField(default=timedelta)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["project", "user"], name="project_workload_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id}/{self.user_id}: {self.open_count}/{self.assigned_count} open"
+
+
+class CloneJob(models.Model):
+    """Background deep clone of a large project, polled by the client."""
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    source = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='clone_jobs')
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='clone_jobs')
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    result = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Clone of {self.source_id} ({self.status})"
+
+
+class ReportJob(models.Model):
+    """A report computed off the request cycle; the rows are stored for download."""
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='report_jobs')
+    report = models.CharField(max_length=50)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, related_name='report_jobs')
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    result = models.JSONField(null=True, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"{self.report} report ({self.status})"
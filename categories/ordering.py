@@ -0,0 +1,67 @@
+from django.db import transaction
+from django.db.models import Max
+
+from .background import run_after_commit
+from .models import Task
+
+# ranks are spaced GAP apart so a move can land between two neighbours without renumbering
+GAP = 1 << 16
+# once a move leaves less room than this, the project is rebalanced in the background
+REBALANCE_BELOW = 16
+
+
+def next_rank(project_id):
+    last = Task.objects.filter(project_id=project_id).aggregate(m=Max("order"))["m"]
+    return (last or 0) + GAP
+
+
+def rebalance_project(project_id):
+    """Respaces every task of a project GAP apart, keeping the current order."""
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update().filter(project_id=project_id)
+            .order_by("order", "-created_at", "id").only("id", "order")
+        )
+        changed = []
+        for position, task in enumerate(tasks, start=1):
+            if task.order != position * GAP:
+                task.order = position * GAP
+                changed.append(task)
+        Task.objects.bulk_update(changed, ["order"], batch_size=1000)
+    return len(changed)
+
+
+def _bounds(task, before, after):
+    siblings = Task.objects.filter(project_id=task.project_id).exclude(pk=task.pk)
+    if after is not None:
+        lower = after.order
+        upper = siblings.filter(order__gt=lower).order_by("order").values_list("order", flat=True).first()
+        # a tie with the anchor also counts as "no room"
+        if siblings.filter(order=lower).exclude(pk=after.pk).exists():
+            upper = lower
+    else:
+        upper = before.order
+        lower = siblings.filter(order__lt=upper).order_by("-order").values_list("order", flat=True).first() or 0
+        if siblings.filter(order=upper).exclude(pk=before.pk).exists():
+            lower = upper
+    return lower, upper
+
+
+def move_task(task, before=None, after=None):
+    """
+    Places ``task`` directly before or after an anchor task of the same project.
+    Normally writes a single row; only a collision forces a synchronous rebalance.
+    """
+    with transaction.atomic():
+        lower, upper = _bounds(task, before, after)
+        if upper is not None and upper - lower < 2:
+            rebalance_project(task.project_id)
+            anchor = before or after
+            anchor.refresh_from_db(fields=["order"])
+            lower, upper = _bounds(task, before, after)
+        rank = lower + GAP if upper is None else (lower + upper) // 2
+        Task.objects.filter(pk=task.pk).update(order=rank)
+        task.order = rank
+        if upper is not None and min(rank - lower, upper - rank) < REBALANCE_BELOW:
+            run_after_commit(rebalance_project, task.project_id)
+    return task
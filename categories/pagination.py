@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CategoryProjectCursorPagination(CursorPagination):
+    # keyset pagination: cost stays flat no matter how deep the client pages
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-created_at', '-id')
+
+
+class ProjectSummaryCursorPagination(CategoryProjectCursorPagination):
+    page_size = 100
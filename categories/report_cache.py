@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DataVersion
+
+VERSION_KEY = "reports:{}"
+ALL_PROJECTS = "all"
+
+
+class LRUCache:
+    """A size-bounded, thread-safe LRU map with per-entry expiry and hit counters."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+report_cache = LRUCache(
+    max_entries=getattr(settings, "REPORT_CACHE_MAX_ENTRIES", 512),
+    timeout=getattr(settings, "REPORT_CACHE_TIMEOUT", 5 * 60),
+)
+
+
+def data_version(project_id=None):
+    """Current data version of a project, or of all projects together when ``project_id`` is None."""
+    return DataVersion.current(VERSION_KEY.format(project_id or ALL_PROJECTS))
+
+
+def bump_versions(project_ids=()):
+    """
+    Gives the projects (and the all-projects scope) new versions once the
+    current transaction commits, so no worker serves its cached reports over them again.
+    """
+    keys = [VERSION_KEY.format(ALL_PROJECTS)] + [VERSION_KEY.format(pk) for pk in set(project_ids) if pk]
+    transaction.on_commit(lambda: DataVersion.bump(keys))
+
+
+def cached(name, params, compute, project_id=None):
+    """
+    Returns ``compute()``'s result for (name, query params, data version),
+    computing it on a miss. Results over REPORT_CACHE_MAX_ROWS rows are not kept.
+    """
+    params_key = tuple(sorted((key, tuple(values)) for key, values in params.lists()))
+    key = (name, project_id, data_version(project_id), params_key)
+    found, value = report_cache.get(key)
+    if not found:
+        value = compute()
+        rows = value["results"] if isinstance(value, dict) else value
+        if len(rows) <= getattr(settings, "REPORT_CACHE_MAX_ROWS", 10000):
+            report_cache.set(key, value)
+    return value
@@ -0,0 +1,160 @@
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from activity.delivery import deliver
+
+from . import reports
+from .background import run_after_commit
+from .export import iterate
+from .models import ReportJob
+from .serializers import ReportJobSerializer
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def report_workers():
+    """Size of the report process pool; 0 runs jobs in a thread of the web process instead."""
+    return getattr(settings, "REPORT_JOB_WORKERS", 2)
+
+
+def _builder(report, project_id):
+    if report in reports.PROJECT_REPORTS:
+        if project_id is None:
+            raise ValueError(f"The {report} report needs a project.")
+        return reports.PROJECT_REPORTS[report]
+    if report in reports.REPORTS:
+        return reports.REPORTS[report]
+    raise ValueError(f"Unknown report {report!r}.")
+
+
+def validate_spec(report, params, project_id=None):
+    """Raises ValueError for an unknown report or bad params; builders are lazy, so nothing is queried."""
+    _builder(report, project_id)(params, project_id)
+
+
+def run_report(report, params, project_id=None):
+    """The report's rows, as plain JSON values."""
+    rows, transform = _builder(report, project_id)(params, project_id)
+    rows = iterate(rows)
+    if transform is not None:
+        rows = map(transform, rows)
+    return json.loads(json.dumps(list(rows), cls=JSONEncoder))
+
+
+def execute_job(job_id):
+    """
+    Claims a pending job and stores its rows (or the error). Returns False when
+    another worker got to it first.
+    """
+    claimed = (ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.PENDING)
+               .update(status=ReportJob.Status.RUNNING, started_at=timezone.now()))
+    if not claimed:
+        return False
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        rows = run_report(job.report, job.params, job.project_id)
+        outcome = {"status": ReportJob.Status.DONE, "result": rows, "row_count": len(rows)}
+    except Exception as exc:
+        outcome = {"status": ReportJob.Status.FAILED, "error": str(exc)}
+    ReportJob.objects.filter(pk=job_id).update(finished_at=timezone.now(), **outcome)
+    return True
+
+
+def notify(job_id):
+    """Pushes the job's state to its owner's NotificationConsumer group, like any other notification."""
+    if not get_channel_layer():
+        return
+    job = ReportJob.objects.get(pk=job_id)
+    deliver([(
+        f"user_{job.requested_by_id}",
+        {"type": "send_notification", "data": {"event": "report_job", "job": ReportJobSerializer(job).data}},
+    )])
+
+
+def _execute_in_worker(job_id):
+    try:
+        return execute_job(job_id)
+    finally:
+        connection.close()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: a forked child would inherit the web process's open DB connections
+            _pool = ProcessPoolExecutor(
+                max_workers=report_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _finished(job_id, pool, future):
+    # runs in the web process, which owns the websocket channel layer
+    try:
+        exc = future.exception()
+        if exc is not None:
+            # the worker died (or the pool broke) before the job could record its outcome
+            ReportJob.objects.filter(pk=job_id).exclude(status=ReportJob.Status.DONE).update(
+                status=ReportJob.Status.FAILED, error=str(exc) or type(exc).__name__, finished_at=timezone.now(),
+            )
+            if isinstance(exc, BrokenProcessPool):
+                _discard_pool(pool)
+        notify(job_id)
+    finally:
+        connection.close()
+
+
+def _submit(job_id):
+    # a job that could not be submitted stays pending for run_report_jobs
+    for _ in range(2):
+        pool = _get_pool()
+        try:
+            future = pool.submit(_execute_in_worker, job_id)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            continue
+        future.add_done_callback(lambda f, pool=pool: _finished(job_id, pool, f))
+        return
+
+
+def _execute_and_notify(job_id):
+    execute_job(job_id)
+    notify(job_id)
+
+
+def dispatch(job_id):
+    """Hands the job to the process pool (or a thread) once the current transaction commits."""
+    if report_workers() > 0:
+        transaction.on_commit(lambda: _submit(job_id))
+    else:
+        run_after_commit(_execute_and_notify, job_id)
+
+
+def start_report_job(user, report, params, project=None):
+    project_id = project.pk if project is not None else None
+    validate_spec(report, params, project_id)
+    job = ReportJob.objects.create(requested_by=user, report=report, project_id=project_id, params=params)
+    dispatch(job.pk)
+    return job
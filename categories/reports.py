@@ -0,0 +1,243 @@
+from datetime import timedelta
+from heapq import merge
+
+from django.db.models import (
+    Case, Count, DurationField, F, Func, Max, Min, OuterRef, Q, Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Coalesce, RowNumber, TruncDate, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import analytics
+from .archive import time_entry_sources
+from .models import Category, DailyTimeRollup, Project, ProjectWorkload, Task, TaskStatusChange
+
+
+def daily_time_in_range(params):
+    """DailyTimeRollup rows between the inclusive ``?start=`` and ``?end=`` ISO dates."""
+    qs = DailyTimeRollup.objects.all()
+    for param, lookup in (("start", "day__gte"), ("end", "day__lte")):
+        if params.get(param):
+            day = parse_date(params[param])
+            if day is None:
+                raise ValueError(f"{param} must be a YYYY-MM-DD date.")
+            qs = qs.filter(**{lookup: day})
+    return qs
+
+
+def _summary_row(row):
+    return {
+        "id": row["id"],
+        "project": row["title"],
+        "total_time": row["total_time"],
+        "tasks": {"tasks": row["task_total"], "done": row["done"], "in_progress": row["in_progress"]},
+    }
+
+
+# Each report takes the query params (and the project for per-project ones) and
+# returns (rows, transform): a lazy queryset plus an optional per-row mapping.
+# Bad params raise ValueError.
+
+def project_summary(params, project=None):
+    """
+    Task counts and logged time per project in one grouped query. ``team`` and
+    ``category`` (whole subtree) narrow the projects; ``start`` / ``end``
+    limit total_time to that range.
+    """
+    projects = Project.objects.all()
+    if params.get('team'):
+        projects = projects.filter(team_id=int(params['team']))
+    if params.get('category'):
+        category = Category.objects.filter(pk=int(params['category'])).first()
+        if category is None:
+            raise ValueError("Unknown category.")
+        projects = projects.under_category(category)
+    rollups = daily_time_in_range(params)
+
+    if params.get('start') or params.get('end'):
+        logged = (rollups.filter(project=OuterRef('pk')).order_by().values('project')
+                  .annotate(total=Sum('total_duration')).values('total'))
+        total_time = Coalesce(Subquery(logged, output_field=DurationField()), Value(timedelta()))
+    else:
+        total_time = F('total_duration')
+    qs = projects.annotate(
+        task_total=Count('tasks'),
+        done=Count('tasks', filter=Q(tasks__status=Task.Status.DONE)),
+        in_progress=Count('tasks', filter=Q(tasks__status=Task.Status.IN_PROGRESS)),
+        total_time=total_time,
+    ).values('id', 'title', 'created_at', 'total_time', 'task_total', 'done', 'in_progress')
+    return qs.order_by('-created_at', '-id'), _summary_row
+
+
+def user_time(params, project=None):
+    qs = daily_time_in_range(params).values("user__email").annotate(
+        total_time=Sum("total_duration")
+    ).order_by("user__email")
+    return qs, None
+
+
+def weekly_time(params, project=None):
+    qs = (daily_time_in_range(params).annotate(week=TruncWeek("day"))
+          .values("user__email", "week")
+          .annotate(total_time=Sum("total_duration"))
+          .order_by("week", "user__email"))
+    return qs, None
+
+
+def task_progress(params, project=None):
+    qs = (Task.objects.annotate(
+            total_time=F("total_duration"),
+            done=Count("id", filter=Q(status=Task.Status.DONE)),
+            in_progress=Count("id", filter=Q(status=Task.Status.IN_PROGRESS)),
+        )
+        .values("id", "title", "status", "total_time", "done", "in_progress"))
+    return qs, None
+
+
+def _entry_gaps(sources):
+    # the per-table reads are each ordered by (user, start), so merging them keeps the Lag exact
+    prev_user = prev = None
+    for user_id, start in merge(*(entries.iterator(chunk_size=analytics.CHUNK_SIZE) for entries in sources)):
+        if user_id != prev_user:
+            prev_user, prev = user_id, None
+        yield {"user_id": user_id, "day": timezone.localdate(start), "start_time": start,
+               "prev": prev, "diff": start - prev if prev is not None else None}
+        prev = start
+
+
+def productivity_trends(params, project=None):
+    """
+    One row per time entry with the gap since the user's previous start,
+    limited to entries starting within ``?start=`` / ``?end=``; the archive
+    is read only when the range reaches into it. Each user's first entry in
+    the range has no prev.
+    """
+    filters = analytics.start_time_range(params)
+    sources = [entries.filter(**filters).order_by('user_id', 'start_time').values_list('user_id', 'start_time')
+               for entries in time_entry_sources(filters.get('start_time__gte'))]
+    return _entry_gaps(sources), None
+
+
+class RunningSum(Func):
+    """SUM() of an already grouped aggregate, for use as a Window expression."""
+    function = "SUM"
+    window_compatible = True
+
+
+def _entered(status):
+    """+1 when a transition enters ``status``, -1 when it leaves it."""
+    return (Case(When(to_status=status, then=Value(1)), default=Value(0))
+            - Case(When(from_status=status, then=Value(1)), default=Value(0)))
+
+
+def _daily_running(project, **deltas):
+    """
+    Per-day net deltas over the project's status log plus their running
+    totals, in one grouped query with a window over the days.
+    """
+    return (TaskStatusChange.objects.filter(project=project)
+            .annotate(day=TruncDate('changed_at')).values('day')
+            # a plain aggregate makes this a GROUP BY day; the windows run over the groups
+            .annotate(transitions=Count('id'))
+            .annotate(**{name: Window(RunningSum(Sum(delta)), order_by=F('day').asc())
+                         for name, delta in deltas.items()})
+            .order_by('day'))
+
+
+def _burndown_row(row):
+    return {**row, "remaining": row["total"] - row["done"]}
+
+
+def burndown(params, project):
+    """Tasks in the project and tasks done at the end of each day with a transition."""
+    qs = _daily_running(
+        project,
+        total=Case(When(from_status="", then=Value(1)), default=Value(0)),
+        done=_entered(Task.Status.DONE),
+    )
+    return qs, _burndown_row
+
+
+def cumulative_flow(params, project):
+    """Tasks in each status at the end of each day with a transition."""
+    return _daily_running(project, **{status: _entered(status) for status in Task.Status.values}), None
+
+
+def _cycle_row(row):
+    finished = row["changed_at"]
+    return {
+        "task": row["task_id"],
+        "title": row["task__title"],
+        "created": row["created"],
+        "started": row["started"],
+        "finished": finished,
+        "cycle_time": finished - row["started"] if row["started"] else None,
+        "lead_time": finished - row["created"] if row["created"] else None,
+    }
+
+
+def cycle_time(params, project):
+    """
+    Done tasks with their first start (todo -> in_progress) and last finish.
+    Reopened tasks count from their first start.
+    """
+    per_task = {"partition_by": [F('task_id')]}
+    qs = (TaskStatusChange.objects.filter(project=project)
+          .annotate(
+              latest=Window(RowNumber(), order_by=[F('changed_at').desc(), F('id').desc()], **per_task),
+              finished=Window(Max(Case(When(to_status=Task.Status.DONE, then=F('changed_at')))), **per_task),
+              started=Window(Min(Case(When(to_status=Task.Status.IN_PROGRESS, then=F('changed_at')))), **per_task),
+              created=Window(Min(Case(When(from_status="", then=F('changed_at')))), **per_task),
+          )
+          # the task's latest transition is its last move into done
+          .filter(latest=1, finished=F('changed_at'))
+          .values('task_id', 'task__title', 'changed_at', 'started', 'created')
+          .order_by('changed_at', 'task_id'))
+    return qs, _cycle_row
+
+
+def _team_load_row(row):
+    return {
+        "id": row["user_id"],
+        "email": row["user__email"],
+        "task_count": row["assigned_count"],
+        "open_tasks": row["open_count"],
+        "total_time": row["logged_duration"],
+    }
+
+
+def team_load(params, project):
+    """
+    Assigned and open tasks and logged time per member, read from the
+    ProjectWorkload rows (one per member) instead of joining assignments with time entries.
+    """
+    qs = (ProjectWorkload.objects.filter(project=project)
+          .filter(Q(assigned_count__gt=0) | Q(logged_duration__gt=timedelta()))
+          .values('user_id', 'user__email', 'assigned_count', 'open_count', 'logged_duration')
+          .order_by('user__email'))
+    return qs, _team_load_row
+
+
+def projects_export(params, project=None):
+    qs = (Project.objects.annotate(total_tasks=Count('tasks'))
+          .values('id', 'title', 'total_tasks').order_by('id'))
+    return qs, None
+
+
+REPORTS = {
+    "project_summary": project_summary,
+    "user_time": user_time,
+    "weekly_time": weekly_time,
+    "task_progress": task_progress,
+    "productivity_trends": productivity_trends,
+    "export": projects_export,
+    "time_stats": analytics.time_stats,
+    "time_gaps": analytics.time_gaps,
+    "rolling_time": analytics.rolling_time,
+}
+PROJECT_REPORTS = {
+    "burndown": burndown,
+    "cumulative_flow": cumulative_flow,
+    "cycle_time": cycle_time,
+    "team_load": team_load,
+}
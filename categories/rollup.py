@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+from .archive import time_entry_sources
+from .models import Task
+
+BATCH_SIZE = 1000
+ROLLUP_FIELDS = ("subtree_size", "subtree_progress", "subtree_duration")
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _as_duration(value):
+    # SUM over a DurationField comes back as microseconds on backends without an interval type
+    if value is None:
+        return timedelta()
+    if isinstance(value, timedelta):
+        return value
+    return timedelta(microseconds=value)
+
+
+def _chain(task_id):
+    """Subquery for the ids of ``task_id`` and all its ancestors, walked with a recursive CTE."""
+    sql = (
+        f"WITH RECURSIVE chain(id, parent_id) AS ("
+        f" SELECT id, parent_id FROM {_table(Task)} WHERE id = %s"
+        f" UNION SELECT t.id, t.parent_id FROM {_table(Task)} t JOIN chain c ON t.id = c.parent_id"
+        f") SELECT id FROM chain"
+    )
+    return RawSQL(sql, (task_id,))
+
+
+def apply_rollup_delta(task_id, size=0, progress=0, duration=None):
+    """Adds the deltas to ``task_id`` and every ancestor in a single UPDATE."""
+    if not task_id:
+        return
+    changes = {}
+    if size:
+        changes["subtree_size"] = F("subtree_size") + size
+    if progress:
+        changes["subtree_progress"] = F("subtree_progress") + progress
+    if duration:
+        changes["subtree_duration"] = F("subtree_duration") + duration
+    if changes:
+        Task.objects.filter(id__in=_chain(task_id)).update(**changes)
+
+
+def project_rollups(project_id):
+    """
+    Rolled-up (size, progress points, duration) for every task of the project,
+    from one recursive CTE over the parent links.
+    """
+    status_case = " ".join(
+        f"WHEN '{status}' THEN {Task.status_progress(status)}" for status in Task.Status.values
+    )
+    # live and archived entries both count towards the logged time
+    entries = " UNION ALL ".join(f"SELECT task_id, duration FROM {_table(e.model)}" for e in time_entry_sources())
+    sql = (
+        f"WITH RECURSIVE closure(ancestor_id, task_id) AS ("
+        f" SELECT id, id FROM {_table(Task)} WHERE project_id = %s"
+        f" UNION SELECT c.ancestor_id, t.id FROM closure c JOIN {_table(Task)} t ON t.parent_id = c.task_id"
+        f"), spent(task_id, total) AS ("
+        f" SELECT task_id, SUM(duration) FROM ({entries}) e"
+        f" WHERE task_id IN (SELECT task_id FROM closure) GROUP BY task_id"
+        f") SELECT c.ancestor_id, COUNT(*), SUM(CASE t.status {status_case} ELSE 0 END), SUM(s.total)"
+        f" FROM closure c JOIN {_table(Task)} t ON t.id = c.task_id"
+        f" LEFT JOIN spent s ON s.task_id = c.task_id GROUP BY c.ancestor_id"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (project_id,))
+        return {
+            task_id: (size, progress, _as_duration(duration))
+            for task_id, size, progress, duration in cursor.fetchall()
+        }
+
+
+def rebuild_project_rollups(project_ids):
+    """Recomputes the stored rollups of the given projects, writing only rows that drifted."""
+    changed = []
+    with transaction.atomic():
+        for project_id in project_ids:
+            rollups = project_rollups(project_id)
+            for task in Task.objects.filter(project_id=project_id).only("id", *ROLLUP_FIELDS):
+                values = rollups.get(task.id, (1, 0, timedelta()))
+                if (task.subtree_size, task.subtree_progress, task.subtree_duration) != values:
+                    task.subtree_size, task.subtree_progress, task.subtree_duration = values
+                    changed.append(task)
+        Task.objects.bulk_update(changed, ROLLUP_FIELDS, batch_size=BATCH_SIZE)
+    return len(changed)
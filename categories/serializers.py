@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Category, Project, Task, TaskAssignment, TimeEntry
+from .models import Category, Project, Task, TaskAssignment, TimeEntry, CloneJob, ReportJob
+from .graph import DependencyGraph
 from teams.models import Team
 from django.contrib.auth import get_user_model
 
@@ -54,20 +55,22 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = [
             'id', 'title', 'description', 'status', 'assigned_to',
-            'dependencies_ids', 'is_blocked', 'project', 'created_at', 'updated_at',
-            'total_time', 'progress'
+            'dependencies_ids', 'is_blocked', 'project', 'order', 'created_at', 'updated_at',
+            'total_time', 'progress', 'subtree_size', 'subtree_duration'
         ]
+        read_only_fields = ['order', 'subtree_size', 'subtree_duration']
 
     def get_is_blocked(self, obj):
         return obj.is_blocked()
 
-    def validate_dependencies(self, value):
-        # 'value' is a list of Task instances
+    def validate_dependencies_ids(self, value):
+        # 'value' is a list of Task instances; a new task has no dependents yet, so it can't close a cycle
         task = self.instance if self.instance else None
-        # if creating new task, validate circular using temporary id-less approach:
-        for dep in value:
-            if task and task.has_circular_dependency(dep):
-                raise serializers.ValidationError(f"Circular dependency detected with task {dep.id}")
+        if task and value:
+            graph = DependencyGraph.reachable_from(dep.id for dep in value)
+            for dep in value:
+                if graph.would_create_cycle(task.id, [dep.id]):
+                    raise serializers.ValidationError(f"Circular dependency detected with task {dep.id}")
         return value
 
     def get_total_time(self, obj):
@@ -90,10 +93,32 @@ class ProjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['owner', 'created_at', 'updated_at']
 
 
+class CategoryProjectSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    owner_email = serializers.CharField(source='owner.email', read_only=True)
+
+    class Meta:
+        model = Project
+        fields = ('id', 'title', 'description', 'category', 'category_name', 'owner', 'owner_email')
+
+
 class TimeEntrySerializer(serializers.ModelSerializer):
     duration = serializers.DurationField(read_only=True)
 
     class Meta:
         model = TimeEntry
         fields = ['id', 'task', 'user', 'description', 'start_time', 'end_time', 'duration']
-        read_only_fields = ['duration']
+        read_only_fields = ['duration', 'user']
+
+
+class CloneJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CloneJob
+        fields = ['id', 'source', 'status', 'result', 'error', 'created_at', 'finished_at']
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'report', 'project', 'params', 'status', 'row_count', 'error',
+                  'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,344 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
+from django.dispatch import receiver, Signal
+from mptt.signals import node_moved
+
+from .models import (
+    ArchivedTimeEntry, Category, CategoryStats, DailyTimeRollup, Project, Task, TaskAssignment, TaskStatusChange,
+    TimeEntry, path_to_ids,
+)
+from .tree import invalidate_category_tree
+from .stats import status_counts
+from .rollup import apply_rollup_delta
+from .daily_time import entry_key, recompute_keys, sync_on_save
+from .report_cache import bump_versions
+from .workload import apply_workload_delta, rebuild_workloads, shift_open_counts
+
+# sent after TaskAssignment rows are written with bulk_create (no post_save); kwargs: assignments
+assignments_bulk_created = Signal()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def on_category_changed(sender, instance, **kwargs):
+    # after commit, so no worker caches the old tree under the new version
+    transaction.on_commit(invalidate_category_tree)
+    # category-filtered reports (project_summary?category=) follow the tree
+    bump_versions()
+
+
+# --- CategoryStats maintenance -------------------------------------------------
+
+def _project_category_ids(project_id):
+    if not project_id:
+        return []
+    return path_to_ids(Category.objects.filter(projects=project_id).values_list("path_ids", flat=True).first())
+
+
+def _task_category_ids(task_id):
+    if not task_id:
+        return []
+    return path_to_ids(Category.objects.filter(projects__tasks=task_id).values_list("path_ids", flat=True).first())
+
+
+@receiver(post_save, sender=Task)
+def on_task_saved(sender, instance, created, **kwargs):
+    if created:
+        CategoryStats.apply_delta(_project_category_ids(instance.project_id), **status_counts(instance.status))
+        return
+    old_status, old_project_id = instance._loaded_status, instance._loaded_project_id
+    if old_project_id and old_project_id != instance.project_id:
+        # the stored running total also covers archived entries
+        spent = Task.objects.filter(pk=instance.pk).values_list("total_duration", flat=True).first()
+        CategoryStats.apply_delta(_project_category_ids(old_project_id),
+                                  total_time=-spent if spent else None, **status_counts(old_status, -1))
+        CategoryStats.apply_delta(_project_category_ids(instance.project_id),
+                                  total_time=spent, **status_counts(instance.status))
+    elif old_status and old_status != instance.status:
+        old, new = status_counts(old_status), status_counts(instance.status)
+        CategoryStats.apply_delta(_project_category_ids(instance.project_id),
+                                  **{field: new[field] - old[field] for field in new})
+
+
+@receiver(post_delete, sender=Task)
+def on_task_deleted(sender, instance, **kwargs):
+    CategoryStats.apply_delta(_project_category_ids(instance.project_id), **status_counts(instance.status, -1))
+
+
+@receiver(post_save, sender=TimeEntry)
+def on_time_entry_saved(sender, instance, created, **kwargs):
+    old = timedelta() if created else (instance._loaded_duration or timedelta())
+    new = instance.duration or timedelta()
+    if not created and instance._loaded_task_id != instance.task_id:
+        CategoryStats.apply_delta(_task_category_ids(instance._loaded_task_id), total_time=-old)
+        CategoryStats.apply_delta(_task_category_ids(instance.task_id), total_time=new)
+    elif new != old:
+        CategoryStats.apply_delta(_task_category_ids(instance.task_id), total_time=new - old)
+
+
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_delete, sender=ArchivedTimeEntry)
+def on_time_entry_deleted(sender, instance, **kwargs):
+    if instance.duration:
+        CategoryStats.apply_delta(_task_category_ids(instance.task_id), total_time=-instance.duration)
+
+
+@receiver(post_save, sender=Project)
+def on_project_saved(sender, instance, created, **kwargs):
+    if created or instance._loaded_category_id == instance.category_id:
+        return
+    totals = instance.tasks.aggregate(
+        task_count=Count("id"),
+        done_count=Count("id", filter=Q(status=Task.Status.DONE)),
+        in_progress_count=Count("id", filter=Q(status=Task.Status.IN_PROGRESS)),
+    )
+    totals["total_time"] = Project.objects.filter(pk=instance.pk).values_list("total_duration", flat=True).get()
+    if not any(totals.values()):
+        return
+    old_ids = path_to_ids(Category.objects.filter(pk=instance._loaded_category_id)
+                          .values_list("path_ids", flat=True).first()) if instance._loaded_category_id else []
+    CategoryStats.apply_delta(old_ids, **{f: -v for f, v in totals.items() if v})
+    CategoryStats.apply_delta(_project_category_ids(instance.pk), **totals)
+
+
+# --- open dependency counters ------------------------------------------------
+
+def _finished_changed(old_status, new_status):
+    return (old_status == Task.Status.DONE) != (new_status == Task.Status.DONE)
+
+
+@receiver(post_save, sender=Task)
+def on_task_status_saved(sender, instance, created, **kwargs):
+    if not created and _finished_changed(instance._loaded_status, instance.status):
+        Task.objects.dependents_of([instance.pk]).refresh_open_dependency_counts()
+
+
+@receiver(pre_delete, sender=Task)
+def on_task_deleting(sender, instance, **kwargs):
+    # the edges are gone by post_delete, so remember who depended on an unfinished task
+    if instance.status != Task.Status.DONE:
+        instance._dependent_ids = list(Task.objects.dependents_of([instance.pk]).values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Task)
+def on_task_deleted_refresh_dependents(sender, instance, **kwargs):
+    dependent_ids = getattr(instance, "_dependent_ids", None)
+    if dependent_ids:
+        Task.objects.filter(id__in=dependent_ids).refresh_open_dependency_counts()
+
+
+@receiver(m2m_changed, sender=Task.dependencies.through)
+def on_dependencies_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            Task.objects.filter(pk=instance.pk).refresh_open_dependency_counts()
+            instance.refresh_from_db(fields=["open_dependency_count"])
+    elif action == "pre_clear":
+        instance._dependent_ids = list(instance.dependents.values_list("id", flat=True))
+    elif action in ("post_add", "post_remove"):
+        Task.objects.filter(id__in=pk_set).refresh_open_dependency_counts()
+    elif action == "post_clear":
+        Task.objects.filter(id__in=instance._dependent_ids).refresh_open_dependency_counts()
+
+
+# --- subtask rollups -------------------------------------------------------------
+
+@receiver(post_save, sender=Task)
+def on_task_saved_rollup(sender, instance, created, **kwargs):
+    points = Task.status_progress(instance.status)
+    if created:
+        apply_rollup_delta(instance.parent_id, size=1, progress=points)
+        return
+    delta = points - Task.status_progress(instance._loaded_status)
+    if delta:
+        apply_rollup_delta(instance.pk, progress=delta)
+        instance.subtree_progress += delta
+    if instance._loaded_parent_id != instance.parent_id:
+        instance.refresh_from_db(fields=["subtree_size", "subtree_progress", "subtree_duration"])
+        subtree = (instance.subtree_size, instance.subtree_progress, instance.subtree_duration)
+        apply_rollup_delta(instance._loaded_parent_id, -subtree[0], -subtree[1], -subtree[2])
+        apply_rollup_delta(instance.parent_id, *subtree)
+
+
+@receiver(pre_delete, sender=Task)
+def on_task_deleting_rollup(sender, instance, **kwargs):
+    # each deleted subtask takes itself off the chain; logged time goes with its TimeEntry rows
+    apply_rollup_delta(instance.parent_id, size=-1, progress=-Task.status_progress(instance.status))
+
+
+@receiver(post_save, sender=TimeEntry)
+def on_time_entry_saved_rollup(sender, instance, created, **kwargs):
+    old = timedelta() if created else (instance._loaded_duration or timedelta())
+    new = instance.duration or timedelta()
+    if not created and instance._loaded_task_id != instance.task_id:
+        apply_rollup_delta(instance._loaded_task_id, duration=-old)
+        apply_rollup_delta(instance.task_id, duration=new)
+    elif new != old:
+        apply_rollup_delta(instance.task_id, duration=new - old)
+
+
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_delete, sender=ArchivedTimeEntry)
+def on_time_entry_deleted_rollup(sender, instance, **kwargs):
+    if instance.duration:
+        apply_rollup_delta(instance.task_id, duration=-instance.duration)
+
+
+# --- running time totals ---------------------------------------------------------
+
+def _add_logged_time(task_id, delta):
+    if not task_id or not delta:
+        return
+    Task.objects.filter(pk=task_id).update(total_duration=F("total_duration") + delta)
+    Project.objects.filter(id__in=Task.objects.filter(pk=task_id).values("project_id")).update(
+        total_duration=F("total_duration") + delta)
+
+
+@receiver(post_save, sender=TimeEntry)
+def on_time_entry_saved_totals(sender, instance, created, **kwargs):
+    old = timedelta() if created else (instance._loaded_duration or timedelta())
+    new = instance.duration or timedelta()
+    if not created and instance._loaded_task_id != instance.task_id:
+        _add_logged_time(instance._loaded_task_id, -old)
+        _add_logged_time(instance.task_id, new)
+    else:
+        _add_logged_time(instance.task_id, new - old)
+
+
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_delete, sender=ArchivedTimeEntry)
+def on_time_entry_deleted_totals(sender, instance, **kwargs):
+    _add_logged_time(instance.task_id, -(instance.duration or timedelta()))
+
+
+@receiver(post_save, sender=Task)
+def on_task_project_changed_totals(sender, instance, created, **kwargs):
+    old_project_id = instance._loaded_project_id
+    if created or not old_project_id or old_project_id == instance.project_id:
+        return
+    instance.refresh_from_db(fields=["total_duration"])
+    if instance.total_duration:
+        Project.objects.filter(pk=old_project_id).update(total_duration=F("total_duration") - instance.total_duration)
+        Project.objects.filter(pk=instance.project_id).update(total_duration=F("total_duration") + instance.total_duration)
+
+
+# --- daily time rollup -------------------------------------------------------------
+# the updated_at high-water mark can't see the key an entry moved away from or a deleted
+# entry, so those are always applied here; TIME_ROLLUP_SYNC controls the rest
+
+@receiver(post_save, sender=TimeEntry)
+def on_time_entry_saved_daily(sender, instance, created, **kwargs):
+    keys = set()
+    if not created and instance._loaded_start_time:
+        old_key = entry_key(instance._loaded_start_time, instance._loaded_user_id, instance._loaded_task_id)
+        new_key = entry_key(instance.start_time, instance.user_id, instance.task_id)
+        if old_key != new_key:
+            keys.add(old_key)
+    if sync_on_save():
+        keys.add(entry_key(instance.start_time, instance.user_id, instance.task_id))
+    if keys:
+        recompute_keys(keys)
+
+
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_delete, sender=ArchivedTimeEntry)
+def on_time_entry_deleted_daily(sender, instance, **kwargs):
+    if instance.duration:
+        recompute_keys([entry_key(instance.start_time, instance.user_id, instance.task_id)])
+
+
+@receiver(post_save, sender=Task)
+def on_task_project_changed_daily(sender, instance, created, **kwargs):
+    if not created and instance._loaded_project_id != instance.project_id:
+        DailyTimeRollup.objects.filter(task=instance).update(project=instance.project_id)
+
+
+# --- task status history -------------------------------------------------------------
+
+@receiver(post_save, sender=Task)
+def on_task_status_logged(sender, instance, created, **kwargs):
+    if created or instance._loaded_status != instance.status:
+        TaskStatusChange.record([(instance.pk, instance.project_id, None if created else instance._loaded_status,
+                                  instance.status)], changed_at=instance.updated_at)
+    if not created and instance._loaded_project_id != instance.project_id:
+        TaskStatusChange.objects.filter(task=instance).update(project=instance.project_id)
+
+
+# --- project workload ---------------------------------------------------------------
+
+def _is_open(status):
+    return int(status != Task.Status.DONE)
+
+
+@receiver(post_save, sender=TaskAssignment)
+def on_assignment_saved_workload(sender, instance, created, **kwargs):
+    if created:
+        project_id, task_status = Task.objects.values_list("project_id", "status").get(pk=instance.task_id)
+        apply_workload_delta(project_id, instance.user_id, assigned=1, open_=_is_open(task_status))
+
+
+@receiver(post_delete, sender=TaskAssignment)
+def on_assignment_deleted_workload(sender, instance, **kwargs):
+    task = Task.objects.filter(pk=instance.task_id).values_list("project_id", "status").first()
+    if task:
+        apply_workload_delta(task[0], instance.user_id, assigned=-1, open_=-_is_open(task[1]))
+
+
+@receiver(post_save, sender=Task)
+def on_task_saved_workload(sender, instance, created, **kwargs):
+    if created:
+        return
+    if instance._loaded_project_id != instance.project_id:
+        # rare; recount both projects rather than moving each assignee's numbers
+        rebuild_workloads([instance._loaded_project_id, instance.project_id])
+    elif _finished_changed(instance._loaded_status, instance.status):
+        shift_open_counts(instance.pk, instance.project_id, -1 if instance.status == Task.Status.DONE else 1)
+
+
+@receiver(post_save, sender=TimeEntry)
+def on_time_entry_saved_workload(sender, instance, created, **kwargs):
+    old = None if created else (instance._loaded_task_id, instance._loaded_user_id, instance._loaded_duration)
+    new = (instance.task_id, instance.user_id, instance.duration)
+    if old == new:
+        return
+    projects = dict(Task.objects.filter(pk__in={k[0] for k in (old, new) if k}).values_list("id", "project_id"))
+    if old and old[2]:
+        apply_workload_delta(projects.get(old[0]), old[1], logged=-old[2])
+    if new[2]:
+        apply_workload_delta(projects.get(new[0]), new[1], logged=new[2])
+
+
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_delete, sender=ArchivedTimeEntry)
+def on_time_entry_deleted_workload(sender, instance, **kwargs):
+    if instance.duration:
+        project_id = Task.objects.filter(pk=instance.task_id).values_list("project_id", flat=True).first()
+        apply_workload_delta(project_id, instance.user_id, logged=-instance.duration)
+
+
+# --- report cache versions -----------------------------------------------------------
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def on_task_written_bump(sender, instance, **kwargs):
+    bump_versions([instance.project_id, getattr(instance, "_loaded_project_id", None)])
+
+
+@receiver(post_save, sender=TimeEntry)
+@receiver(post_delete, sender=TimeEntry)
+@receiver(post_delete, sender=ArchivedTimeEntry)
+@receiver(post_save, sender=TaskAssignment)
+@receiver(post_delete, sender=TaskAssignment)
+def on_task_child_written_bump(sender, instance, **kwargs):
+    task_ids = {instance.task_id, getattr(instance, "_loaded_task_id", None)} - {None}
+    bump_versions(Task.objects.filter(pk__in=task_ids).values_list("project_id", flat=True))
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def on_project_written_bump(sender, instance, **kwargs):
+    bump_versions([instance.pk])
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import (
+    Case, DurationField, ExpressionWrapper, F, Func, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from .archive import time_entry_sources
+from .models import Category, CategoryStats, Project, Task, path_to_ids
+
+STAT_FIELDS = CategoryStats.FIELDS
+
+
+def status_counts(status, sign=1):
+    if status is None:
+        return {"task_count": 0, "done_count": 0, "in_progress_count": 0}
+    return {
+        "task_count": sign,
+        "done_count": sign * (status == Task.Status.DONE),
+        "in_progress_count": sign * (status == Task.Status.IN_PROGRESS),
+    }
+
+
+def apply_task_status_changes(changes):
+    """
+    CategoryStats deltas for tasks written with bulk_create/bulk_update, which
+    skip post_save. ``changes`` holds (project_id, old_status, new_status);
+    an old_status of None means the task was created.
+    """
+    per_project = defaultdict(lambda: defaultdict(int))
+    for project_id, old, new in changes:
+        for counts in (status_counts(new), status_counts(old, -1)):
+            for field, value in counts.items():
+                per_project[project_id][field] += value
+    if not per_project:
+        return
+    paths = Project.objects.filter(id__in=per_project, category__isnull=False).values_list("id", "category__path_ids")
+    for project_id, path_ids in paths:
+        CategoryStats.apply_delta(path_to_ids(path_ids), **per_project[project_id])
+
+
+def _in_range(prefix):
+    return {
+        f"{prefix}__tree_id": OuterRef("tree_id"),
+        f"{prefix}__lft__gte": OuterRef("lft"),
+        f"{prefix}__lft__lte": OuterRef("rght"),
+    }
+
+
+def _total(qs, expression, output_field):
+    # bare SUM()/COUNT() without GROUP BY: one row per correlated subquery
+    value = qs.order_by().annotate(v=Func(expression, function="SUM", output_field=output_field)).values("v")
+    return Subquery(value, output_field=output_field)
+
+
+def _summed_time(subqueries):
+    # one correlated subquery per entry table (live, archived), added together
+    total = None
+    for subquery in subqueries:
+        value = Coalesce(subquery, Value(timedelta()))
+        total = value if total is None else ExpressionWrapper(total + value, output_field=DurationField())
+    return total
+
+
+def annotate_subtree_stats(categories):
+    """
+    Annotates each category with task and time totals over its own MPTT range,
+    so a whole subtree is rolled up in a single query.
+    """
+    tasks = Task.objects.filter(**_in_range("project__category"))
+    done = Case(When(status=Task.Status.DONE, then=Value(1)), default=Value(0))
+    in_progress = Case(When(status=Task.Status.IN_PROGRESS, then=Value(1)), default=Value(0))
+    return categories.annotate(
+        task_count=Coalesce(_total(tasks, Value(1), IntegerField()), 0),
+        done_count=Coalesce(_total(tasks, done, IntegerField()), 0),
+        in_progress_count=Coalesce(_total(tasks, in_progress, IntegerField()), 0),
+        total_time=_summed_time(
+            _total(entries.filter(**_in_range("task__project__category")), F("duration"), DurationField())
+            for entries in time_entry_sources()
+        ),
+    )
+
+
+def _row(node_id, parent_id, name, level, stats):
+    task_count = stats["task_count"]
+    return {
+        "id": node_id,
+        "parent": parent_id,
+        "name": name,
+        "level": level,
+        **stats,
+        "done_ratio": round(stats["done_count"] / task_count, 4) if task_count else 0.0,
+    }
+
+
+def live_subtree_stats(category):
+    qs = annotate_subtree_stats(category.get_descendants(include_self=True))
+    return [
+        _row(n["id"], n["parent_id"], n["name"], n["level"], {f: n[f] for f in STAT_FIELDS})
+        for n in qs.values("id", "parent_id", "name", "level", *STAT_FIELDS)
+    ]
+
+
+def stored_subtree_stats(category):
+    rows = (category.get_descendants(include_self=True)
+            .values("id", "parent_id", "name", "level", *(f"stats__{f}" for f in STAT_FIELDS)))
+    empty = {"task_count": 0, "done_count": 0, "in_progress_count": 0, "total_time": timedelta()}
+    return [
+        _row(n["id"], n["parent_id"], n["name"], n["level"],
+             {f: n[f"stats__{f}"] if n[f"stats__{f}"] is not None else empty[f] for f in STAT_FIELDS})
+        for n in rows
+    ]
+
+
+def rebuild_category_stats(tree_ids=None):
+    categories = Category.objects.all()
+    if tree_ids is not None:
+        categories = categories.filter(tree_id__in=tree_ids)
+    with transaction.atomic():
+        rows = [
+            CategoryStats(category_id=n["id"], **{f: n[f] for f in STAT_FIELDS})
+            for n in annotate_subtree_stats(categories).values("id", *STAT_FIELDS).iterator(chunk_size=2000)
+        ]
+        CategoryStats.objects.filter(category__in=categories).delete()
+        CategoryStats.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def reconcile_time_totals():
+    """
+    Recomputes the running ``total_duration`` counters on Task and Project
+    from the live and archived time entries. Returns how many rows of each had drifted.
+    """
+    sources = time_entry_sources()
+    task_time = [
+        Subquery(entries.filter(task=OuterRef("pk")).order_by()
+                 .values("task").annotate(total=Sum("duration")).values("total"), output_field=DurationField())
+        for entries in sources
+    ]
+    project_time = [
+        Subquery(entries.filter(task__project=OuterRef("pk")).order_by()
+                 .values("task__project").annotate(total=Sum("duration")).values("total"), output_field=DurationField())
+        for entries in sources
+    ]
+    drifted = {}
+    with transaction.atomic():
+        for label, model, subqueries in (("tasks", Task, task_time), ("projects", Project, project_time)):
+            actual = _summed_time(subqueries)
+            stale = model.objects.annotate(actual=actual).exclude(total_duration=F("actual"))
+            drifted[label] = model.objects.filter(pk__in=list(stale.values_list("pk", flat=True))).update(
+                total_duration=actual)
+    return drifted
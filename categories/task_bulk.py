@@ -0,0 +1,331 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from teams.models import TeamMembership
+from .graph import DependencyGraph
+from .ordering import GAP, next_rank
+from .report_cache import bump_versions
+from .rollup import rebuild_project_rollups
+from .models import Project, Task, TaskAssignment, TaskStatusChange
+from .signals import assignments_bulk_created
+from .stats import apply_task_status_changes
+from .workload import rebuild_workloads
+
+User = get_user_model()
+
+OPS = ("create", "update", "delete")
+UPDATABLE = ("title", "description", "status", "order", "parent")
+BATCH_SIZE = 1000
+
+
+class BulkTaskError(ValueError):
+    pass
+
+
+def accessible_projects(user):
+    """Same rule as ProjectPermission, as a queryset."""
+    return Project.objects.filter(Q(owner=user) | Q(team__memberships__user=user,
+                                                    team__memberships__status=TeamMembership.Status.ACTIVE))
+
+
+def accessible_project_ids(user, project_ids):
+    """ProjectPermission checked for every project of the batch in one query."""
+    return set(accessible_projects(user).filter(id__in=project_ids).values_list("id", flat=True))
+
+
+class BulkTaskOperation:
+    """
+    Applies a list of create/update/delete operations with bulk queries inside
+    one transaction. Items may carry a ``ref`` string; other items of the same
+    batch can use that string in ``parent`` or ``dependencies`` in place of an id.
+    """
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = items
+        self.results = [{"index": i, "op": item.get("op") if isinstance(item, dict) else None}
+                        for i, item in enumerate(items)]
+
+    def fail(self, index, message):
+        self.results[index].update(ok=False, error=message)
+
+    def ok_items(self, op):
+        return [(i, item) for i, item in enumerate(self.items)
+                if self.results[i].get("ok") is not False and item.get("op") == op]
+
+    def _check_fields(self, index, item):
+        if "status" in item and item["status"] not in Task.Status.values:
+            return self.fail(index, f"Invalid status {item['status']!r}.")
+        if "title" in item and (not isinstance(item["title"], str) or not 0 < len(item["title"]) <= 255):
+            return self.fail(index, "title must be 1-255 characters.")
+        if "order" in item and (not isinstance(item["order"], int) or item["order"] < 0):
+            return self.fail(index, "order must be a non-negative integer.")
+        for key in ("assigned_to", "dependencies"):
+            if key in item and not isinstance(item[key], list):
+                return self.fail(index, f"{key} must be a list.")
+        if not all(isinstance(u, int) for u in item.get("assigned_to") or []):
+            return self.fail(index, "assigned_to must list user ids.")
+        if not all(isinstance(v, (int, str)) for v in [item.get("parent") or 0, *(item.get("dependencies") or [])]):
+            return self.fail(index, "parent and dependencies must be task ids or refs.")
+
+    def validate(self):
+        refs = {}
+        for i, item in enumerate(self.items):
+            if not isinstance(item, dict) or item.get("op") not in OPS:
+                self.fail(i, f"op must be one of {', '.join(OPS)}.")
+                continue
+            if item["op"] == "create":
+                if not item.get("title") or not item.get("project"):
+                    self.fail(i, "create needs project and title.")
+                    continue
+                if not isinstance(item["project"], int):
+                    self.fail(i, "project must be an integer id.")
+                    continue
+                if "ref" in item and not isinstance(item["ref"], str):
+                    self.fail(i, "ref must be a string.")
+                    continue
+                if item.get("ref"):
+                    if item["ref"] in refs:
+                        raise BulkTaskError(f"ref {item['ref']!r} is used by items {refs[item['ref']]} and {i}.")
+                    refs[item["ref"]] = i
+            elif not isinstance(item.get("id"), int):
+                self.fail(i, f"{item['op']} needs an integer id.")
+                continue
+            self._check_fields(i, item)
+        self.refs = refs
+
+        # failed items are skipped: their fields may hold anything
+        task_ids = set()
+        for i, item in enumerate(self.items):
+            if self.results[i].get("ok") is False:
+                continue
+            if isinstance(item.get("id"), int):
+                task_ids.add(item["id"])
+            for value in [item.get("parent"), *(item.get("dependencies") or [])]:
+                if isinstance(value, int):
+                    task_ids.add(value)
+        self.tasks = Task.objects.in_bulk(task_ids)
+        project_ids = {t.project_id for t in self.tasks.values()}
+        project_ids |= {item["project"] for _, item in self.ok_items("create")}
+        allowed = accessible_project_ids(self.user, project_ids)
+
+        user_ids = {u for _, item in self.ok_items("create") + self.ok_items("update")
+                    for u in item.get("assigned_to") or []}
+        known_users = set(User.objects.filter(id__in=user_ids).values_list("id", flat=True))
+
+        for i, item in enumerate(self.items):
+            if self.results[i].get("ok") is False:
+                continue
+            if item["op"] == "create":
+                project_id = item["project"]
+            else:
+                task = self.tasks.get(item["id"])
+                if task is None:
+                    self.fail(i, f"Task {item['id']} not found.")
+                    continue
+                project_id = task.project_id
+            if project_id not in allowed:
+                self.fail(i, "You do not have access to this project.")
+                continue
+            for value in [item.get("parent"), *(item.get("dependencies") or [])]:
+                if value is None:
+                    continue
+                if isinstance(value, str) and value in refs:
+                    continue
+                if not isinstance(value, int) or value not in self.tasks:
+                    self.fail(i, f"Unknown task reference {value!r}.")
+                    break
+            missing_users = {u for u in item.get("assigned_to") or []} - known_users
+            if missing_users and self.results[i].get("ok") is not False:
+                self.fail(i, f"Unknown users: {sorted(missing_users, key=str)}")
+
+        # drop items that point at a ref whose create failed, until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for i, item in enumerate(self.items):
+                if self.results[i].get("ok") is False:
+                    continue
+                for value in [item.get("parent"), *(item.get("dependencies") or [])]:
+                    if isinstance(value, str) and self.results[refs[value]].get("ok") is False:
+                        self.fail(i, f"Referenced item {value!r} failed.")
+                        changed = True
+                        break
+        self._check_links(allowed)
+
+    def _node(self, value):
+        return ("ref", self.refs[value]) if isinstance(value, str) else value
+
+    def _check_links(self, allowed):
+        """
+        Batch-wide rules for the parent and dependency links of the items left;
+        a break rejects the whole request: dependencies only on tasks the user
+        can access, parents in the task's own project, no parent cycles.
+        """
+        parents = {}
+        for i, item in enumerate(self.items):
+            if self.results[i].get("ok") is False or item["op"] == "delete":
+                continue
+            node = ("ref", i) if item["op"] == "create" else item["id"]
+            project_id = item["project"] if item["op"] == "create" else self.tasks[item["id"]].project_id
+            for value in item.get("dependencies") or []:
+                if isinstance(value, int) and self.tasks[value].project_id not in allowed:
+                    raise BulkTaskError(f"You do not have access to task {value}.")
+            if "parent" not in item:
+                continue
+            parent = item["parent"]
+            if parent is not None:
+                parent_project = (self.tasks[parent].project_id if isinstance(parent, int)
+                                  else self.items[self.refs[parent]]["project"])
+                if parent_project != project_id:
+                    raise BulkTaskError(f"Parent {parent!r} of item {i} is in another project.")
+            parents[node] = self._node(parent) if parent is not None else None
+        if not parents:
+            return
+
+        # the new links plus the current parents of the projects they touch must stay a forest
+        projects = {self.tasks[n].project_id if isinstance(n, int) else self.items[n[1]]["project"] for n in parents}
+        current = dict(Task.objects.filter(project_id__in=projects).values_list("id", "parent_id"))
+        for start in parents:
+            node, seen = start, set()
+            while node is not None:
+                if node in seen:
+                    label = node if isinstance(node, int) else self.items[node[1]].get("ref") or f"item {node[1]}"
+                    raise BulkTaskError(f"Parent links would form a cycle through {label}.")
+                seen.add(node)
+                node = parents[node] if node in parents else current.get(node)
+
+    def _resolve(self, value, created):
+        if isinstance(value, str):
+            return created[self.refs[value]].pk
+        return value
+
+    def apply(self):
+        self.validate()
+        status_changes = []
+        status_log = []
+        finished_changed = set()
+        created = {}
+        with transaction.atomic():
+            # creates; without an explicit order they go to the end of their project, GAP apart
+            ranks = {}
+            for i, item in self.ok_items("create"):
+                project_id = item["project"]
+                if "order" in item:
+                    order = item["order"]
+                else:
+                    ranks[project_id] = ranks[project_id] + GAP if project_id in ranks else next_rank(project_id)
+                    order = ranks[project_id]
+                created[i] = Task(
+                    project_id=project_id, title=item["title"],
+                    description=item.get("description", ""), order=order,
+                    status=item.get("status", Task.Status.TODO),
+                )
+            Task.objects.bulk_create(list(created.values()), batch_size=BATCH_SIZE)
+            status_changes += [(t.project_id, None, t.status) for t in created.values()]
+            status_log += [(t.pk, t.project_id, None, t.status) for t in created.values()]
+
+            # updates (parents of new tasks are set here too, once every ref has an id)
+            updated, fields = [], set()
+            for i, item in self.ok_items("create"):
+                if item.get("parent") is not None:
+                    created[i].parent_id = self._resolve(item["parent"], created)
+                    updated.append(created[i])
+                    fields.add("parent")
+            now = timezone.now()
+            for i, item in self.ok_items("update"):
+                task = self.tasks[item["id"]]
+                task.updated_at = now
+                old_status = task.status
+                for field in UPDATABLE:
+                    if field in item:
+                        value = item[field]
+                        if field == "parent":
+                            task.parent_id = self._resolve(value, created) if value is not None else None
+                        else:
+                            setattr(task, field, value)
+                        fields.add(field)
+                if task.status != old_status:
+                    status_changes.append((task.project_id, old_status, task.status))
+                    status_log.append((task.pk, task.project_id, old_status, task.status))
+                    if (old_status == Task.Status.DONE) != (task.status == Task.Status.DONE):
+                        finished_changed.add(task.pk)
+                updated.append(task)
+            if updated and fields:
+                Task.objects.bulk_update(updated, [*fields, "updated_at"], batch_size=BATCH_SIZE)
+
+            # assignments: listed users replace the current ones
+            assign = {}
+            for i, item in self.ok_items("create") + self.ok_items("update"):
+                if "assigned_to" in item:
+                    task_id = created[i].pk if item["op"] == "create" else item["id"]
+                    assign[task_id] = set(item["assigned_to"])
+            if assign:
+                existing = defaultdict(set)
+                for task_id, user_id in TaskAssignment.objects.filter(task_id__in=assign).values_list("task_id", "user_id"):
+                    existing[task_id].add(user_id)
+                stale = Q()
+                for task_id, users in assign.items():
+                    if existing[task_id] - users:
+                        stale |= Q(task_id=task_id, user_id__in=existing[task_id] - users)
+                if stale:
+                    TaskAssignment.objects.filter(stale).delete()
+                new_assignments = [TaskAssignment(task_id=task_id, user_id=user_id)
+                                   for task_id, users in assign.items() for user_id in users - existing[task_id]]
+                TaskAssignment.objects.bulk_create(new_assignments, batch_size=BATCH_SIZE)
+                if new_assignments:
+                    transaction.on_commit(lambda: assignments_bulk_created.send(
+                        sender=TaskAssignment, assignments=new_assignments))
+
+            # dependencies: listed tasks replace the current edges
+            Edge = Task.dependencies.through
+            deps = {}
+            for i, item in self.ok_items("create") + self.ok_items("update"):
+                if "dependencies" in item:
+                    task_id = created[i].pk if item["op"] == "create" else item["id"]
+                    deps[task_id] = {self._resolve(v, created) for v in item["dependencies"]}
+            if deps:
+                Edge.objects.filter(from_task_id__in=deps).delete()
+                Edge.objects.bulk_create([Edge(from_task_id=task_id, to_task_id=dep_id)
+                                          for task_id, dep_ids in deps.items() for dep_id in dep_ids],
+                                         batch_size=BATCH_SIZE)
+                # one cycle check for the whole batch, following the edges into other projects too
+                _, cyclic = DependencyGraph.reachable_from(deps).topological_order()
+                if set(cyclic) & deps.keys():
+                    raise BulkTaskError(f"Dependencies would create a cycle among tasks {sorted(cyclic)}.")
+
+            # deletes
+            delete_ids = [item["id"] for _, item in self.ok_items("delete")]
+            if delete_ids:
+                Task.objects.filter(id__in=delete_ids).delete()
+
+            # bulk writes skip the signals that keep open_dependency_count in step
+            if deps:
+                Task.objects.filter(id__in=deps).refresh_open_dependency_counts()
+            if finished_changed:
+                Task.objects.dependents_of(finished_changed).refresh_open_dependency_counts()
+
+            apply_task_status_changes(status_changes)
+            # tasks deleted later in the batch have lost their rows already
+            TaskStatusChange.record([c for c in status_log if c[0] not in delete_ids], changed_at=now)
+            rollup_projects = {t.project_id for t in created.values()}
+            if fields & {"status", "parent"}:
+                rollup_projects |= {self.tasks[item["id"]].project_id for _, item in self.ok_items("update")}
+            rebuild_project_rollups(rollup_projects)
+            # bulk_create/bulk_update skip the assignment and status receivers
+            workload_projects = {t.project_id for t in created.values() if t.pk in assign}
+            workload_projects |= {self.tasks[pk].project_id for pk in (finished_changed | assign.keys())
+                                  if pk in self.tasks}
+            rebuild_workloads(workload_projects)
+            bump_versions({t.project_id for t in self.tasks.values()} | {t.project_id for t in created.values()})
+
+        for i, item in enumerate(self.items):
+            if self.results[i].get("ok") is False:
+                continue
+            task_id = created[i].pk if i in created else item["id"]
+            self.results[i].update(ok=True, id=task_id)
+        return self.results
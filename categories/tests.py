@@ -1,3 +1,1025 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from accounts.models import User
+from activity.tests import ServerLoopTestCase
+from teams.models import Team
+from .analytics import grouped_percentiles
+from .cloning import _run_clone_job
+from .daily_time import refresh_daily_time
+from .archive import _delete_entries, archive_time_entries
+from .models import (
+    ArchivedTimeEntry, Category, CloneJob, DailyTimeRollup, Project, ProjectWorkload, ReportJob, Task, TaskAssignment, TaskStatusChange,
+    TimeEntry, path_to_ids,
+)
+from .ordering import GAP, next_rank
+from .report_cache import data_version, report_cache
+from .report_jobs import execute_job, notify
+from .task_bulk import BulkTaskOperation
+from .timers import lock_user
+from .rollup import project_rollups, rebuild_project_rollups
+from .stats import reconcile_time_totals
+
+
+class CategoryPathTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("owner@example.com", "pw-12345678"))
+        self.root = Category.objects.create(name="Root", slug="root")
+        self.other = Category.objects.create(name="Other", slug="other")
+        self.branch = Category.objects.create(name="Branch", slug="branch", parent=self.root)
+        self.leaf = Category.objects.create(name="Leaf", slug="leaf", parent=self.branch)
+
+    def paths(self, *nodes):
+        return [tuple(Category.objects.values_list("path_ids", "path_names").get(pk=node.pk)) for node in nodes]
+
+    def test_move_and_rename_refresh_the_subtree(self):
+        response = self.client.post(f"/api/categories/{self.branch.pk}/move/", {"parent_id": self.other.pk})
+        self.assertEqual(response.status_code, 200)
+        ids = f"/{self.other.pk}/{self.branch.pk}/"
+        self.assertEqual(self.paths(self.branch, self.leaf), [
+            (ids, ["Other", "Branch"]),
+            (f"{ids}{self.leaf.pk}/", ["Other", "Branch", "Leaf"]),
+        ])
+
+        self.other.refresh_from_db()
+        self.other.name = "Renamed"
+        self.other.save()
+        self.assertEqual(self.paths(self.leaf), [(f"{ids}{self.leaf.pk}/", ["Renamed", "Branch", "Leaf"])])
+        self.leaf.refresh_from_db()
+        self.assertEqual(self.leaf.full_path(), "Renamed > Branch > Leaf")
+
+    def test_deep_paths_are_not_truncated(self):
+        parent = self.leaf
+        for depth in range(200):
+            parent = Category.objects.create(name=f"level {depth}", slug=f"level-{depth}", parent=parent)
+        parent.refresh_from_db()
+        self.assertGreater(len(parent.path_ids), 512)
+        self.assertEqual(path_to_ids(parent.path_ids),
+                         list(parent.get_ancestors(include_self=True).values_list("id", flat=True)))
+
+
+class CategoryTreeCacheTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("owner@example.com", "pw-12345678"))
+        self.root = Category.objects.create(name="Root", slug="root")
+        self.leaf = Category.objects.create(name="Leaf", slug="leaf", parent=self.root)
+
+    def tree(self):
+        return self.client.get("/api/categories/tree/").json()
+
+    def test_cached_tree_follows_committed_writes(self):
+        [root] = self.tree()
+        self.assertEqual([child["name"] for child in root["children"]], ["Leaf"])
+        with CaptureQueriesContext(connection) as queries:
+            self.tree()
+        self.assertFalse(any("categories_category" in q["sql"] for q in queries.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leaf.name = "Renamed"
+            self.leaf.save()
+        [root] = self.tree()
+        self.assertEqual([child["name"] for child in root["children"]], ["Renamed"])
+
+
+class TaxonomyBulkTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user("owner@example.com", "pw-12345678"))
+
+    def subtree(self, slug):
+        return list(Category.objects.get(slug=slug).get_descendants().values_list("slug", flat=True))
+
+    def test_import_builds_trees_and_paths(self):
+        nodes = [{"name": "Science", "slug": "science", "children": [
+            {"name": "Physics", "slug": "physics", "children": [{"name": "Optics", "slug": "optics"}]},
+            {"name": "Biology", "slug": "biology"},
+        ]}]
+        response = self.client.post("/api/categories/import/", nodes, format="json")
+        self.assertEqual((response.status_code, response.json()["created"]), (201, 4))
+        upload = SimpleUploadedFile("tax.csv", b"name,slug,parent\nQuantum,quantum,physics\n")
+        response = self.client.post("/api/categories/import/", {"file": upload})
+        self.assertEqual((response.status_code, response.json()["created"]), (201, 1))
+
+        self.assertEqual(self.subtree("science"), ["biology", "physics", "optics", "quantum"])
+        quantum = Category.objects.get(slug="quantum")
+        self.assertEqual(quantum.path_names, ["Science", "Physics", "Quantum"])
+        self.assertEqual(path_to_ids(quantum.path_ids),
+                         list(quantum.get_ancestors(include_self=True).values_list("id", flat=True)))
+
+    def test_batch_move_retrees_and_rejects_cycles(self):
+        root = Category.objects.create(name="Root", slug="root")
+        branch = Category.objects.create(name="Branch", slug="branch", parent=root)
+        leaf = Category.objects.create(name="Leaf", slug="leaf", parent=branch)
+        other = Category.objects.create(name="Other", slug="other")
+
+        response = self.client.post("/api/categories/batch-move/", {"moves": [
+            {"id": leaf.pk, "parent_id": other.pk}, {"id": branch.pk, "parent_id": None},
+        ]}, format="json")
+        self.assertEqual((response.status_code, response.json()["moved"]), (200, 2))
+        self.assertEqual((self.subtree("root"), self.subtree("branch"), self.subtree("other")), ([], [], ["leaf"]))
+        leaf.refresh_from_db()
+        self.assertEqual((leaf.path_ids, leaf.path_names), (f"/{other.pk}/{leaf.pk}/", ["Other", "Leaf"]))
+
+        response = self.client.post("/api/categories/batch-move/", {"moves": [
+            {"id": other.pk, "parent_id": leaf.pk},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.subtree("other"), ["leaf"])
+
+
+class CategoryProjectsTests(APITestCase):
+    def test_subtree_projects_page_by_cursor(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        root = Category.objects.create(name="Root", slug="root")
+        child = Category.objects.create(name="Child", slug="child", parent=root)
+        grandchild = Category.objects.create(name="Grandchild", slug="grandchild", parent=child)
+        other = Category.objects.create(name="Other", slug="other")
+        for i, category in enumerate([root, child, grandchild, other, child, grandchild, root]):
+            Project.objects.create(title=f"project {i}", owner=user, category=category)
+        # equal timestamps leave the order to the id tie-breaker
+        Project.objects.update(created_at=timezone.now())
+        self.client.force_authenticate(user)
+
+        seen, url = [], f"/api/categories/{child.pk}/projects/?page_size=2"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 2)
+            seen += [row["id"] for row in page["results"]]
+            url = page["next"]
+        expected = Project.objects.filter(category__in=[child, grandchild]).order_by("-id")
+        self.assertEqual(seen, list(expected.values_list("id", flat=True)))
+        self.assertEqual(len(self.client.get(f"/api/categories/{root.pk}/projects/").json()["results"]), 6)
+
+
+class CategoryStatsTests(APITestCase):
+    def stats(self, category, live=False):
+        url = f"/api/categories/{category.pk}/stats/" + ("?live=true" if live else "")
+        return {row["name"]: row for row in self.client.get(url).json()}
+
+    def assertStats(self, category, **expected):
+        stored = self.stats(category)
+        self.assertEqual(stored, self.stats(category, live=True))
+        self.assertEqual({name: (row["task_count"], row["done_count"], float(row["total_time"]))
+                          for name, row in stored.items()}, expected)
+
+    def test_stored_stats_follow_reparenting(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(user)
+        first = Category.objects.create(name="First", slug="first")
+        second = Category.objects.create(name="Second", slug="second")
+        branch = Category.objects.create(name="Branch", slug="branch", parent=first)
+        leaf = Category.objects.create(name="Leaf", slug="leaf", parent=branch)
+        project = Project.objects.create(title="Board", owner=user, category=leaf)
+        Task.objects.create(project=project, title="open")
+        done = Task.objects.create(project=project, title="done", status=Task.Status.DONE)
+        start = timezone.now()
+        TimeEntry.objects.create(task=done, user=user, start_time=start, end_time=start + timedelta(hours=1))
+        self.assertStats(first, First=(2, 1, 3600), Branch=(2, 1, 3600), Leaf=(2, 1, 3600))
+
+        self.client.post(f"/api/categories/{branch.pk}/move/", {"parent_id": second.pk})
+        self.assertStats(first, First=(0, 0, 0))
+        self.assertStats(second, Second=(2, 1, 3600), Branch=(2, 1, 3600), Leaf=(2, 1, 3600))
+
+        project.category = first
+        project.save()
+        self.assertStats(second, Second=(0, 0, 0), Branch=(0, 0, 0), Leaf=(0, 0, 0))
+        self.assertStats(first, First=(2, 1, 3600))
+
+
+class TaskListQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title="Board", owner=self.user)
+
+    def add_tasks(self, count):
+        start = timezone.now()
+        for i in range(count):
+            task = Task.objects.create(project=self.project, title=f"task {i}", order=i)
+            dep = Task.objects.create(project=self.project, title=f"dep {i}", order=i)
+            task.dependencies.add(dep)
+            TimeEntry.objects.create(task=task, user=self.user, start_time=start, end_time=start + timedelta(minutes=30))
+
+    def count_list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/tasks/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response.json()
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        self.add_tasks(2)
+        small, _ = self.count_list_queries()
+        self.add_tasks(20)
+        large, data = self.count_list_queries()
+        self.assertEqual(small, large)
+        self.assertEqual(len(data), 44)
+
+    def test_annotations_match_model_methods(self):
+        self.add_tasks(1)
+        _, data = self.count_list_queries()
+        for row in data:
+            task = Task.objects.get(pk=row["id"])
+            self.assertEqual(row["is_blocked"], task.is_blocked())
+            spent = task.total_time_spent()
+            self.assertEqual(row["total_time"], str(spent.total_seconds()) if spent else 0)
+
+
+class CloneProjectTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.member = User.objects.create_user("member@example.com", "pw-12345678")
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        root = Task.objects.create(project=self.project, title="root", status=Task.Status.DONE)
+        child = Task.objects.create(project=self.project, title="child", parent=root)
+        Task.objects.create(project=self.project, title="grandchild", parent=child)
+        other = Task.objects.create(project=self.project, title="other")
+        other.dependencies.add(root, child)
+        TaskAssignment.objects.create(task=root, user=self.member)
+        self.client.force_authenticate(self.user)
+
+    def clone(self, **data):
+        return self.client.post(f"/api/projects/{self.project.id}/clone/", data, format="json")
+
+    def cloned_tasks(self, project_id):
+        return {task.title: task for task in Task.objects.filter(project_id=project_id)}
+
+    def test_clone_remaps_tree_edges_and_counters(self):
+        response = self.clone(title="Copy", include_assignments="true")
+        self.assertEqual(response.status_code, 201)
+        tasks = self.cloned_tasks(response.data["id"])
+        self.assertEqual(len(tasks), 4)
+        self.assertEqual(tasks["child"].parent_id, tasks["root"].id)
+        self.assertEqual(tasks["grandchild"].parent_id, tasks["child"].id)
+        self.assertIsNone(tasks["root"].parent_id)
+        self.assertEqual(set(tasks["other"].dependencies.values_list("id", flat=True)),
+                         {tasks["root"].id, tasks["child"].id})
+        # clones start over as to-do, so both dependencies are open again
+        self.assertEqual(tasks["other"].open_dependency_count, 2)
+        self.assertEqual([tasks[t].subtree_size for t in ("root", "child", "grandchild", "other")], [3, 2, 1, 1])
+        self.assertEqual(list(TaskAssignment.objects.filter(task__project=response.data["id"])
+                              .values_list("task_id", "user_id")), [(tasks["root"].id, self.member.id)])
+        self.assertEqual(ProjectWorkload.objects.get(project=response.data["id"], user=self.member).assigned_count, 1)
+
+    def test_assignments_are_optional(self):
+        response = self.clone()
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(TaskAssignment.objects.filter(task__project=response.data["id"]).exists())
+
+    @override_settings(PROJECT_CLONE_ASYNC_THRESHOLD=2)
+    def test_large_projects_clone_in_a_background_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.clone(title="Later")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data["status"], len(callbacks)), (CloneJob.Status.PENDING, 1))
+
+        # what the background thread runs once the request commits
+        _run_clone_job(response.data["id"])
+        job = self.client.get(f"/api/projects/clone-jobs/{response.data['id']}/").json()
+        self.assertEqual(job["status"], CloneJob.Status.DONE)
+        self.assertEqual(len(self.cloned_tasks(job["result"])), 4)
+
+
+class DependencyGraphTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        self.a, self.b, self.c, self.d = (Task.objects.create(project=self.project, title=t) for t in "abcd")
+        self.b.dependencies.add(self.a)
+        self.c.dependencies.add(self.b)
+        self.d.dependencies.add(self.a)
+        start = timezone.now()
+        TimeEntry.objects.create(task=self.d, user=self.user, start_time=start, end_time=start + timedelta(hours=5))
+
+    def get(self, path):
+        return self.client.get(f"/api/projects/{self.project.pk}/{path}/").json()
+
+    def test_order_next_tasks_and_critical_path(self):
+        result = self.get("task-order")
+        self.assertFalse(result["has_cycle"])
+        position = {task_id: i for i, task_id in enumerate(result["order"])}
+        for task, dependency in ((self.b, self.a), (self.c, self.b), (self.d, self.a)):
+            self.assertLess(position[dependency.pk], position[task.pk])
+
+        self.assertEqual([row["id"] for row in self.get("next-tasks")], [self.a.pk])
+        self.a.status = Task.Status.DONE
+        self.a.save()
+        self.assertEqual(sorted(row["id"] for row in self.get("next-tasks")), [self.b.pk, self.d.pk])
+
+        self.assertEqual(self.get("critical-path"), {"tasks": [self.a.pk, self.b.pk, self.c.pk], "length": 3,
+                                                     "weight": "tasks"})
+        by_time = self.client.get(f"/api/projects/{self.project.pk}/critical-path/?weight=time").json()
+        self.assertEqual((by_time["tasks"], by_time["length"]), ([self.a.pk, self.d.pk], 5))
+
+    def test_dependency_that_closes_a_cycle_is_rejected(self):
+        response = self.client.patch(f"/api/tasks/{self.a.pk}/", {"dependencies_ids": [self.c.pk]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.a.dependencies.exists())
+        response = self.client.patch(f"/api/tasks/{self.c.pk}/", {"dependencies_ids": [self.d.pk]}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+
+    def test_cycles_through_another_project_are_rejected(self):
+        other = Project.objects.create(title="Other", owner=self.user)
+        outside, further = (Task.objects.create(project=other, title=title) for title in ("x", "y"))
+        outside.dependencies.add(further)
+        further.dependencies.add(self.c)
+        # a -> outside -> further -> c -> b -> a; the outside -> further edge never touches this project
+        self.assertTrue(self.a.has_circular_dependency(outside))
+        self.assertFalse(self.d.has_circular_dependency(outside))
+        response = self.client.patch(f"/api/tasks/{self.a.pk}/", {"dependencies_ids": [outside.pk]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/tasks/bulk/", {"operations": [
+            {"op": "update", "id": self.a.pk, "dependencies": [outside.pk]},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.a.dependencies.exists())
+
+class OpenDependencyCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        self.task = Task.objects.create(project=self.project, title="task")
+        self.deps = [Task.objects.create(project=self.project, title=f"dep {i}") for i in range(2)]
+
+    def count(self):
+        self.task.refresh_from_db()
+        return self.task.open_dependency_count
+
+    def test_counter_follows_edges_and_status(self):
+        self.task.dependencies.add(*self.deps)
+        self.assertEqual(self.count(), 2)
+        self.deps[0].status = Task.Status.DONE
+        self.deps[0].save()
+        self.assertEqual(self.count(), 1)
+        self.deps[1].dependents.clear()
+        self.assertEqual(self.count(), 0)
+        self.deps[0].status = Task.Status.TODO
+        self.deps[0].save()
+        self.assertEqual(self.count(), 1)
+        self.deps[0].delete()
+        self.assertEqual(self.count(), 0)
+
+    def test_bulk_endpoint_and_filter(self):
+        response = self.client.post("/api/tasks/bulk/", [
+            {"op": "update", "id": self.task.id, "dependencies": [d.id for d in self.deps]},
+            {"op": "update", "id": self.deps[0].id, "status": Task.Status.DONE},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.count(), 1)
+        blocked = self.client.get("/api/tasks/?blocked=true").json()
+        self.assertEqual([row["id"] for row in blocked], [self.task.id])
+        self.assertTrue(blocked[0]["is_blocked"])
+        self.assertEqual(len(self.client.get("/api/tasks/?blocked=false").json()), 2)
+
+
+class BulkTaskValidationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        stranger = User.objects.create_user("stranger@example.com", "pw-12345678")
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        self.root = Task.objects.create(project=self.project, title="root")
+        self.child = Task.objects.create(project=self.project, title="child", parent=self.root)
+        self.grandchild = Task.objects.create(project=self.project, title="grandchild", parent=self.child)
+        self.mine = Task.objects.create(project=Project.objects.create(title="Mine", owner=self.user), title="mine")
+        self.foreign = Task.objects.create(project=Project.objects.create(title="Theirs", owner=stranger),
+                                           title="foreign")
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, *operations):
+        return self.client.post("/api/tasks/bulk/", {"operations": list(operations)}, format="json")
+
+    def assertRejected(self, *operations):
+        tasks = Task.objects.count()
+        response = self.bulk(*operations)
+        self.assertEqual(response.status_code, 400, response.data)
+        self.assertEqual(Task.objects.count(), tasks)
+        return response.data["detail"]
+
+    def test_parent_must_be_in_the_same_project(self):
+        self.assertRejected({"op": "update", "id": self.root.id, "parent": self.mine.id})
+        self.assertRejected({"op": "create", "project": self.mine.project_id, "title": "x", "parent": self.root.id})
+        self.assertRejected({"op": "create", "project": self.project.id, "title": "a", "ref": "a"},
+                            {"op": "create", "project": self.mine.project_id, "title": "b", "parent": "a"})
+
+    def test_parent_cycles_are_rejected(self):
+        self.assertIn("cycle", self.assertRejected({"op": "update", "id": self.root.id, "parent": self.grandchild.id}))
+        self.assertRejected({"op": "create", "project": self.project.id, "title": "a", "ref": "a", "parent": "b"},
+                            {"op": "create", "project": self.project.id, "title": "b", "ref": "b", "parent": "a"})
+        self.root.refresh_from_db()
+        self.assertIsNone(self.root.parent_id)
+
+        # swapping places within one batch is fine
+        response = self.bulk({"op": "update", "id": self.child.id, "parent": None},
+                             {"op": "update", "id": self.root.id, "parent": self.child.id})
+        self.assertEqual(response.status_code, 200)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.parent_id, self.child.id)
+
+    def test_dependencies_need_access_to_their_project(self):
+        self.assertIn("access", self.assertRejected(
+            {"op": "update", "id": self.root.id, "dependencies": [self.foreign.id]}))
+        self.assertFalse(self.root.dependencies.exists())
+        response = self.bulk({"op": "update", "id": self.root.id, "dependencies": [self.mine.id]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.root.dependencies.all()), [self.mine])
+
+    def test_duplicate_refs_are_rejected(self):
+        self.assertIn("ref", self.assertRejected(
+            {"op": "create", "project": self.project.id, "title": "a", "ref": "x"},
+            {"op": "create", "project": self.project.id, "title": "b", "ref": "x"},
+            {"op": "create", "project": self.project.id, "title": "c", "parent": "x"}))
+
+
+    def test_creates_are_ranked_after_the_existing_tasks(self):
+        last = next_rank(self.project.id)
+        response = self.bulk(*({"op": "create", "project": self.project.id, "title": t} for t in "ab"),
+                             {"op": "create", "project": self.mine.project_id, "title": "c"},
+                             {"op": "create", "project": self.project.id, "title": "d", "order": 7})
+        self.assertEqual(response.status_code, 200)
+        ranks = dict(Task.objects.filter(title__in="abcd").values_list("title", "order"))
+        self.assertEqual(ranks, {"a": last, "b": last + GAP, "c": self.mine.order + GAP, "d": 7})
+
+    def test_malformed_fields_fail_their_item(self):
+        response = self.bulk(
+            {"op": "update", "id": self.root.id, "dependencies": 5},
+            {"op": "update", "id": self.child.id, "assigned_to": 5},
+            {"op": "update", "id": self.child.id, "assigned_to": [{"id": 1}]},
+            {"op": "update", "id": self.child.id, "dependencies": [[1]]},
+            {"op": "create", "project": self.project.id, "title": "a", "ref": ["a"]},
+            {"op": "create", "project": [self.project.id], "title": "b"},
+            {"op": "update", "id": self.grandchild.id, "title": "renamed"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["ok"] for row in response.data["results"]], [False] * 6 + [True])
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.title, "renamed")
+        self.assertFalse(self.root.dependencies.exists())
+
+
+class TaskMoveTests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(user)
+        self.project = Project.objects.create(title="Board", owner=user)
+        self.tasks = []
+        for title in "abc":
+            response = self.client.post("/api/tasks/", {"project": self.project.pk, "title": title})
+            self.tasks.append(Task.objects.get(pk=response.json()["id"]))
+
+    def titles(self):
+        return "".join(self.project.tasks.order_by("order", "id").values_list("title", flat=True))
+
+    def move(self, task, **anchor):
+        return self.client.post(f"/api/tasks/{task.pk}/move/", {k: v.pk for k, v in anchor.items()})
+
+    def test_move_writes_only_the_moved_task(self):
+        a, b, c = self.tasks
+        self.assertEqual([task.order for task in self.tasks], [GAP, 2 * GAP, 3 * GAP])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.move(c, before=a).status_code, 200)
+        updates = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.titles(), "cab")
+        self.move(a, after=b)
+        self.assertEqual(self.titles(), "cba")
+
+    def test_move_without_room_rebalances(self):
+        a, b, c = self.tasks
+        for rank, task in enumerate(self.tasks, start=1):
+            Task.objects.filter(pk=task.pk).update(order=rank)
+        self.assertEqual(self.move(c, after=a).status_code, 200)
+        self.assertEqual(self.titles(), "acb")
+        self.assertEqual(sorted(self.project.tasks.values_list("order", flat=True)), [GAP, GAP + GAP // 2, 2 * GAP])
+
+    def test_anchor_must_be_another_task_of_the_project(self):
+        a, b, _ = self.tasks
+        stranger = Task.objects.create(project=Project.objects.create(title="Other", owner=self.project.owner),
+                                       title="x")
+        self.assertEqual(self.move(a, before=stranger).status_code, 400)
+        self.assertEqual(self.move(a, before=a).status_code, 400)
+        self.assertEqual(self.move(a, before=b, after=b).status_code, 400)
+        self.assertEqual(self.titles(), "abc")
+
+
+class SubtaskRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        self.root = Task.objects.create(project=self.project, title="root")
+        self.child = Task.objects.create(project=self.project, title="child", parent=self.root)
+        self.leaf = Task.objects.create(project=self.project, title="leaf", parent=self.child)
+
+    def assertStoredMatchesLive(self):
+        live = project_rollups(self.project.id)
+        stored = {t.id: (t.subtree_size, t.subtree_progress, t.subtree_duration)
+                  for t in Task.objects.filter(project=self.project)}
+        self.assertEqual(stored, live)
+
+    def test_incremental_updates_match_recursive_query(self):
+        self.leaf.status = Task.Status.DONE
+        self.leaf.save()
+        start = timezone.now()
+        TimeEntry.objects.create(task=self.leaf, user=self.user, start_time=start, end_time=start + timedelta(hours=1))
+        self.assertStoredMatchesLive()
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.progress_percentage(), 33)
+        self.assertEqual(self.root.subtree_duration, timedelta(hours=1))
+
+        self.leaf.parent = self.root
+        self.leaf.save()
+        self.assertStoredMatchesLive()
+        self.child.delete()
+        self.assertStoredMatchesLive()
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.subtree_size, 2)
+
+
+class TimerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(self.user)
+        project = Project.objects.create(title="Board", owner=self.user)
+        self.first = Task.objects.create(project=project, title="first")
+        self.second = Task.objects.create(project=project, title="second")
+        self.start = timezone.now() - timedelta(hours=2)
+
+    def start_timer(self, task, start):
+        return self.client.post(f"/api/tasks/{task.pk}/start-timer/", {"start_time": start.isoformat()})
+
+    def test_starting_a_timer_closes_the_running_one(self):
+        self.assertEqual(self.start_timer(self.first, self.start).json()["stopped"], [])
+        response = self.start_timer(self.second, self.start + timedelta(hours=1))
+        self.assertEqual(response.status_code, 201)
+        [stopped] = response.json()["stopped"]
+        self.assertEqual((stopped["task"], stopped["duration"]), (self.first.pk, "01:00:00"))
+
+        [active] = self.client.get("/api/time-entries/active/").json()
+        self.assertEqual((active["task"], active["task_title"]), (self.second.pk, "second"))
+        self.assertEqual(self.client.post(f"/api/tasks/{self.first.pk}/stop-timer/").status_code, 400)
+        self.assertEqual(self.client.post(f"/api/tasks/{self.second.pk}/stop-timer/").status_code, 200)
+        self.assertEqual(self.client.get("/api/time-entries/active/").json(), [])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.total_duration, timedelta(hours=1))
+
+    def test_open_entry_through_the_list_endpoint_stops_the_timer(self):
+        self.start_timer(self.first, self.start)
+        with mock.patch("categories.views.lock_user", wraps=lock_user) as locked:
+            response = self.client.post("/api/time-entries/", {
+                "task": self.second.pk, "start_time": (self.start + timedelta(minutes=30)).isoformat(),
+            })
+        self.assertEqual(response.status_code, 201)
+        # the user row lock serializes this with concurrent starts
+        locked.assert_called_once_with(self.user)
+        [active] = self.client.get("/api/time-entries/active/").json()
+        self.assertEqual(active["id"], response.json()["id"])
+        self.assertEqual(self.client.post(f"/api/tasks/{self.first.pk}/start-timer/",
+                                          {"start_time": "yesterday"}).status_code, 400)
+
+
+class TimeTotalsTests(APITestCase):
+    def test_counters_follow_time_entry_writes(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        project = Project.objects.create(title="Board", owner=user)
+        first = Task.objects.create(project=project, title="first")
+        second = Task.objects.create(project=project, title="second")
+        start = timezone.now()
+        entry = TimeEntry.objects.create(task=first, user=user, start_time=start, end_time=start + timedelta(hours=1))
+        TimeEntry.objects.create(task=second, user=user, start_time=start, end_time=start + timedelta(hours=2))
+        entry.task = second
+        entry.save()
+        project.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(project.total_duration, timedelta(hours=3))
+        self.assertEqual(second.total_duration, timedelta(hours=3))
+        entry.delete()
+        self.assertEqual(reconcile_time_totals(), {"tasks": 0, "projects": 0})
+        project.refresh_from_db()
+        self.assertEqual(project.total_time_spent(), timedelta(hours=2))
+
+
+@override_settings(REPORT_JOB_WORKERS=0)
+class TimeImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        self.parent = Task.objects.create(project=self.project, title="parent")
+        self.task = Task.objects.create(project=self.project, title="task", parent=self.parent)
+        self.client.force_authenticate(self.user)
+
+    def upload(self, content):
+        return self.client.post("/api/time-entries/import/",
+                                {"file": SimpleUploadedFile("entries.csv", content)}, format="multipart")
+
+    def assertTotals(self, hours):
+        self.task.refresh_from_db()
+        self.parent.refresh_from_db()
+        self.project.refresh_from_db()
+        spent = timedelta(hours=hours)
+        self.assertEqual((self.task.total_duration, self.parent.subtree_duration, self.project.total_duration),
+                         (spent, spent, spent))
+        self.assertEqual(ProjectWorkload.objects.get(user=self.user).logged_duration, spent)
+        daily = DailyTimeRollup.objects.filter(task=self.task)
+        self.assertEqual(sum((row.total_duration for row in daily), timedelta()), spent)
+        self.assertEqual(reconcile_time_totals(), {"tasks": 0, "projects": 0})
+        self.assertEqual(rebuild_project_rollups([self.project.id]), 0)
+
+    def test_rejected_rows_are_reported_by_line(self):
+        content = (
+            "task,start_time,duration\n"
+            f"{self.task.id},2026-01-05T09:00:00,01:00:00\n"
+            f"{self.task.id},not a date,01:00:00\n"
+            "999999,2026-01-05T09:00:00,01:00:00\n"
+            f"{self.task.id},2026-01-06T09:00:00,02:00:00\n"
+        )
+        response = self.upload(content.encode())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["imported"], response.data["rejected"]), (2, 2))
+        self.assertEqual([error["line"] for error in response.data["errors"]], [3, 4])
+        self.assertTotals(3)
+
+    def test_decode_error_keeps_the_rows_before_it_consistent(self):
+        rows = "".join(f"{self.task.id},2026-01-{1 + i % 28:02d}T09:00:00,00:30:00,entry {i}\n" for i in range(600))
+        content = b"task,start_time,duration,description\n" + rows.encode() + b"\xff\xfe broken\n"
+        response = self.upload(content)
+        self.assertEqual(response.status_code, 400)
+        imported = response.data["imported"]
+        self.assertTrue(0 < imported <= 600)
+        self.assertEqual(TimeEntry.objects.count(), imported)
+        self.assertTotals(imported / 2)
+
+
+class ProjectSummaryTests(APITestCase):
+    def setUp(self):
+        report_cache.clear()
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(self.user)
+        self.team = Team.objects.create(name="Team", slug="team")
+        self.now = timezone.now()
+        self.projects = []
+        for i in range(5):
+            project = Project.objects.create(title=f"project {i}", owner=self.user, team=self.team if i < 2 else None)
+            for status in (Task.Status.TODO, Task.Status.IN_PROGRESS, Task.Status.DONE):
+                task = Task.objects.create(project=project, title=status, status=status)
+            for days in (0, 20):
+                begin = self.now - timedelta(days=days, hours=2)
+                TimeEntry.objects.create(task=task, user=self.user, start_time=begin, end_time=begin + timedelta(hours=1))
+            self.projects.append(project)
+
+    def get(self, **params):
+        return self.client.get("/api/reports/project_summary/", params).json()
+
+    def test_rows_pages_and_filters(self):
+        page = self.get(page_size=2)
+        self.assertEqual([row["project"] for row in page["results"]], ["project 4", "project 3"])
+        self.assertEqual(page["results"][0]["tasks"], {"tasks": 3, "done": 1, "in_progress": 1})
+        self.assertEqual(float(page["results"][0]["total_time"]), 7200)
+        seen = [row["id"] for row in page["results"]]
+        while page["next"]:
+            page = self.client.get(page["next"]).json()
+            seen += [row["id"] for row in page["results"]]
+        self.assertEqual(seen, [project.id for project in reversed(self.projects)])
+
+        self.assertEqual([row["project"] for row in self.get(team=self.team.id)["results"]],
+                         ["project 1", "project 0"])
+        recent = self.get(start=(self.now - timedelta(days=7)).date().isoformat())["results"]
+        self.assertEqual({float(row["total_time"]) for row in recent}, {3600})
+
+    def test_a_page_is_one_query(self):
+        def project_queries(**params):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get("/api/reports/project_summary/", params).status_code, 200)
+            return [q["sql"] for q in queries.captured_queries if "categories_project" in q["sql"]]
+
+        self.assertEqual(len(project_queries(page_size=1)), 1)
+        self.assertEqual(len(project_queries(page_size=5)), 1)
+
+
+class StreamingExportTests(APITestCase):
+    def setUp(self):
+        report_cache.clear()
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.client.force_authenticate(user)
+        start = timezone.now() - timedelta(hours=1)
+        for i in range(3):
+            task = Task.objects.create(project=Project.objects.create(title=f"project {i}", owner=user), title="t",
+                                       status=Task.Status.DONE)
+            TimeEntry.objects.create(task=task, user=user, start_time=start, end_time=start + timedelta(minutes=30))
+
+    def export(self, fmt, **params):
+        response = self.client.get("/api/reports/project_summary/", {"export": fmt, "page_size": 1, **params})
+        self.assertTrue(response.streaming)
+        return response, list(response.streaming_content)
+
+    def test_csv_flattens_nested_fields_and_skips_paging(self):
+        response, blocks = self.export("csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn('filename="project-summary.csv"', response["Content-Disposition"])
+        # the header and first row go out on their own before the rest
+        header, first = blocks[0].decode().splitlines()
+        self.assertEqual(header, "id,project,total_time,tasks.tasks,tasks.done,tasks.in_progress")
+        rows = list(csv.DictReader(io.StringIO(b"".join(blocks).decode())))
+        self.assertEqual([row["project"] for row in rows], ["project 2", "project 1", "project 0"])
+        self.assertEqual((rows[0]["tasks.done"], rows[0]["total_time"]), ("1", "1800.0"))
+
+    def test_ndjson_matches_the_json_rows(self):
+        expected = self.client.get("/api/reports/project_summary/").json()["results"]
+        _, blocks = self.export("ndjson")
+        self.assertEqual([json.loads(line) for line in b"".join(blocks).splitlines()], expected)
+        response, blocks = self.export("ndjson.gz")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertEqual([json.loads(line) for line in gzip.decompress(b"".join(blocks)).splitlines()], expected)
+        self.assertEqual(self.client.get("/api/reports/project_summary/?export=xml").status_code, 400)
+
+
+class ReportCacheInvalidationTests(APITestCase):
+    def setUp(self):
+        report_cache.clear()
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.first = Category.objects.create(name="First", slug="first")
+        self.second = Category.objects.create(name="Second", slug="second")
+        self.child = Category.objects.create(name="Child", slug="child", parent=self.first)
+        self.project = Project.objects.create(title="Board", owner=self.user, category=self.child)
+        self.task = Task.objects.create(project=self.project, title="task")
+        self.client.force_authenticate(self.user)
+
+    def summary(self, **params):
+        return self.client.get("/api/reports/project_summary/", params).json()["results"]
+
+    def titles_under(self, category):
+        return [row["project"] for row in self.summary(category=category.id)]
+
+    def test_versions_change_only_after_commit(self):
+        project_version, all_version = data_version(self.project.id), data_version()
+        start = timezone.now() - timedelta(hours=1)
+        [before] = self.summary()
+        with self.captureOnCommitCallbacks() as callbacks:
+            TimeEntry.objects.create(task=self.task, user=self.user, start_time=start, end_time=timezone.now())
+        self.assertEqual((data_version(self.project.id), data_version()), (project_version, all_version))
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(data_version(self.project.id), project_version)
+        self.assertNotEqual(data_version(), all_version)
+        [after] = self.summary()
+        self.assertNotEqual(after["total_time"], before["total_time"])
+
+    def test_category_moves_refresh_filtered_summaries(self):
+        self.assertEqual((self.titles_under(self.first), self.titles_under(self.second)), (["Board"], []))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/categories/{self.child.id}/move/", {"parent_id": self.second.id}, format="json")
+        self.assertEqual((self.titles_under(self.first), self.titles_under(self.second)), ([], ["Board"]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/categories/batch-move/",
+                                        {"moves": [{"id": self.child.id, "parent_id": self.first.id}]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((self.titles_under(self.first), self.titles_under(self.second)), (["Board"], []))
+
+
+class ReportJobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        self.project = Project.objects.create(title="Board", owner=self.user)
+        Task.objects.create(project=self.project, title="task")
+        self.client.force_authenticate(self.user)
+
+    def test_job_stores_rows_for_download(self):
+        response = self.client.post("/api/reports/jobs/", {"report": "export"}, format="json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["id"]
+        self.assertEqual(self.client.get(f"/api/reports/jobs/{job_id}/result/").status_code, 409)
+
+        self.assertTrue(execute_job(job_id))
+        self.assertFalse(execute_job(job_id))
+        job = ReportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.row_count), (ReportJob.Status.DONE, 1))
+        result = self.client.get(f"/api/reports/jobs/{job_id}/result/")
+        self.assertEqual(result.json(), [{"id": self.project.id, "title": "Board", "total_tasks": 1}])
+
+    def test_spec_is_validated_up_front(self):
+        for spec in ({"report": "nope"}, {"report": "burndown"}, {"report": "user_time", "params": {"start": "x"}}):
+            self.assertEqual(self.client.post("/api/reports/jobs/", spec, format="json").status_code, 400)
+        self.assertFalse(ReportJob.objects.exists())
+
+
+class ReportJobNotifyTests(ServerLoopTestCase):
+    def test_owner_receives_completion_event(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        Project.objects.create(title="Board", owner=user)
+        receiver = self.subscribe(user)
+        job = ReportJob.objects.create(requested_by=user, report="export")
+        execute_job(job.pk)
+
+        started = time.perf_counter()
+        notify(job.pk)
+        message = self.received(receiver, started)
+        self.assertEqual(message["data"]["event"], "report_job")
+        self.assertEqual((message["data"]["job"]["id"], message["data"]["job"]["status"]), (job.pk, "done"))
+
+
+class TaskStatusHistoryTests(APITestCase):
+    def test_saves_and_bulk_updates_are_logged(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        project = Project.objects.create(title="Board", owner=user)
+        first = Task.objects.create(project=project, title="first")
+        second = Task.objects.create(project=project, title="second")
+        first.status = Task.Status.IN_PROGRESS
+        first.save()
+        first.title = "renamed"
+        first.save()
+        BulkTaskOperation(user, [
+            {"op": "update", "id": first.id, "status": Task.Status.DONE},
+            {"op": "update", "id": second.id, "status": Task.Status.BLOCKED},
+        ]).apply()
+        self.assertEqual(
+            list(TaskStatusChange.objects.filter(task=first).values_list("from_status", "to_status")),
+            [("", "todo"), ("todo", "in_progress"), ("in_progress", "done")],
+        )
+
+        self.client.force_authenticate(user)
+        [day] = self.client.get(f"/api/dashboard/{project.id}/burndown/").json()
+        self.assertEqual((day["total"], day["done"], day["remaining"]), (2, 1, 1))
+        [day] = self.client.get(f"/api/dashboard/{project.id}/cumulative_flow/").json()
+        self.assertEqual((day["todo"], day["done"], day["blocked"]), (0, 1, 1))
+        [row] = self.client.get(f"/api/dashboard/{project.id}/cycle_time/").json()
+        self.assertEqual(row["task"], first.id)
+
+
+class TeamLoadTests(APITestCase):
+    def test_counts_are_not_multiplied_by_time_entries(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        project = Project.objects.create(title="Board", owner=user)
+        start = timezone.now()
+        for title, status in (("open", Task.Status.TODO), ("done", Task.Status.DONE)):
+            task = Task.objects.create(project=project, title=title, status=status)
+            TaskAssignment.objects.create(task=task, user=user)
+            for hours in (1, 2):
+                TimeEntry.objects.create(task=task, user=user, start_time=start, end_time=start + timedelta(hours=hours))
+
+        self.client.force_authenticate(user)
+        [row] = self.client.get(f"/api/dashboard/{project.id}/team_load/").json()
+        self.assertEqual((row["task_count"], row["open_tasks"]), (2, 1))
+        self.assertEqual(float(row["total_time"]), timedelta(hours=6).total_seconds())
+
+
+class ProductivityTrendsTests(APITestCase):
+    def setUp(self):
+        report_cache.clear()
+        self.user = User.objects.create_user("owner@example.com", "pw-12345678")
+        task = Task.objects.create(project=Project.objects.create(title="Board", owner=self.user), title="task")
+        self.start = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=10)
+        for offset, hours in ((timedelta(0), 1), (timedelta(hours=3), 3), (timedelta(days=4), 2)):
+            begin = self.start + offset
+            TimeEntry.objects.create(task=task, user=self.user, start_time=begin,
+                                     end_time=begin + timedelta(hours=hours))
+        self.client.force_authenticate(self.user)
+
+    def test_productivity_trends_keeps_one_row_per_entry(self):
+        rows = self.client.get("/api/dashboard/productivity_trends/").json()
+        self.assertEqual([set(row) for row in rows], [{"user_id", "day", "start_time", "prev", "diff"}] * 3)
+        self.assertEqual([row["prev"] is None for row in rows], [True, False, False])
+        self.assertEqual([row["diff"] and float(row["diff"]) / 3600 for row in rows], [None, 3, 93])
+
+    def test_productivity_trends_reads_archived_entries(self):
+        before = self.client.get("/api/dashboard/productivity_trends/").json()
+        self.assertEqual(archive_time_entries(self.start + timedelta(days=1)), 2)
+        report_cache.clear()
+        self.assertEqual(self.client.get("/api/dashboard/productivity_trends/").json(), before)
+        second = timezone.localdate(self.start + timedelta(days=4))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/api/dashboard/productivity_trends/?start={second}")
+        self.assertFalse(any("archivedtimeentry" in q["sql"] for q in queries.captured_queries))
+
+    def test_productivity_trends_is_bounded_by_the_date_range(self):
+        first, second = (timezone.localdate(self.start + timedelta(days=days)) for days in (0, 4))
+        rows = self.client.get(f"/api/dashboard/productivity_trends/?end={first}").json()
+        self.assertEqual([row["day"] for row in rows], [first.isoformat()] * 2)
+        [row] = self.client.get(f"/api/dashboard/productivity_trends/?start={second}").json()
+        self.assertEqual((row["day"], row["prev"], row["diff"]), (second.isoformat(), None, None))
+        self.assertEqual(self.client.get("/api/dashboard/productivity_trends/?start=soon").status_code, 400)
+
+
+class TimeAnalyticsTests(APITestCase):
+    def test_grouped_percentiles_match_numpy(self):
+        rng = np.random.default_rng(0)
+        groups = rng.integers(0, 5, 1000)
+        values = rng.random(1000) * 3600
+        distinct, result = grouped_percentiles(groups, values, (10, 50, 99))
+        for group, row in zip(distinct, result):
+            np.testing.assert_allclose(row, np.percentile(values[groups == group], (10, 50, 99)))
+
+    def test_time_endpoints(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        task = Task.objects.create(project=Project.objects.create(title="Board", owner=user), title="task")
+        start = timezone.now().replace(hour=12) - timedelta(days=10)
+        for day, hours in ((0, 1), (0, 3), (4, 2)):
+            begin = start + timedelta(days=day)
+            TimeEntry.objects.create(task=task, user=user, start_time=begin, end_time=begin + timedelta(hours=hours))
+
+        self.client.force_authenticate(user)
+        [stats] = self.client.get("/api/reports/time_stats/?percentiles=50").json()
+        self.assertEqual((stats["entries"], float(stats["p50"])), (3, 7200.0))
+        [gaps] = self.client.get("/api/reports/time_gaps/").json()
+        self.assertEqual((gaps["active_days"], gaps["idle_days"], gaps["longest_gap"]), (2, 3, 3))
+        rolling = self.client.get("/api/reports/rolling_time/?window=7").json()
+        self.assertEqual([float(row["rolling_total"]) / 3600 for row in rolling], [4, 4, 4, 4, 6])
+        self.assertEqual(self.client.get("/api/reports/rolling_time/?window=0").status_code, 400)
+
+
+class ColdStorageTests(APITestCase):
+    def snapshot(self):
+        return {
+            "tasks": sorted(Task.objects.values_list("id", "total_duration", "subtree_duration")),
+            "projects": sorted(Project.objects.values_list("id", "total_duration")),
+            "daily": sorted(DailyTimeRollup.objects.values_list("day", "user_id", "task_id", "total_duration",
+                                                                "entry_count")),
+            "workload": sorted(ProjectWorkload.objects.values_list("project_id", "user_id", "logged_duration")),
+        }
+
+    def test_archived_entries_keep_totals_and_reports(self):
+        user = User.objects.create_user("owner@example.com", "pw-12345678")
+        project = Project.objects.create(title="Board", owner=user)
+        parent = Task.objects.create(project=project, title="parent")
+        task = Task.objects.create(project=project, title="task", parent=parent)
+        now = timezone.now()
+        for days, hours in ((400, 2), (390, 1), (3, 4)):
+            begin = now - timedelta(days=days)
+            TimeEntry.objects.create(task=task, user=user, start_time=begin, end_time=begin + timedelta(hours=hours))
+        before = self.snapshot()
+
+        self.assertEqual(archive_time_entries(now - timedelta(days=365), chunk_size=1), 2)
+        self.assertEqual((TimeEntry.objects.count(), ArchivedTimeEntry.objects.count()), (1, 2))
+        self.assertEqual(self.snapshot(), before)
+        task.refresh_from_db()
+        self.assertEqual(task.total_duration, timedelta(hours=7))
+
+        # the rebuilds read the archive too, so they agree with the stored values
+        self.assertEqual(reconcile_time_totals(), {"tasks": 0, "projects": 0})
+        self.assertEqual(rebuild_project_rollups([project.id]), 0)
+        refresh_daily_time(full=True)
+        self.assertEqual(self.snapshot(), before)
+
+        self.client.force_authenticate(user)
+        [stats] = self.client.get("/api/reports/time_stats/").json()
+        self.assertEqual(stats["entries"], 3)
+        [recent] = self.client.get(f"/api/reports/time_stats/?start={(now - timedelta(days=30)).date()}").json()
+        self.assertEqual(recent["entries"], 1)
+
+
+    def test_deletes_stay_under_the_parameter_limit(self):
+        with CaptureQueriesContext(connection) as queries:
+            _delete_entries(list(range(1, 2001)))
+        deletes = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("DELETE")]
+        self.assertEqual(len(deletes), 3)
+        self.assertTrue(all(sql.count(",") < 900 for sql in deletes))
+
+class TimeTotalsMigrationTests(TransactionTestCase):
+    before = [("categories", "0010_task_subtree_rollup")]
+    after = [("categories", "0011_time_totals")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_running_timers_leave_a_zero_total(self):
+        apps = self.migrate(self.before)
+        User = apps.get_model("accounts", "User")
+        Project = apps.get_model("categories", "Project")
+        Task = apps.get_model("categories", "Task")
+        TimeEntry = apps.get_model("categories", "TimeEntry")
+        user = User.objects.create(email="owner@example.com")
+        project = Project.objects.create(title="Board", owner=user)
+        running, logged = Task.objects.create(project=project, title="a"), Task.objects.create(project=project, title="b")
+        idle = Project.objects.create(title="Idle", owner=user)
+        now = timezone.now()
+        TimeEntry.objects.create(task=running, user=user, start_time=now)
+        TimeEntry.objects.create(task=Task.objects.create(project=idle, title="c"), user=user, start_time=now)
+        TimeEntry.objects.create(task=logged, user=user, start_time=now - timedelta(hours=2),
+                                 end_time=now - timedelta(hours=1), duration=timedelta(hours=1))
+
+        apps = self.migrate(self.after)
+        Task = apps.get_model("categories", "Task")
+        Project = apps.get_model("categories", "Project")
+        self.assertEqual(Task.objects.get(pk=running.pk).total_duration, timedelta())
+        self.assertEqual(Task.objects.get(pk=logged.pk).total_duration, timedelta(hours=1))
+        self.assertEqual(Project.objects.get(pk=project.pk).total_duration, timedelta(hours=1))
+        self.assertEqual(Project.objects.get(pk=idle.pk).total_duration, timedelta())
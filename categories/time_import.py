@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, DurationField, F, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from .daily_time import entry_key, recompute_keys, sync_on_save
+from .models import CategoryStats, Project, Task, TimeEntry, path_to_ids
+from .report_cache import bump_versions
+from .rollup import apply_rollup_delta
+from .workload import apply_workload_delta
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = ("csv", "ndjson")
+
+
+class TimeImportError(ValueError):
+    pass
+
+
+def guess_format(name):
+    return "ndjson" if name.lower().endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def iter_rows(stream, fmt):
+    """Yields (line number, dict) from a text stream without reading it whole."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if isinstance(row, dict) else None
+    else:
+        raise TimeImportError(f"format must be one of {', '.join(FORMATS)}.")
+
+
+def text_stream(fileobj):
+    return io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+
+
+def _datetime(value):
+    if not value:
+        return None
+    parsed = parse_datetime(str(value).strip())
+    if parsed is None:
+        raise ValueError(f"invalid datetime {value!r}")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _duration(value):
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return timedelta(seconds=value)
+    parsed = parse_duration(str(value).strip())
+    if parsed is None:
+        raise ValueError(f"invalid duration {value!r}")
+    return parsed
+
+
+class TimeEntryImport:
+    """
+    Streams rows of ``task, start_time, end_time | duration, description[, user]``
+    into TimeEntry with fixed-size bulk_create batches. Task ids are checked
+    against a set loaded up front; rows that fail are reported by line number.
+    Each batch commits together with its totals, rollups, workloads and daily
+    rollup rows, so a stream that breaks off midway leaves consistent data.
+    """
+
+    def __init__(self, tasks, user=None, users_by_email=None):
+        # tasks: {task_id: project_id} the importer may write to
+        self.tasks = tasks
+        self.user = user
+        self.users_by_email = users_by_email
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = None
+
+    @classmethod
+    def for_user(cls, user, projects):
+        """Entries are logged as ``user`` on tasks of ``projects``."""
+        tasks = dict(Task.objects.filter(project__in=projects).values_list("id", "project_id"))
+        return cls(tasks, user=user)
+
+    def reject(self, line_no, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def build(self, row):
+        try:
+            task_id = int(row.get("task") or row.get("task_id"))
+        except (TypeError, ValueError):
+            raise ValueError("task must be an integer id")
+        if task_id not in self.tasks:
+            raise ValueError(f"unknown task {task_id}")
+
+        user_id = self.user.pk if self.user else None
+        if self.users_by_email is not None and row.get("user"):
+            user_id = self.users_by_email.get(str(row["user"]).strip().lower())
+            if user_id is None:
+                raise ValueError(f"unknown user {row['user']!r}")
+        if user_id is None:
+            raise ValueError("user is required")
+
+        start = _datetime(row.get("start_time"))
+        if start is None:
+            raise ValueError("start_time is required")
+        end = _datetime(row.get("end_time"))
+        if end is None:
+            given = _duration(row.get("duration"))
+            if given is None:
+                raise ValueError("end_time or duration is required")
+            end = start + given
+        if end < start:
+            raise ValueError("end_time is before start_time")
+
+        # same rule as TimeEntry.save()
+        return TimeEntry(task_id=task_id, user_id=user_id, description=row.get("description") or "",
+                         start_time=start, end_time=end, duration=end - start)
+
+    def flush(self, batch):
+        with transaction.atomic():
+            TimeEntry.objects.bulk_create(batch)
+            self._apply_totals(batch)
+            if sync_on_save():
+                recompute_keys({entry_key(entry.start_time, entry.user_id, entry.task_id) for entry in batch})
+        self.imported += len(batch)
+
+    def _apply_totals(self, batch):
+        """bulk_create skips the post_save handlers, so the derived counters are updated here."""
+        task_time = defaultdict(timedelta)
+        user_time = defaultdict(timedelta)
+        for entry in batch:
+            task_time[entry.task_id] += entry.duration
+            user_time[self.tasks[entry.task_id], entry.user_id] += entry.duration
+        project_time = defaultdict(timedelta)
+        for task_id, spent in task_time.items():
+            project_time[self.tasks[task_id]] += spent
+        bump_versions(project_time)
+
+        for model, totals in ((Task, task_time), (Project, project_time)):
+            delta = Case(*(When(pk=pk, then=Value(spent)) for pk, spent in totals.items()),
+                         output_field=DurationField())
+            model.objects.filter(pk__in=totals).update(total_duration=F("total_duration") + delta)
+        paths = (Project.objects.filter(id__in=project_time, category__isnull=False)
+                 .values_list("id", "category__path_ids"))
+        for project_id, path_ids in paths:
+            CategoryStats.apply_delta(path_to_ids(path_ids), total_time=project_time[project_id])
+        for task_id, spent in task_time.items():
+            apply_rollup_delta(task_id, duration=spent)
+        for (project_id, user_id), spent in user_time.items():
+            apply_workload_delta(project_id, user_id, logged=spent)
+
+    def run(self, rows):
+        """
+        Imports every row and returns the summary. An unreadable stream
+        (bad encoding, broken CSV) raises once the rows before the bad spot
+        are committed; ``summary()`` still reports them.
+        """
+        self.started = time.monotonic()
+        batch = []
+        try:
+            for line_no, row in rows:
+                if row is None:
+                    self.reject(line_no, "not a JSON object")
+                    continue
+                try:
+                    batch.append(self.build(row))
+                except ValueError as exc:
+                    self.reject(line_no, str(exc))
+                    continue
+                if len(batch) >= BATCH_SIZE:
+                    self.flush(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error):
+            # keep the rows read before the bad spot
+            if batch:
+                self.flush(batch)
+            raise
+        if batch:
+            self.flush(batch)
+        return self.summary()
+
+    def summary(self):
+        seconds = time.monotonic() - self.started
+        return {
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round((self.imported + self.rejected) / seconds, 1) if seconds else None,
+        }
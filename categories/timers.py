@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TimeEntry
+
+User = get_user_model()
+
+
+def running_entries(user):
+    """Open entries of ``user``; served by the partial index on (user, start_time) WHERE end_time IS NULL."""
+    return TimeEntry.objects.filter(user=user, end_time__isnull=True).order_by("-start_time")
+
+
+def lock_user(user):
+    """
+    Locks the user row for the rest of the transaction. Every write that can
+    leave an entry open takes it first, so they run one at a time per user.
+    """
+    User.objects.select_for_update().filter(pk=user.pk).exists()
+
+
+def _close(entries, end_time):
+    closed = []
+    for entry in entries:
+        entry.end_time = max(end_time, entry.start_time)
+        entry.save()
+        closed.append(entry)
+    return closed
+
+
+def stop_running(user, end_time=None, task=None):
+    """Closes the user's running entries (only those on ``task`` if given) and returns them."""
+    end_time = end_time or timezone.now()
+    with transaction.atomic():
+        entries = running_entries(user).select_for_update()
+        if task is not None:
+            entries = entries.filter(task=task)
+        return _close(entries, end_time)
+
+
+def start_running(user, task, start_time=None, description=""):
+    """
+    Starts a timer on ``task`` after closing whatever the user had running.
+    The user row is locked first, so concurrent starts for the same user
+    (here or through the time entry API) leave a single open entry.
+    """
+    start_time = start_time or timezone.now()
+    with transaction.atomic():
+        lock_user(user)
+        closed = _close(running_entries(user), start_time)
+        entry = TimeEntry.objects.create(task=task, user=user, start_time=start_time, description=description)
+    return entry, closed
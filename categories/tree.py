@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Category, DataVersion
+
+TREE_VERSION_KEY = "categories:tree"
+TREE_FIELDS = ("id", "name", "slug", "description")
+
+
+def _tree_version():
+    # kept in the database: the cache itself is per process
+    return DataVersion.current(TREE_VERSION_KEY)
+
+
+def invalidate_category_tree():
+    # a fresh version makes every cached tree unreachable at once, in every worker
+    DataVersion.bump([TREE_VERSION_KEY])
+
+
+def build_category_tree(root=None, max_depth=None):
+    """
+    Assembles the category forest (or the subtree under ``root``) from a single
+    (tree_id, lft) ordered scan. Output matches CategoryTreeSerializer.
+    """
+    qs = Category.objects.order_by("tree_id", "lft")
+    base_level = 0
+    if root is not None:
+        qs = qs.filter(tree_id=root.tree_id, lft__gte=root.lft, rght__lte=root.rght)
+        base_level = root.level
+    if max_depth is not None:
+        qs = qs.filter(level__lte=base_level + max_depth)
+
+    forest = []
+    nodes = {}
+    for row in qs.values_list(*TREE_FIELDS, "parent_id").iterator(chunk_size=2000):
+        node = dict(zip(TREE_FIELDS, row[:-1]), children=[])
+        nodes[node["id"]] = node
+        parent = nodes.get(row[-1])
+        # in lft order a parent is always seen before its children, so a
+        # missing parent means this node is a top of the scanned range
+        if parent is None:
+            forest.append(node)
+        else:
+            parent["children"].append(node)
+    return forest
+
+
+def get_category_tree(root=None, max_depth=None):
+    key = "categories:tree:{}:{}:{}".format(
+        _tree_version(), root.pk if root is not None else "all", "" if max_depth is None else max_depth
+    )
+    data = cache.get(key)
+    if data is None:
+        data = build_category_tree(root=root, max_depth=max_depth)
+        cache.set(key, data, getattr(settings, "CATEGORY_TREE_CACHE_TIMEOUT", 60 * 60))
+    return data
@@ -1,18 +1,34 @@
-from rest_framework import viewsets, status
+import csv
+
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
-from .models import Category, Project, Task, TimeEntry, TaskAssignment
+from .models import Category, Project, Task, TimeEntry, TaskAssignment, CloneJob, ReportJob
+from .graph import DependencyGraph, logged_hours
+from .task_bulk import BulkTaskOperation, BulkTaskError, accessible_projects
+from .timers import lock_user, running_entries, start_running, stop_running
+from .time_import import TimeEntryImport, TimeImportError, guess_format, iter_rows, text_stream
+from .ordering import move_task, next_rank
+from .rollup import project_rollups
+from .cloning import clone_project, start_clone_job, async_clone_threshold
 from .serializers import (
     CategoryTreeSerializer, CategoryDetailSerializer,
-    ProjectSerializer, TaskSerializer, TimeEntrySerializer, TaskAssignmentSerializer
+    ProjectSerializer, TaskSerializer, TimeEntrySerializer, TaskAssignmentSerializer,
+    CategoryProjectSerializer, CloneJobSerializer, ReportJobSerializer
 )
+from . import reports
+from .export import StreamingExportMixin, streaming_export
+from .report_jobs import start_report_job
+from .report_cache import cached, report_cache
+from .pagination import CategoryProjectCursorPagination, ProjectSummaryCursorPagination
 from .permissions import ProjectPermission
-from django.db.models.functions import TruncWeek, TruncDate
-from django.db.models import Sum, Count, Q, F, Window
-from django.db.models.functions import Lag
+from .tree import get_category_tree
+from .stats import live_subtree_stats, stored_subtree_stats
+from .bulk import TaxonomyError, flatten_nested, read_csv, import_taxonomy, batch_move
 from django.contrib.auth import get_user_model
-from rest_framework_csv.renderers import CSVRenderer
 from teams.models import TeamMembership
 from django.db import transaction
 from django.utils import timezone
@@ -31,9 +47,19 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='tree')
     def tree(self, request):
-        roots = Category.objects.filter(parent__isnull=True)
-        serializer = self.get_serializer(roots, many=True)
-        return Response(serializer.data)
+        root = None
+        max_depth = None
+        try:
+            if request.query_params.get('root'):
+                root = get_object_or_404(Category, pk=int(request.query_params['root']))
+            if request.query_params.get('max_depth'):
+                max_depth = int(request.query_params['max_depth'])
+                if max_depth < 0:
+                    raise ValueError
+        except ValueError:
+            return Response({"detail": "root and max_depth must be non-negative integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_category_tree(root=root, max_depth=max_depth))
 
     @action(detail=True, methods=['post'], url_path='move')
     def move(self, request, pk=None):
@@ -52,6 +78,38 @@ class CategoryViewSet(viewsets.ModelViewSet):
         category.save()
         return Response(self.get_serializer(category).data)
 
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def import_taxonomy(self, request):
+        # a bare list of nodes carries no options
+        options = {} if isinstance(request.data, list) else request.data
+        parent_slug = options.get('parent') or None
+        try:
+            upload = request.FILES.get('file')
+            if upload is not None:
+                records = read_csv(upload.read(), parent_slug=parent_slug)
+            else:
+                nodes = request.data if isinstance(request.data, list) else options.get('nodes')
+                if not isinstance(nodes, list):
+                    return Response({"detail": "Send a list of nodes or a CSV file."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                records = flatten_nested(nodes, parent_slug=parent_slug)
+            report = import_taxonomy(records)
+        except (TaxonomyError, UnicodeDecodeError) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='batch-move')
+    def batch_move(self, request):
+        moves = request.data.get('moves')
+        if not isinstance(moves, list) or not moves:
+            return Response({"detail": "moves must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = batch_move({item['id']: item.get('parent_id') for item in moves})
+        except (KeyError, TypeError, ValueError) as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
     @action(detail=True, methods=['get'], url_path='descendants')
     def descendants(self, request, pk=None):
         category = self.get_object()
@@ -63,19 +121,23 @@ class CategoryViewSet(viewsets.ModelViewSet):
         serializer = CategoryDetailSerializer(qs, many=True)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='stats')
+    def stats(self, request, pk=None):
+        category = self.get_object()
+        if request.query_params.get('live', 'false').lower() == 'true':
+            nodes = live_subtree_stats(category)
+        else:
+            nodes = stored_subtree_stats(category)
+        return Response(nodes)
+
     @action(detail=True, methods=['get'], url_path='projects')
     def projects(self, request, pk=None):
         category = self.get_object()
-        descendant_ids = category.get_descendants(include_self=True).values_list('id', flat=True)
-        projects = Project.objects.filter(category_id__in=list(descendant_ids)).select_related('owner', 'category')
-        class SimpleProjectSerializer(serializers.ModelSerializer):
-            category_name = serializers.CharField(source='category.name', read_only=True)
-            owner_email = serializers.CharField(source='owner.email', read_only=True)
-            class Meta:
-                model = Project
-                fields = ('id','title','description','category','category_name','owner','owner_email')
-        serializer = SimpleProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        projects = Project.objects.under_category(category).select_related('owner', 'category')
+        paginator = CategoryProjectCursorPagination()
+        page = paginator.paginate_queryset(projects, request, view=self)
+        serializer = CategoryProjectSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ProjectViewSet(viewsets.ModelViewSet):
@@ -89,29 +151,73 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='clone')
     def clone(self, request, pk=None):
         project = self.get_object()
-        new_title = request.data.get('title', f"{project.title} (Clone)")
-        new_team_id = request.data.get('team_id', project.team_id)
+        options = {
+            "title": request.data.get('title', f"{project.title} (Clone)"),
+            "team_id": request.data.get('team_id', project.team_id),
+            "include_assignments": str(request.data.get('include_assignments', 'false')).lower() == 'true',
+        }
 
-        with transaction.atomic():
-            cloned_project = Project.objects.create(
-                title=new_title,
-                description=project.description,
-                owner=request.user,
-                category=project.category,
-                is_template=False,
-                config=project.config,
-                team_id=new_team_id
-            )
-            tasks = project.tasks.all()
-            new_tasks = [
-                Task(project=cloned_project, title=t.title, description=t.description, order=t.order)
-                for t in tasks
-            ]
-            Task.objects.bulk_create(new_tasks)
+        if project.tasks.count() > async_clone_threshold():
+            job = start_clone_job(project, request.user, **options)
+            return Response(CloneJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
+        cloned_project = clone_project(project, request.user, **options)
         serializer = ProjectSerializer(cloned_project)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['get'], url_path=r'clone-jobs/(?P<job_id>\d+)')
+    def clone_job(self, request, job_id=None):
+        job = get_object_or_404(CloneJob, pk=job_id, requested_by=request.user)
+        return Response(CloneJobSerializer(job).data)
+
+    @action(detail=True, methods=['get'], url_path='task-order')
+    def task_order(self, request, pk=None):
+        project = self.get_object()
+        order, cyclic = DependencyGraph.for_project(project.id).topological_order()
+        return Response({"order": order, "has_cycle": bool(cyclic), "cyclic_tasks": cyclic})
+
+    @action(detail=True, methods=['get'], url_path='next-tasks')
+    def next_tasks(self, request, pk=None):
+        project = self.get_object()
+        graph = DependencyGraph.for_project(project.id)
+        return Response([
+            {"id": task_id, "title": graph.titles[graph.index[task_id]], "status": graph.statuses[graph.index[task_id]]}
+            for task_id in graph.unblocked()
+        ])
+
+    @action(detail=True, methods=['get'], url_path='progress')
+    def progress(self, request, pk=None):
+        project = self.get_object()
+        tasks = project.tasks.order_by('order', 'id').values_list(
+            'id', 'parent_id', 'title', 'status', 'subtree_size', 'subtree_progress', 'subtree_duration')
+        if request.query_params.get('live', 'false').lower() == 'true':
+            live = project_rollups(project.id)
+            tasks = [(*row[:4], *live[row[0]]) for row in tasks]
+        rows = [
+            {"id": task_id, "parent": parent_id, "title": title, "status": task_status,
+             "subtree_size": size, "progress": round(points / size), "total_time": duration}
+            for task_id, parent_id, title, task_status, size, points, duration in tasks
+        ]
+        roots = [row for row in rows if row["parent"] is None]
+        return Response({
+            "progress": round(sum(r["progress"] * r["subtree_size"] for r in roots) / len(rows)) if rows else 0,
+            "tasks": rows,
+        })
+
+    @action(detail=True, methods=['get'], url_path='critical-path')
+    def critical_path(self, request, pk=None):
+        project = self.get_object()
+        graph = DependencyGraph.for_project(project.id)
+        by_time = request.query_params.get('weight') == 'time'
+        try:
+            if by_time:
+                path, total = graph.critical_path(logged_hours(graph.ids), default_weight=0)
+            else:
+                path, total = graph.critical_path()
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"tasks": path, "length": total, "weight": "hours" if by_time else "tasks"})
+
     @action(detail=True, methods=['post'], url_path='make-template')
     def make_template(self, request, pk=None):
         project = self.get_object()
@@ -121,36 +227,77 @@ class ProjectViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
+def _optional_datetime(value):
+    return serializers.DateTimeField().to_internal_value(value) if value else None
+
+
 class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.select_related('project').prefetch_related('dependencies', 'assignments__user').all()
+    queryset = Task.objects.select_related('project').prefetch_related('assignments__user')
     serializer_class = TaskSerializer
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        blocked = self.request.query_params.get('blocked', '').lower()
+        if blocked in ('true', 'false'):
+            qs = qs.blocked(blocked == 'true')
+        return qs
+
+    def perform_create(self, serializer):
+        project = serializer.validated_data['project']
+        serializer.save(order=next_rank(project.id))
+
+    @action(detail=True, methods=['post'], url_path='move')
+    def move(self, request, pk=None):
+        task = self.get_object()
+        before_id = request.data.get('before')
+        after_id = request.data.get('after')
+        if (before_id is None) == (after_id is None):
+            return Response({"detail": "Pass exactly one of before or after."}, status=status.HTTP_400_BAD_REQUEST)
+        anchor = get_object_or_404(Task, pk=before_id if before_id is not None else after_id)
+        if anchor.pk == task.pk or anchor.project_id != task.project_id:
+            return Response({"detail": "Anchor must be another task of the same project."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if before_id is not None:
+            move_task(task, before=anchor)
+        else:
+            move_task(task, after=anchor)
+        return Response({"id": task.id, "order": task.order})
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "operations must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = BulkTaskOperation(request.user, items).apply()
+        except BulkTaskError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"results": results})
+
     @action(detail=True, methods=['post'], url_path='start-timer')
     def start_timer(self, request, pk=None):
         task = self.get_object()
-        start_time = request.data.get("start_time")
-        if not start_time:
-            start_time = timezone.now()
-        entry = TimeEntry.objects.create(
-            task=task, user=request.user, start_time=start_time
-        )
-        return Response(TimeEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+        try:
+            start_time = _optional_datetime(request.data.get("start_time"))
+        except serializers.ValidationError as exc:
+            return Response({"start_time": exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+        entry, closed = start_running(request.user, task, start_time)
+        data = TimeEntrySerializer(entry).data
+        data["stopped"] = TimeEntrySerializer(closed, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], url_path='stop-timer')
     def stop_timer(self, request, pk=None):
         task = self.get_object()
-        end_time = request.data.get("end_time") or timezone.now()
+        try:
+            end_time = _optional_datetime(request.data.get("end_time"))
+        except serializers.ValidationError as exc:
+            return Response({"end_time": exc.detail}, status=status.HTTP_400_BAD_REQUEST)
 
-        entry = (TimeEntry.objects
-                 .filter(task=task, user=request.user, end_time__isnull=True)
-                 .order_by('-start_time')
-                 .first())
-        if not entry:
+        stopped = stop_running(request.user, end_time, task=task)
+        if not stopped:
             return Response({"detail": "No active timer found"}, status=status.HTTP_400_BAD_REQUEST)
-
-        entry.end_time = end_time
-        entry.save()
-        return Response(TimeEntrySerializer(entry).data, status=status.HTTP_200_OK)
+        return Response(TimeEntrySerializer(stopped[0]).data, status=status.HTTP_200_OK)
 
 
 class TimeEntryViewSet(viewsets.ModelViewSet):
@@ -161,99 +308,170 @@ class TimeEntryViewSet(viewsets.ModelViewSet):
         return TimeEntry.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-
-
-class ReportViewSet(viewsets.ViewSet):
+        with transaction.atomic():
+            if serializer.validated_data.get('end_time') is None:
+                # same lock as start_running, so concurrent opens cannot both see no running entry
+                lock_user(self.request.user)
+                stop_running(self.request.user, serializer.validated_data['start_time'])
+            serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='active')
+    def active(self, request):
+        entries = running_entries(request.user).select_related('task')
+        return Response([
+            {**TimeEntrySerializer(entry).data, "task_title": entry.task.title,
+             "elapsed": timezone.now() - entry.start_time}
+            for entry in entries
+        ])
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_entries(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"detail": "Upload a CSV or NDJSON file as 'file'."}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or guess_format(upload.name)
+        importer = TimeEntryImport.for_user(request.user, accessible_projects(request.user))
+        try:
+            report = importer.run(iter_rows(text_stream(upload.file), fmt))
+        except TimeImportError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        except (UnicodeDecodeError, csv.Error) as exc:
+            # the batches read before the bad spot are committed; say how many
+            return Response({"detail": str(exc), **importer.summary()}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+
+class BaseReportViewSet(StreamingExportMixin, viewsets.ViewSet):
+
+    def build_report(self, project=None):
+        """(rows, transform) for the current action, see categories.reports."""
+        builder = reports.PROJECT_REPORTS[self.action] if project is not None else reports.REPORTS[self.action]
+        try:
+            return builder(self.request.query_params, project)
+        except ValueError as exc:
+            raise ValidationError({"detail": str(exc)})
+
+
+class ReportViewSet(BaseReportViewSet):
 
     @action(detail=False, methods=['get'])
     def project_summary(self, request):
-        projects = Project.objects.all()
-        data = []
-        for project in projects:
-            data.append({
-                "project": project.title,
-                "total_time": project.total_time_spent(),
-                "tasks": project.team_productivity()
-            })
-        return Response(data)
+        qs, transform = self.build_report()
+        if self.export:
+            # exports stream every matching project instead of one page
+            return self.respond(qs, "project-summary", transform)
+
+        def page():
+            paginator = ProjectSummaryCursorPagination()
+            rows = paginator.paginate_queryset(qs, request, view=self)
+            return paginator.get_paginated_response([transform(row) for row in rows]).data
+        return Response(cached(self.action, request.query_params, page))
 
     @action(detail=False, methods=['get'])
     def user_time(self, request):
-        qs = TimeEntry.objects.values("user__email").annotate(
-            total_time=Sum("duration")
-        )
-        return Response(list(qs))
+        qs, _ = self.build_report()
+        return self.respond(qs, "user-time")
 
     @action(detail=False, methods=['get'])
     def weekly_time(self, request):
-        qs = (TimeEntry.objects.annotate(week=TruncWeek("start_time"))
-              .values("user__email", "week")
-              .annotate(total_time=Sum("duration"))
-              .order_by("week"))
-        return Response(list(qs))
+        qs, _ = self.build_report()
+        return self.respond(qs, "weekly-time")
 
     @action(detail=False, methods=['get'])
     def task_progress(self, request):
-        qs = (Task.objects.annotate(
-                total_time=Sum("time_entries__duration"),
-                done=Count("id", filter=Q(status=Task.Status.DONE)),
-                in_progress=Count("id", filter=Q(status=Task.Status.IN_PROGRESS)),
-            )
-            .values("id", "title", "status", "total_time", "done", "in_progress"))
-        return Response(list(qs))
+        qs, _ = self.build_report()
+        return self.respond(qs, "task-progress")
+
+    # time_stats, time_gaps and rolling_time are computed with NumPy, see categories.analytics
+
+    @action(detail=False, methods=['get'])
+    def time_stats(self, request):
+        rows, _ = self.build_report()
+        return self.respond(rows, "time-stats")
 
+    @action(detail=False, methods=['get'])
+    def time_gaps(self, request):
+        rows, _ = self.build_report()
+        return self.respond(rows, "time-gaps")
 
-class DashboardViewSet(viewsets.ViewSet):
+    @action(detail=False, methods=['get'])
+    def rolling_time(self, request):
+        rows, _ = self.build_report()
+        return self.respond(rows, "rolling-time")
+
+    @action(detail=False, methods=['post'], url_path='jobs')
+    def create_job(self, request):
+        """
+        Queues ``{"report": name, "project": id, "params": {...}}`` for a
+        background worker. ``project`` is required for burndown and team_load.
+        """
+        params = request.data.get('params') or {}
+        if not isinstance(params, dict):
+            return Response({"detail": "params must be an object."}, status=status.HTTP_400_BAD_REQUEST)
+        project = None
+        if request.data.get('project'):
+            project = get_object_or_404(Project, pk=request.data['project'])
+        try:
+            job = start_report_job(request.user, str(request.data.get('report', '')),
+                                   {str(key): str(value) for key, value in params.items()}, project)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)')
+    def job(self, request, job_id=None):
+        job = get_object_or_404(ReportJob, pk=job_id, requested_by=request.user)
+        return Response(ReportJobSerializer(job).data)
+
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>\d+)/result')
+    def job_result(self, request, job_id=None):
+        job = get_object_or_404(ReportJob, pk=job_id, requested_by=request.user)
+        if job.status != ReportJob.Status.DONE:
+            return Response({"detail": f"Report is {job.status}.", "status": job.status},
+                            status=status.HTTP_409_CONFLICT)
+        if self.export:
+            return streaming_export(iter(job.result), f"{job.report.replace('_', '-')}-{job.pk}", *self.export)
+        return Response(job.result)
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        return Response(report_cache.stats())
+
+
+class DashboardViewSet(BaseReportViewSet):
+
+    # burndown, cumulative_flow and cycle_time read the TaskStatusChange log
 
     @action(detail=True, methods=['get'])
     def burndown(self, request, pk=None):
         project = get_object_or_404(Project, pk=pk)
-        data = (
-            Task.objects.filter(project=project)
-            .annotate(day=TruncDate('created_at'))
-            .values('day')
-            .annotate(total=Count('id'))
-            .order_by('day')
-        )
-        return Response(data)
+        qs, transform = self.build_report(project)
+        return self.respond(qs, f"burndown-{project.pk}", transform, project_id=project.pk)
+
+    @action(detail=True, methods=['get'])
+    def cumulative_flow(self, request, pk=None):
+        project = get_object_or_404(Project, pk=pk)
+        qs, _ = self.build_report(project)
+        return self.respond(qs, f"cumulative-flow-{project.pk}", project_id=project.pk)
+
+    @action(detail=True, methods=['get'])
+    def cycle_time(self, request, pk=None):
+        project = get_object_or_404(Project, pk=pk)
+        qs, transform = self.build_report(project)
+        return self.respond(qs, f"cycle-time-{project.pk}", transform, project_id=project.pk)
 
     @action(detail=True, methods=['get'])
     def team_load(self, request, pk=None):
         project = get_object_or_404(Project, pk=pk)
-        data = (
-            User.objects.filter(taskassignment__task__project=project)
-            .annotate(task_count=Count('taskassignment'))
-            .annotate(total_time=Sum('taskassignment__task__time_entries__duration'))
-            .values('id', 'email', 'task_count', 'total_time')
-        )
-        return Response(data)
+        qs, transform = self.build_report(project)
+        return self.respond(qs, f"team-load-{project.pk}", transform, project_id=project.pk)
 
     @action(detail=False, methods=['get'])
     def export(self, request):
-        fmt = request.query_params.get('format', 'json')
-        data = Project.objects.annotate(total_tasks=Count('tasks')).values('id', 'title', 'total_tasks')
-
-        if fmt == 'csv':
-            renderer = CSVRenderer()
-            return Response(data, content_type='text/csv')
-
-        return Response(data)
+        qs, _ = self.build_report()
+        return self.respond(qs, "projects")
 
     @action(detail=False, methods=['get'])
     def productivity_trends(self, request):
-        qs = (
-            TimeEntry.objects
-            .annotate(day=TruncDate('start_time'))
-            .annotate(
-                prev=Window(
-                    expression=Lag('start_time'),
-                    partition_by=[F('user_id')],
-                    order_by=F('start_time').asc()
-                )
-            )
-            .annotate(diff=F('start_time') - F('prev'))
-            .values('user_id', 'day', 'start_time', 'prev', 'diff')
-            .order_by('user_id', 'day')
-        )
-        return Response(list(qs))
+        qs, transform = self.build_report()
+        return self.respond(qs, "productivity-trends", transform)
@@ -0,0 +1,69 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .archive import time_entry_sources
+from .models import ProjectWorkload, Task, TaskAssignment
+
+BATCH_SIZE = 1000
+
+
+def apply_workload_delta(project_id, user_id, assigned=0, open_=0, logged=None):
+    """Adds to one (project, user) row, creating it on first use."""
+    changes = {}
+    if assigned:
+        changes["assigned_count"] = F("assigned_count") + assigned
+    if open_:
+        changes["open_count"] = F("open_count") + open_
+    if logged:
+        changes["logged_duration"] = F("logged_duration") + logged
+    if not (changes and project_id and user_id):
+        return
+    rows = ProjectWorkload.objects.filter(project_id=project_id, user_id=user_id)
+    if not rows.update(**changes):
+        ProjectWorkload.objects.get_or_create(project_id=project_id, user_id=user_id)
+        rows.update(**changes)
+
+
+def shift_open_counts(task_id, project_id, delta):
+    """A task's status crossed done: one less (or more) open task for each of its assignees."""
+    assignees = TaskAssignment.objects.filter(task_id=task_id).values("user_id")
+    ProjectWorkload.objects.filter(project_id=project_id, user_id__in=assignees).update(
+        open_count=F("open_count") + delta)
+
+
+def compute_workloads(project_ids):
+    """
+    {(project_id, user_id): [assigned, open, logged]} from two independent
+    grouped queries, so assignments and time entries never multiply each other.
+    """
+    totals = defaultdict(lambda: [0, 0, timedelta()])
+    assignments = (TaskAssignment.objects.filter(task__project__in=project_ids).order_by()
+                   .values("task__project_id", "user_id")
+                   .annotate(assigned=Count("id"), open=Count("id", filter=~Q(task__status=Task.Status.DONE))))
+    for row in assignments.iterator(chunk_size=5000):
+        totals[row["task__project_id"], row["user_id"]][:2] = row["assigned"], row["open"]
+    for entries in time_entry_sources():
+        logged = (entries.filter(task__project__in=project_ids, duration__isnull=False).order_by()
+                  .values("task__project_id", "user_id").annotate(total=Sum("duration")))
+        for row in logged.iterator(chunk_size=5000):
+            totals[row["task__project_id"], row["user_id"]][2] += row["total"]
+    return totals
+
+
+def rebuild_workloads(project_ids):
+    """Rewrites the workload rows of the given projects; used after bulk writes that skip the signals."""
+    project_ids = list(project_ids)
+    if not project_ids:
+        return 0
+    with transaction.atomic():
+        rows = [
+            ProjectWorkload(project_id=project_id, user_id=user_id,
+                            assigned_count=assigned, open_count=open_, logged_duration=logged)
+            for (project_id, user_id), (assigned, open_, logged) in compute_workloads(project_ids).items()
+        ]
+        ProjectWorkload.objects.filter(project_id__in=project_ids).delete()
+        ProjectWorkload.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
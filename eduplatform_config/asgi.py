@@ -9,11 +9,14 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "eduplatform_config.settings")
 
 django_asgi_app = get_asgi_application()
 
-application = ProtocolTypeRouter({
+from activity.delivery import DeliveryLoopMiddleware  # noqa: E402  (needs the app registry)
+
+# websocket notifications are sent on this server's loop, where the consumers wait
+application = DeliveryLoopMiddleware(ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             activity.routing.websocket_urlpatterns
         )
     ),
-})
+}))
@@ -158,3 +158,25 @@ REST_FRAMEWORK = {
     }
 }
 
+# seconds a serialized /categories/tree/ stays cached; category writes invalidate it earlier
+CATEGORY_TREE_CACHE_TIMEOUT = 60 * 60
+
+# projects with more tasks than this are cloned by a background job (POST returns 202 + job id)
+PROJECT_CLONE_ASYNC_THRESHOLD = 10000
+
+# rewrite the DailyTimeRollup row on every TimeEntry save; when off, run refresh_daily_time periodically
+TIME_ROLLUP_SYNC = True
+
+# per-process LRU for report/dashboard JSON; entries are keyed by their data version (DataVersion, shared by all workers)
+REPORT_CACHE_MAX_ENTRIES = 512
+REPORT_CACHE_TIMEOUT = 5 * 60
+REPORT_CACHE_MAX_ROWS = 10000
+
+# processes computing queued report jobs (POST /reports/jobs/); 0 runs them in a thread of the web process
+REPORT_JOB_WORKERS = 2
+
+# archive_cold_rows moves finished time entries and read activity older than this many days to the archive tables
+COLD_STORAGE_AFTER_DAYS = 365
+
+# websocket notification sends one delivery keeps in flight at once
+NOTIFICATION_SEND_CONCURRENCY = 50